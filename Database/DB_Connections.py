@@ -1,37 +1,139 @@
+import ipaddress
+import os
 import sqlite3
+import threading
 from contextlib import contextmanager
+from functools import lru_cache
+
+import metrics
+
+
+@lru_cache(maxsize=64)
+def _network(subnet: str):
+    return ipaddress.ip_network(subnet, strict=False)
+
+
+def _ip_in_subnet(ip: str, subnet: str) -> int:
+    # SQL: ip_in_subnet(ip_address, '192.168.1.0/24')
+    try:
+        return int(ipaddress.ip_address(ip) in _network(subnet))
+    except ValueError:
+        return 0
 
 
 class DB_Connections:
+    """
+    Small SQLite connection pool.
+
+    Connections are opened once, get their PRAGMAs applied once, and are then
+    handed out per transaction. A thread keeps the same connection for the
+    whole (possibly nested) transaction; when it is done the connection goes
+    back to the idle pool, so short-lived Flask request threads and the
+    scheduler threads reuse the same handful of connections.
+    """
 
-    def __init__(self, db_path: str = "Database.Sqlite"):
+    def __init__(
+        self,
+        db_path: str = "Database.Sqlite",
+        synchronous: str = "NORMAL",
+        cache_size: int = -8000,
+        mmap_size: int = 0,
+        busy_timeout: int = 5000,
+        pool_size: int = 8,
+    ):
         self.db_path = db_path
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = int(busy_timeout)
+        self.pool_size = int(pool_size)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: list[sqlite3.Connection] = []
+        self._pid = os.getpid()
+        self.connections_opened = 0
 
+    @classmethod
+    def from_env(cls, db_path: str) -> "DB_Connections":
+        return cls(
+            db_path,
+            synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+            cache_size=int(os.getenv("DB_CACHE_SIZE", "-8000")),
+            mmap_size=int(os.getenv("DB_MMAP_SIZE", "0")),
+            busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+            pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
+        )
 
     def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(
             self.db_path,
-            detect_types=sqlite3.PARSE_DECLTYPES
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=self.busy_timeout / 1000,
+            isolation_level=None,
+            check_same_thread=False,
         )
 
-
         conn.row_factory = sqlite3.Row
+        conn.create_function("ip_in_subnet", 2, _ip_in_subnet, deterministic=True)
 
         conn.execute("PRAGMA foreign_keys = ON;")
         conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous};")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size};")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size};")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout};")
 
+        self.connections_opened += 1
+        metrics.connections_opened.inc()
         return conn
 
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked (e.g. WSGI pre-fork): never share the parent's handles
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
     @contextmanager
-    def transaction(self):
+    def transaction(self, immediate: bool = False):
+        """
+        immediate=True takes the write lock up front (BEGIN IMMEDIATE). Writers
+        that read first need it: a deferred transaction that has to upgrade to
+        a write lock after another connection committed fails with "database
+        is locked" right away instead of waiting busy_timeout.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # nested call on the same thread joins the outer transaction
+            yield held
+            return
 
-        conn = self._connect()
+        conn = self._acquire()
+        self._local.conn = conn
         try:
-            conn.execute("BEGIN;")
+            conn.execute("BEGIN IMMEDIATE;" if immediate else "BEGIN;")
             yield conn
             conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
         finally:
-            conn.close()
+            # anything that did not reach commit() is rolled back before reuse
+            if conn.in_transaction:
+                conn.rollback()
+            self._local.conn = None
+            self._release(conn)
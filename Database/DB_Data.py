@@ -1,11 +1,22 @@
 # Database/DB_Data.py
 from __future__ import annotations
 
+import ipaddress
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from Database.DB_Connections import DB_Connections
+import events
+import metrics
 
-_db = DB_Connections("Database/SqliteDB")
+DB_PATH = os.getenv("DB_PATH", "Database/SqliteDB")
+_db = DB_Connections.from_env(DB_PATH)
 
 DK_TZ = ZoneInfo("Europe/Copenhagen")
 
@@ -24,6 +35,18 @@ def _now_sqlite() -> str:
     return _to_sqlite(_now_dt_dk())
 
 
+def _to_epoch(value: str | int | float | None) -> int:
+    # history tables use epoch seconds; naive datetimes are DK local time like the rest
+    if value is None:
+        return int(time.time())
+    if isinstance(value, (int, float)) or str(value).strip().isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(str(value).strip())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=DK_TZ)
+    return int(dt.timestamp())
+
+
 def _fetch_all(sql: str, params: tuple = ()) -> list[dict]:
     with _db.transaction() as conn:
         cur = conn.execute(sql, params)
@@ -31,28 +54,190 @@ def _fetch_all(sql: str, params: tuple = ()) -> list[dict]:
         return [dict(r) for r in rows]
 
 
-def _run(sql: str, params: tuple = ()) -> None:
-    with _db.transaction() as conn:
+def _run(sql: str, params: tuple = (), touch: tuple[str, ...] = ()) -> None:
+    with _db.transaction(immediate=True) as conn:
         conn.execute(sql, params)
+        if touch:
+            _bump_version(conn, *touch)
+    if touch:
+        _devices_changed(*touch)
+
+
+# --- table versions (cheap change detection for ETag / polling) ---
+
+def _bump_version(conn, *tables: str) -> None:
+    # one row write per table per transaction, however many rows changed
+    conn.executemany(
+        """
+        INSERT INTO TableVersions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """,
+        [(t,) for t in tables],
+    )
+
+
+# events raised inside ingest_batches' transaction wait here until it commits
+_deferred = threading.local()
+
+
+def _publish(kind: str, payload: dict) -> None:
+    pending = getattr(_deferred, "events", None)
+    if pending is not None:
+        pending.append((kind, payload))
+    else:
+        events.publish(kind, payload)
+
+
+def _devices_changed(*tables: str) -> None:
+    # after commit: /scans/stream clients refetch the lists (with their ETag) instead of polling
+    _publish("devices-changed", {"tables": list(tables)})
+
+
+def close_connections() -> None:
+    # process shutdown; the pool reopens connections if anything runs afterwards
+    _db.close_all()
+
+
+def get_table_version(table: str) -> int:
+    rows = _fetch_all("SELECT version FROM TableVersions WHERE name = ?", (table,))
+    return int(rows[0]["version"]) if rows else 0
+
+
+def get_user(username: str) -> dict | None:
+    rows = _fetch_all(
+        "SELECT username, password FROM Users WHERE username = ?",
+        (username,),
+    )
+    return rows[0] if rows else None
+
+
+# The two device lists are one table with an approval state; the list names
+# stay as the API / TableVersions keys.
+DEVICE_TABLES = ("ApprovedAddresses", "UnApprovedAddresses")
+DEVICE_STATES = {"ApprovedAddresses": "approved", "UnApprovedAddresses": "unapproved"}
+_STATE_TABLES = {state: table for table, state in DEVICE_STATES.items()}
+
+_DEVICE_COLUMNS = "mac_address, ip_address, description, vendor, first_seen, last_seen"
+
+# TableVersions key bumped only when devices leave the lists (state -> NULL); the
+# scanners' change detection does a full write after it moved, so they are listed again
+DEVICE_REMOVALS = "DeviceRemovals"
+
+
+def _device_key(mac_address: str, ip_address: str | None = None, require_ip: bool = False) -> tuple[str, str | None]:
+    mac = (mac_address or "").strip().lower()
+    ip = (ip_address or "").strip() or None
+    if not mac:
+        raise ValueError("mac_address is required")
+    if require_ip and not ip:
+        raise ValueError("ip_address is required")
+    return mac, ip
 
 
 def get_approved() -> list[dict]:
     return _fetch_all(
-        """
-        SELECT mac_address, ip_address, description, vendor, first_seen, last_seen
-        FROM ApprovedAddresses
-        ORDER BY last_seen DESC
+        f"""
+        SELECT {_DEVICE_COLUMNS}
+        FROM Devices
+        WHERE state = 'approved'
+        ORDER BY last_seen DESC, id DESC
         """
     )
 
 
 def get_unapproved() -> list[dict]:
     return _fetch_all(
+        f"""
+        SELECT {_DEVICE_COLUMNS}
+        FROM Devices
+        WHERE state = 'unapproved'
+        ORDER BY last_seen DESC, id DESC
         """
-        SELECT mac_address, ip_address, description, vendor, first_seen, last_seen
-        FROM UnApprovedAddresses
-        ORDER BY last_seen DESC
+    )
+
+
+def _device_filters(
+    state: str,
+    vendor: str | None = None,
+    subnet: str | None = None,
+    seen_since: str | None = None,
+) -> tuple[list[str], list]:
+    where = ["state = ?"]
+    params: list = [state]
+    if vendor:
+        where.append("vendor LIKE ?")
+        params.append(f"%{vendor.strip()}%")
+    if subnet:
+        # ValueError (-> 400) for a bad subnet instead of an empty list
+        network = ipaddress.ip_network(str(subnet).strip(), strict=False)
+        prefix = ".".join(str(network.network_address).split(".")[: min(network.prefixlen // 8, 3)])
+        if network.version == 4 and prefix:
+            # plain text range on the whole leading octets, so most rows never reach the Python UDF
+            where.append("ip_address >= ? AND ip_address < ?")
+            params.extend((prefix + ".", prefix + "/"))
+        where.append("ip_in_subnet(ip_address, ?)")
+        params.append(str(network))
+    if seen_since:
+        where.append("last_seen >= ?")
+        params.append(seen_since.strip())
+    return where, params
+
+
+def list_devices(
+    table: str,
+    limit: int = 100,
+    after: tuple[str, int] | None = None,
+    vendor: str | None = None,
+    subnet: str | None = None,
+    seen_since: str | None = None,
+) -> dict:
+    """
+    One page of a device list, newest first, keyset-paginated on (last_seen, id).
+    `after` is the `next_after` of the previous page.
+    """
+    if table not in DEVICE_TABLES:
+        raise ValueError(f"Unknown device table: {table}")
+
+    where, params = _device_filters(DEVICE_STATES[table], vendor, subnet, seen_since)
+    if after is not None:
+        where.append("(last_seen, id) < (?, ?)")
+        params += [after[0], int(after[1])]
+
+    limit = max(1, min(int(limit), 1000))
+    rows = _fetch_all(
+        f"""
+        SELECT id, {_DEVICE_COLUMNS}
+        FROM Devices
+        WHERE {" AND ".join(where)}
+        ORDER BY last_seen DESC, id DESC
+        LIMIT ?
+        """,
+        (*params, limit + 1),
+    )
+
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = [rows[-1]["last_seen"], rows[-1]["id"]]
+
+    for r in rows:
+        r.pop("id")
+    return {"items": rows, "next_after": next_after}
+
+
+def _bind_address(conn, mac: str, ip: str, seen_at: int) -> None:
+    normalized = _normalize_ip(ip)
+    if normalized is None:
+        return
+    address, family = normalized
+    conn.execute(
         """
+        INSERT INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+        SELECT id, ?, ?, ?, ? FROM Devices WHERE mac_address = ?
+        ON CONFLICT(device_id, address) DO UPDATE SET
+          last_seen = MAX(DeviceAddresses.last_seen, excluded.last_seen)
+        """,
+        (address, family, seen_at, seen_at, mac),
     )
 
 
@@ -64,166 +249,776 @@ def add_unapproved(
     first_seen: str | None = None,
     last_seen: str | None = None,
 ) -> None:
-    mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
-    if not mac:
-        raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
+    mac, ip = _device_key(mac_address, ip_address, require_ip=True)
 
     fs = first_seen or _now_sqlite()
     ls = last_seen or _now_sqlite()
 
-    # ✅ NYT: Hvis den allerede er approved, så opdater kun last_seen dér og stop.
-    approved_rows = get_approved()
-    is_approved = any(
-        (str(r.get("mac_address", "")).strip().lower() == mac)
-        and (str(r.get("ip_address", "")).strip() == ip)
-        for r in approved_rows
+    with _db.transaction(immediate=True) as conn:
+        # ✅ Er enheden allerede approved, forbliver den det; den får bare ny IP og last_seen.
+        # Point lookup on UNIQUE(mac_address) -> constant cost per device.
+        state = conn.execute(
+            """
+            INSERT INTO Devices (mac_address, state, ip_address, description, vendor, first_seen, last_seen)
+            VALUES (?, 'unapproved', ?, ?, ?, ?, ?)
+            ON CONFLICT(mac_address) DO UPDATE SET
+              state       = COALESCE(Devices.state, 'unapproved'),
+              ip_address  = excluded.ip_address,
+              description = COALESCE(excluded.description, Devices.description),
+              vendor      = COALESCE(excluded.vendor,      Devices.vendor),
+              first_seen  = CASE WHEN Devices.state IS NULL THEN excluded.first_seen
+                                 ELSE COALESCE(Devices.first_seen, excluded.first_seen) END,
+              last_seen   = excluded.last_seen
+            RETURNING state
+            """,
+            (mac, ip, description, vendor, fs, ls),
+        ).fetchone()["state"]
+        _bind_address(conn, mac, ip, _to_epoch(ls))
+        changed = _STATE_TABLES[state]
+        _bump_version(conn, changed, "DeviceAddresses")
+    _devices_changed(changed)
+
+
+def _record_scan(conn, scan_target: str, started_at: int, finished_at: int, device_count: int) -> int:
+    cur = conn.execute(
+        """
+        INSERT INTO Scans (scan_target, started_at, finished_at, device_count)
+        VALUES (?, ?, ?, ?)
+        """,
+        (scan_target, started_at, finished_at, device_count),
+    )
+    return cur.lastrowid
+
+
+def _record_sightings(conn, scan_id: int, seen_at: int) -> None:
+    # caller has filled temp.ScanResults and created the Devices rows
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO Sightings (device_id, seen_at, ip_address, scan_id)
+        SELECT d.id, ?, s.ip_address, ?
+        FROM temp.ScanResults s
+        JOIN Devices d ON d.mac_address = s.mac_address
+        """,
+        (seen_at, scan_id),
     )
 
-    if is_approved:
-        update_approved(mac_address=mac, ip_address=ip, last_seen=ls)
-        return
 
-    # ✅ ellers: normal unapproved upsert som før
-    _run(
+def _record_addresses(conn, seen_at: int) -> None:
+    # one DeviceAddresses row per (device, address), however often it is seen
+    conn.execute(
         """
-        INSERT INTO UnApprovedAddresses
-        (mac_address, ip_address, description, vendor, first_seen, last_seen)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(mac_address, ip_address) DO UPDATE SET
-          description = COALESCE(excluded.description, UnApprovedAddresses.description),
-          vendor      = COALESCE(excluded.vendor,      UnApprovedAddresses.vendor),
-          first_seen  = COALESCE(UnApprovedAddresses.first_seen, excluded.first_seen),
-          last_seen   = excluded.last_seen
+        INSERT INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+        SELECT d.id, s.ip_address, s.family, ?, ?
+        FROM temp.ScanResults s
+        JOIN Devices d ON d.mac_address = s.mac_address
+        WHERE true
+        ON CONFLICT(device_id, address) DO UPDATE SET
+          last_seen = MAX(DeviceAddresses.last_seen, excluded.last_seen)
         """,
-        (mac, ip, description, vendor, fs, ls),
+        (seen_at, seen_at),
     )
 
 
-def add_approved(
-    mac_address: str,
-    ip_address: str,
-    description: str | None = None,
-    vendor: str | None = None,
-    first_seen: str | None = None,
-    last_seen: str | None = None,
-) -> None:
+def _record_seen_again(conn, pairs: list[tuple[str, str]], last_seen: str, seen_at: int, scan_id: int | None) -> None:
+    # delta writes: devices seen again at the same address skip the upsert, only their times move
+    conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS SeenAgain (
+          mac_address TEXT NOT NULL,
+          ip_address  TEXT NOT NULL,
+          PRIMARY KEY (mac_address, ip_address)
+        )
+        """
+    )
+    conn.execute("DELETE FROM temp.SeenAgain")
+    conn.executemany("INSERT OR IGNORE INTO temp.SeenAgain (mac_address, ip_address) VALUES (?, ?)", pairs)
+    conn.execute(
+        """
+        UPDATE Devices SET last_seen = ?
+        WHERE state IS NOT NULL AND mac_address IN (SELECT mac_address FROM temp.SeenAgain)
+        """,
+        (last_seen,),
+    )
+    conn.execute(
+        """
+        UPDATE DeviceAddresses SET last_seen = MAX(last_seen, ?)
+        WHERE (device_id, address) IN (
+          SELECT d.id, s.ip_address FROM temp.SeenAgain s JOIN Devices d ON d.mac_address = s.mac_address
+        )
+        """,
+        (seen_at,),
+    )
+    if scan_id is not None:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO Sightings (device_id, seen_at, ip_address, scan_id)
+            SELECT d.id, ?, s.ip_address, ?
+            FROM temp.SeenAgain s
+            JOIN Devices d ON d.mac_address = s.mac_address
+            """,
+            (seen_at, scan_id),
+        )
+    conn.execute("DELETE FROM temp.SeenAgain")
+
+
+def _normalize_ip(ip: str) -> tuple[str, int] | None:
+    # IPv6 has many spellings of one address; stored compressed so they meet in one row
+    if ":" not in ip:
+        return ip, 4
+    try:
+        return ipaddress.IPv6Address(ip.split("%")[0]).compressed, 6
+    except ValueError:
+        return None
+
+
+def _address_rank(ip: str, family: int) -> tuple:
+    # which of a device's addresses in one scan becomes Devices.ip_address
+    return (family != 4, ip.startswith("fe80:"), ip)
+
+
+def ingest_scan(
+    results: list[dict],
+    seen_at: str | None = None,
+    scan_target: str | None = None,
+    started_at: float | None = None,
+    unchanged=(),
+) -> dict:
+    """
+    Classify and upsert a whole scan in one transaction.
+
+    `results` is the scanner format: [{"IP": ..., "MAC": ..., "VENDOR": ...}].
+    Devices are matched on MAC: a known device (approved or unapproved) gets
+    its current address and last_seen updated in place, a MAC that is not
+    listed becomes one new unapproved device. When a device answers with
+    several addresses (dual-stack, NDP) the IPv4 one, else a global IPv6 one,
+    becomes its current address (an NDP scan keeps a known IPv4 address);
+    all of them go to DeviceAddresses. With a
+    scan_target the scan and its sightings are appended to the observation
+    history in the same transaction.
+
+    `unchanged` are (mac, ip) pairs of a delta write that were seen again at
+    the same address: they are not upserted or classified, only last_seen
+    and their sightings are written, and they count in the Scans row.
+    """
+    ls = seen_at or _now_sqlite()
+    seen_epoch = _to_epoch(seen_at)
+    started_epoch = int(started_at) if started_at is not None else seen_epoch
+
+    # dedupe inside the scan (same pair can be answered twice)
+    rows: dict[tuple[str, str], list] = {}
+    preferred: dict[str, tuple] = {}
+    for r in results:
+        mac = str(r.get("MAC") or "").strip().lower()
+        ip = str(r.get("IP") or "").strip()
+        if not mac or not ip:
+            continue
+        normalized = _normalize_ip(ip)
+        if normalized is None:
+            continue
+        ip, family = normalized
+        rows[(mac, ip)] = [mac, ip, r.get("VENDOR"), family, 0]
+        rank = _address_rank(ip, family)
+        if mac not in preferred or rank < preferred[mac]:
+            preferred[mac] = rank
+    for mac, rank in preferred.items():
+        rows[(mac, rank[-1])][4] = 1
+
+    seen_again = []
+    for mac, ip in unchanged:
+        normalized = _normalize_ip(str(ip).strip())
+        if mac and normalized is not None and (mac, normalized[0]) not in rows:
+            seen_again.append((mac, normalized[0]))
+
+    if not rows:
+        scan_id = None
+        if scan_target or seen_again:
+            with _db.transaction(immediate=True) as conn:
+                if scan_target:
+                    scan_id = _record_scan(conn, scan_target, started_epoch, seen_epoch, len(seen_again))
+                if seen_again:
+                    _record_seen_again(conn, seen_again, ls, seen_epoch, scan_id)
+                    # last_seen moved, so do the list ETags; no devices-changed event for that alone
+                    _bump_version(conn, "ApprovedAddresses", "UnApprovedAddresses", "DeviceAddresses")
+        return {"ok": True, "seen": 0, "approved": 0, "unapproved": 0, "new_unapproved": [], "scan_id": scan_id}
+
+    with _db.transaction(immediate=True) as conn:
+        conn.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS ScanResults (
+              mac_address TEXT NOT NULL,
+              ip_address  TEXT NOT NULL,
+              vendor      TEXT,
+              family      INTEGER NOT NULL,
+              preferred   INTEGER NOT NULL,
+              PRIMARY KEY (mac_address, ip_address)
+            )
+            """
+        )
+        conn.execute("DELETE FROM temp.ScanResults")
+        conn.executemany(
+            """
+            INSERT INTO temp.ScanResults (mac_address, ip_address, vendor, family, preferred)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            list(rows.values()),
+        )
+
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO Devices (mac_address)
+            SELECT mac_address FROM temp.ScanResults WHERE preferred = 1
+            """
+        )
+
+        # before the update: devices that are not listed yet (new, or removed earlier)
+        new_rows = conn.execute(
+            """
+            SELECT s.mac_address, s.ip_address, COALESCE(s.vendor, d.vendor) AS vendor, ? AS first_seen
+            FROM temp.ScanResults s
+            JOIN Devices d ON d.mac_address = s.mac_address
+            WHERE s.preferred = 1 AND d.state IS NULL
+            """,
+            (ls,),
+        ).fetchall()
+        approved = conn.execute(
+            """
+            SELECT COUNT(*)
+            FROM temp.ScanResults s
+            JOIN Devices d ON d.mac_address = s.mac_address
+            WHERE s.preferred = 1 AND d.state = 'approved'
+            """
+        ).fetchone()[0]
+
+        # one row per device: a new IP from DHCP is an update, not a new (unapproved) row
+        conn.execute(
+            """
+            UPDATE Devices
+            SET
+              state      = COALESCE(Devices.state, 'unapproved'),
+              -- an NDP scan doesn't replace the IPv4 address of a dual-stack device
+              ip_address = CASE WHEN s.family = 6 AND instr(Devices.ip_address, '.') THEN Devices.ip_address
+                                ELSE s.ip_address END,
+              vendor     = CASE WHEN Devices.state = 'approved' THEN COALESCE(Devices.vendor, s.vendor)
+                                ELSE COALESCE(s.vendor, Devices.vendor) END,
+              first_seen = CASE WHEN Devices.state IS NULL THEN ?
+                                ELSE COALESCE(Devices.first_seen, ?) END,
+              last_seen  = ?
+            FROM temp.ScanResults s
+            WHERE s.preferred = 1 AND s.mac_address = Devices.mac_address
+            """,
+            (ls, ls, ls),
+        )
+        _record_addresses(conn, seen_epoch)
+
+        scan_id = None
+        if scan_target:
+            scan_id = _record_scan(conn, scan_target, started_epoch, seen_epoch, len(rows) + len(seen_again))
+            _record_sightings(conn, scan_id, seen_epoch)
+        if seen_again:
+            _record_seen_again(conn, seen_again, ls, seen_epoch, scan_id)
+
+        conn.execute("DELETE FROM temp.ScanResults")
+        _bump_version(conn, "ApprovedAddresses", "UnApprovedAddresses", "DeviceAddresses")
+
+    devices = len(preferred)
+    metrics.rows_upserted.inc(devices, table="Devices")
+    metrics.rows_upserted.inc(len(rows), table="DeviceAddresses")
+    _devices_changed("ApprovedAddresses", "UnApprovedAddresses")
+    if new_rows:
+        _publish("new-unapproved", {
+            "scan_target": scan_target,
+            "devices": [dict(r) for r in new_rows],
+        })
+    return {
+        "ok": True,
+        "seen": devices,
+        "approved": approved,
+        "unapproved": devices - approved,
+        "addresses": len(rows),
+        "new_unapproved": [dict(r) for r in new_rows],
+        "scan_id": scan_id,
+    }
+
+
+def known_addresses(prefix: str, max_age_days: int = 30) -> list[str]:
+    """Addresses seen in `prefix` in the last `max_age_days` (NDP solicits these directly)."""
+    try:
+        net = ipaddress.ip_network(prefix.strip(), strict=False)
+    except ValueError:
+        return []
+    rows = _fetch_all(
+        """
+        SELECT DISTINCT address FROM DeviceAddresses
+        WHERE family = ? AND last_seen >= ? AND ip_in_subnet(address, ?)
+        """,
+        (net.version, int(time.time()) - int(max_age_days) * 86400, str(net)),
+    )
+    return [r["address"] for r in rows]
+
+
+def get_device_addresses(mac_address: str) -> dict:
     mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
     if not mac:
         raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
 
-    fs = first_seen or _now_sqlite()
-    ls = last_seen or _now_sqlite()
-
-    _run(
+    rows = _fetch_all(
         """
-        INSERT INTO ApprovedAddresses (mac_address, ip_address, description, vendor, first_seen, last_seen)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(mac_address, ip_address) DO UPDATE SET
-          description = COALESCE(excluded.description, ApprovedAddresses.description),
-          vendor      = COALESCE(excluded.vendor,      ApprovedAddresses.vendor),
-          first_seen  = COALESCE(ApprovedAddresses.first_seen, excluded.first_seen),
-          last_seen   = excluded.last_seen
+        SELECT a.address, a.family, a.first_seen, a.last_seen
+        FROM Devices d
+        JOIN DeviceAddresses a ON a.device_id = d.id
+        WHERE d.mac_address = ?
+        ORDER BY a.family, a.last_seen DESC
         """,
-        (mac, ip, description, vendor, fs, ls),
+        (mac,),
     )
-    
-    _run(
-        "DELETE FROM UnApprovedAddresses WHERE mac_address = ? AND ip_address = ?",
-        (mac, ip),
+    for r in rows:
+        ip = ipaddress.ip_address(r["address"])
+        r["scope"] = "link-local" if ip.is_link_local else "private" if ip.is_private else "global"
+    return {"mac_address": mac, "addresses": rows}
+
+
+def ingest_batches(batches: list[dict]) -> list[dict]:
+    """
+    Writes remote scan batches (from /dataIngression) in one transaction.
+
+    Each batch is {"key", "target", "scanned_at", "started_at", "devices"}
+    with devices in the scanner format. A batch whose idempotency key is
+    already in IngestBatches is skipped; the key is claimed in the same
+    transaction, so a batch is written exactly once. Returns one result per
+    batch: status "written" plus the ingest_scan() summary, or "duplicate".
+    """
+    received_at = int(time.time())
+    out = []
+    agents = {}
+    # a group that rolls back (and is retried batch by batch) must not have announced anything
+    _deferred.events = []
+    try:
+        with _db.transaction(immediate=True) as conn:
+            _write_batches(conn, batches, received_at, out, agents)
+        pending = _deferred.events
+    finally:
+        _deferred.events = None
+
+    changed = sorted({t for kind, payload in pending if kind == "devices-changed" for t in payload["tables"]})
+    if changed:
+        _devices_changed(*changed)
+    for kind, payload in pending:
+        if kind != "devices-changed":
+            events.publish(kind, payload)
+    return out
+
+
+def _write_batches(conn, batches: list[dict], received_at: int, out: list[dict], agents: dict) -> None:
+    for batch in batches:
+        key = batch.get("key")
+        agent = batch.get("agent") or {}
+        if agent.get("agent_id"):
+            agents[agent["agent_id"]] = agent
+        # keyless batches are logged too (never deduplicated) so agent throughput covers them
+        claimed = conn.execute(
+            """
+            INSERT OR IGNORE INTO IngestBatches (key, received_at, device_count, agent_id, bytes)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                key if key is not None else f"auto:{uuid.uuid4().hex}",
+                received_at,
+                len(batch["devices"]),
+                agent.get("agent_id"),
+                int(batch.get("bytes") or 0),
+            ),
+        ).rowcount
+        if not claimed:
+            out.append({"key": key, "status": "duplicate"})
+            continue
+
+        # sensors send epoch or ISO (with or without offset); stored as DK local time like the rest
+        seen_epoch = _to_epoch(batch.get("scanned_at"))
+        summary = ingest_scan(
+            batch["devices"],
+            seen_at=_to_sqlite(datetime.fromtimestamp(seen_epoch, DK_TZ)),
+            scan_target=batch["target"],
+            started_at=_to_epoch(batch["started_at"]) if batch.get("started_at") is not None else None,
+        )
+        if key is not None and summary["scan_id"] is not None:
+            conn.execute("UPDATE IngestBatches SET scan_id = ? WHERE key = ?", (summary["scan_id"], key))
+        out.append({"key": key, "status": "written", **summary})
+    if agents:
+        _upsert_agents(conn, list(agents.values()), received_at, with_batch=True)
+
+
+# --- remote agents -------------------------------------------------------
+
+def _upsert_agents(conn, agents: list[dict], now: int, with_batch: bool = False) -> None:
+    conn.executemany(
+        """
+        INSERT INTO Agents (agent_id, hostname, version, address, first_seen, last_heartbeat, last_batch_at, spooled)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(agent_id) DO UPDATE SET
+          hostname       = COALESCE(excluded.hostname, Agents.hostname),
+          version        = COALESCE(excluded.version,  Agents.version),
+          address        = COALESCE(excluded.address,  Agents.address),
+          last_heartbeat = MAX(excluded.last_heartbeat, Agents.last_heartbeat),
+          last_batch_at  = COALESCE(excluded.last_batch_at, Agents.last_batch_at),
+          spooled        = COALESCE(excluded.spooled, Agents.spooled)
+        """,
+        [
+            (
+                a["agent_id"],
+                a.get("hostname"),
+                a.get("version"),
+                a.get("address"),
+                now,
+                int(a.get("seen_at") or now),
+                now if with_batch else None,
+                a.get("spooled"),
+            )
+            for a in agents
+        ],
     )
 
 
-def update_unapproved(
+def record_agent_heartbeats(agents: list[dict]) -> None:
+    """agents: [{"agent_id", "hostname", "version", "address", "spooled", "seen_at"}]"""
+    if not agents:
+        return
+    with _db.transaction(immediate=True) as conn:
+        _upsert_agents(conn, agents, int(time.time()))
+
+
+def get_agents(window_seconds: int = 3600, offline_after: int = 300) -> list[dict]:
+    """Every agent with its last heartbeat and batches/devices/bytes over the last window_seconds."""
+    now = int(time.time())
+    rows = _fetch_all(
+        """
+        SELECT a.agent_id, a.hostname, a.version, a.address, a.first_seen, a.last_heartbeat,
+               a.last_batch_at, a.spooled,
+               COALESCE(b.batches, 0) AS batches,
+               COALESCE(b.devices, 0) AS devices,
+               COALESCE(b.bytes, 0)   AS bytes
+        FROM Agents a
+        LEFT JOIN (
+          SELECT agent_id, COUNT(*) AS batches, SUM(device_count) AS devices, SUM(bytes) AS bytes
+          FROM IngestBatches
+          WHERE agent_id IS NOT NULL AND received_at >= ?
+          GROUP BY agent_id
+        ) b ON b.agent_id = a.agent_id
+        ORDER BY a.agent_id
+        """,
+        (now - int(window_seconds),),
+    )
+    minutes = max(1.0, window_seconds / 60)
+    for r in rows:
+        r["online"] = now - r["last_heartbeat"] <= offline_after
+        r["window_seconds"] = int(window_seconds)
+        r["batches_per_min"] = round(r["batches"] / minutes, 2)
+        r["devices_per_min"] = round(r["devices"] / minutes, 2)
+    return rows
+
+
+def prune_ingest_batches(older_than_seconds: int) -> int:
+    """Forgets idempotency keys older than the window sensors may re-send in."""
+    cutoff = int(time.time()) - int(older_than_seconds)
+    with _db.transaction(immediate=True) as conn:
+        return conn.execute("DELETE FROM IngestBatches WHERE received_at < ?", (cutoff,)).rowcount
+
+
+def add_approved(
     mac_address: str,
-    ip_address: str,
+    ip_address: str | None = None,
     description: str | None = None,
     vendor: str | None = None,
     first_seen: str | None = None,
     last_seen: str | None = None,
 ) -> None:
-    mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
-    if not mac:
-        raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
+    """Approves the device (by MAC, whatever its address); one upsert, one transaction."""
+    mac, ip = _device_key(mac_address, ip_address)
 
+    fs = first_seen or _now_sqlite()
     ls = last_seen or _now_sqlite()
 
+    with _db.transaction(immediate=True) as conn:
+        conn.execute(
+            """
+            INSERT INTO Devices (mac_address, state, ip_address, description, vendor, first_seen, last_seen)
+            VALUES (?, 'approved', ?, ?, ?, ?, ?)
+            ON CONFLICT(mac_address) DO UPDATE SET
+              state       = 'approved',
+              ip_address  = COALESCE(excluded.ip_address, Devices.ip_address),
+              description = COALESCE(excluded.description, Devices.description),
+              vendor      = COALESCE(excluded.vendor,      Devices.vendor),
+              first_seen  = COALESCE(Devices.first_seen, excluded.first_seen),
+              last_seen   = COALESCE(?, Devices.last_seen, excluded.last_seen)
+            """,
+            (mac, ip, description, vendor, fs, ls, last_seen),
+        )
+        if ip:
+            _bind_address(conn, mac, ip, _to_epoch(ls))
+        _bump_version(conn, "ApprovedAddresses", "UnApprovedAddresses")
+    _devices_changed("ApprovedAddresses", "UnApprovedAddresses")
+
+
+def _update_device(
+    state: str,
+    mac_address: str,
+    description: str | None,
+    vendor: str | None,
+    first_seen: str | None,
+    last_seen: str | None,
+) -> None:
+    mac, _ = _device_key(mac_address)
+
     _run(
         """
-        UPDATE UnApprovedAddresses
+        UPDATE Devices
         SET
           description = COALESCE(?, description),
           vendor      = COALESCE(?, vendor),
           first_seen  = COALESCE(?, first_seen),
           last_seen   = COALESCE(?, last_seen)
-        WHERE mac_address = ? AND ip_address = ?
+        WHERE mac_address = ? AND state = ?
         """,
-        (description, vendor, first_seen, ls, mac, ip),
+        (description, vendor, first_seen, last_seen or _now_sqlite(), mac, state),
+        touch=(_STATE_TABLES[state],),
     )
 
 
+def update_unapproved(
+    mac_address: str,
+    ip_address: str | None = None,
+    description: str | None = None,
+    vendor: str | None = None,
+    first_seen: str | None = None,
+    last_seen: str | None = None,
+) -> None:
+    _update_device("unapproved", mac_address, description, vendor, first_seen, last_seen)
+
+
 def update_approved(
     mac_address: str,
-    ip_address: str,
+    ip_address: str | None = None,
     description: str | None = None,
     vendor: str | None = None,
     first_seen: str | None = None,
     last_seen: str | None = None,
 ) -> None:
-    mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
-    if not mac:
-        raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
+    _update_device("approved", mac_address, description, vendor, first_seen, last_seen)
 
-    ls = last_seen or _now_sqlite()
+
+def remove_approved(mac_address: str, ip_address: str | None = None) -> None:
+    """Takes the approval back: the device moves to the unapproved list (no new alert)."""
+    mac, _ = _device_key(mac_address, ip_address)
 
     _run(
-        """
-        UPDATE ApprovedAddresses
-        SET
-          description = COALESCE(?, description),
-          vendor      = COALESCE(?, vendor),
-          first_seen  = COALESCE(?, first_seen),
-          last_seen   = COALESCE(?, last_seen)
-        WHERE mac_address = ? AND ip_address = ?
-        """,
-        (description, vendor, first_seen, ls, mac, ip),
+        "UPDATE Devices SET state = 'unapproved' WHERE mac_address = ? AND state = 'approved'",
+        (mac,),
+        touch=("ApprovedAddresses", "UnApprovedAddresses"),
     )
 
 
-def remove_approved(mac_address: str, ip_address: str) -> None:
-    mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
-    if not mac:
-        raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
+def remove_unapproved(mac_address: str, ip_address: str | None = None) -> None:
+    """Drops the device from the lists; its history stays, and the next sighting lists it as new."""
+    mac, _ = _device_key(mac_address, ip_address)
 
-    _run("DELETE FROM ApprovedAddresses WHERE mac_address = ? AND ip_address = ?", (mac, ip))
+    with _db.transaction(immediate=True) as conn:
+        conn.execute("UPDATE Devices SET state = NULL WHERE mac_address = ? AND state = 'unapproved'", (mac,))
+        _bump_version(conn, "UnApprovedAddresses", DEVICE_REMOVALS)
+    _devices_changed("UnApprovedAddresses")
 
 
-def remove_unapproved(mac_address: str, ip_address: str) -> None:
-    mac = (mac_address or "").strip().lower()
-    ip = (ip_address or "").strip()
-    if not mac:
-        raise ValueError("mac_address is required")
-    if not ip:
-        raise ValueError("ip_address is required")
+# --- bulk triage ---
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+
+# action -> (state a device must have, new state, per-item status, lists touched);
+# approve takes any MAC by items (also unknown ones, like add_approved), a filter
+# only matches the unapproved list
+_BULK_ACTIONS = {
+    "approve": (None, "approved", "approved", ("ApprovedAddresses", "UnApprovedAddresses")),
+    "unapprove": ("approved", "unapproved", "unapproved", ("ApprovedAddresses", "UnApprovedAddresses")),
+    "remove": ("unapproved", None, "removed", ("UnApprovedAddresses",)),
+}
+
 
-    _run("DELETE FROM UnApprovedAddresses WHERE mac_address = ? AND ip_address = ?", (mac, ip))
+_MAC_RE = re.compile(r"^[0-9a-f]{2}(:[0-9a-f]{2}){5}$")
 
 
-def planScan(interval: int, scan_target: str, last_scanned_at: str | None = None) -> dict:
+def _valid_ip(ip: str) -> bool:
+    try:
+        ipaddress.ip_address(ip.split("%")[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _bulk_items(items) -> tuple[list[dict], list[tuple[int, str, str | None, str | None]]]:
+    # results in request order; invalid entries are answered here and never reach the DB
+    if not isinstance(items, list):
+        raise ValueError("items must be a list")
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f"At most {BULK_MAX_ITEMS} items per request")
+    results: list[dict] = []
+    valid = []
+    seen: set[str] = set()
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"mac_address": item}
+        if not isinstance(item, dict):
+            results.append({"mac_address": None, "status": "invalid", "error": "item must be an object or a MAC"})
+            continue
+        raw = str(item.get("mac_address") or "").strip()
+        mac = raw.lower().replace("-", ":")
+        ip = str(item.get("ip_address") or "").strip() or None
+        description = item.get("description")
+        result = {"mac_address": mac if _MAC_RE.match(mac) else raw or None}
+        results.append(result)
+        if not mac:
+            result.update(status="invalid", error="mac_address is required")
+        elif not _MAC_RE.match(mac):
+            result.update(status="invalid", error=f"invalid mac_address {raw}")
+        elif ip is not None and not _valid_ip(ip):
+            result.update(status="invalid", error=f"invalid ip_address {ip}")
+        elif description is not None and not isinstance(description, str):
+            result.update(status="invalid", error="description must be a string")
+        elif mac in seen:
+            result.update(status="duplicate")
+        else:
+            seen.add(mac)
+            valid.append((i, mac, ip, description))
+    return results, valid
+
+
+def _bulk_filter(conn, source: str, flt) -> tuple[list[dict], list[tuple[int, str, str | None, str | None]]]:
+    if not isinstance(flt, dict):
+        raise ValueError("filter must be an object")
+    vendor, subnet, seen_since = flt.get("vendor"), flt.get("subnet"), flt.get("seen_since")
+    if not (vendor or subnet or seen_since):
+        raise ValueError("filter needs at least one of vendor, subnet, seen_since")
+    where, params = _device_filters(source, vendor, subnet, seen_since)
+    rows = conn.execute(
+        f"SELECT mac_address FROM Devices WHERE {' AND '.join(where)} ORDER BY mac_address LIMIT ?",
+        (*params, BULK_MAX_ITEMS + 1),
+    ).fetchall()
+    if len(rows) > BULK_MAX_ITEMS:
+        raise ValueError(f"filter matches more than {BULK_MAX_ITEMS} devices")
+    results = [{"mac_address": r["mac_address"]} for r in rows]
+    return results, [(i, r["mac_address"], None, None) for i, r in enumerate(rows)]
+
+
+def bulk_update_devices(action: str, items=None, filter=None, dry_run: bool = False) -> dict:
+    """
+    Approves / unapproves / removes many devices in one transaction.
+
+    Either `items` (MACs or {mac_address, ip_address?, description?}) or a
+    `filter` ({vendor?, subnet?, seen_since?} over the list the action works
+    on). Every item gets a status: the action's own ("approved", "unapproved",
+    "removed"), "created" (approve of a MAC never seen), "unchanged",
+    "not_found", "duplicate" or "invalid". dry_run answers the same without
+    writing.
+    """
+    if action not in _BULK_ACTIONS:
+        raise ValueError(f"Unknown bulk action {action}")
+    if (items is None) == (filter is None):
+        raise ValueError("Send either items or filter")
+    source, target, done, touch = _BULK_ACTIONS[action]
+    now = _now_sqlite()
+
+    with _db.transaction(immediate=not dry_run) as conn:
+        if items is not None:
+            results, valid = _bulk_items(items)
+        else:
+            results, valid = _bulk_filter(conn, source or "unapproved", filter)
+
+        # current state of every requested MAC in one query
+        macs = [mac for _, mac, _, _ in valid]
+        current = {
+            r["mac_address"]: r["state"]
+            for r in conn.execute(
+                "SELECT mac_address, state FROM Devices WHERE mac_address IN (SELECT value FROM json_each(?))",
+                (json.dumps(macs),),
+            )
+        }
+
+        writes = []
+        for i, mac, ip, description in valid:
+            state = current.get(mac, "missing")
+            if action == "approve":
+                if state == "approved":
+                    status = "unchanged"
+                else:
+                    status = "created" if state == "missing" else done
+                if status != "unchanged" or ip or description is not None:
+                    writes.append((mac, ip, description))
+            elif state == source:
+                status = done
+                writes.append((mac,))
+            else:
+                status = "not_found"
+            results[i]["status"] = status
+
+        changed = sum(1 for r in results if r.get("status") in (done, "created"))
+        if writes and not dry_run:
+            if action == "approve":
+                conn.executemany(
+                    """
+                    INSERT INTO Devices (mac_address, state, ip_address, description, first_seen, last_seen)
+                    VALUES (?, 'approved', ?, ?, ?, ?)
+                    ON CONFLICT(mac_address) DO UPDATE SET
+                      state       = 'approved',
+                      ip_address  = COALESCE(excluded.ip_address, Devices.ip_address),
+                      description = COALESCE(excluded.description, Devices.description),
+                      first_seen  = COALESCE(Devices.first_seen, excluded.first_seen),
+                      last_seen   = COALESCE(Devices.last_seen, excluded.last_seen)
+                    """,
+                    [(mac, ip, description, now, now) for mac, ip, description in writes],
+                )
+                seen_at = _to_epoch(now)
+                for mac, ip, _ in writes:
+                    if ip:
+                        _bind_address(conn, mac, ip, seen_at)
+            else:
+                conn.executemany(
+                    "UPDATE Devices SET state = ? WHERE mac_address = ? AND state = ?",
+                    [(target, mac, source) for (mac,) in writes],
+                )
+            _bump_version(conn, *touch, *((DEVICE_REMOVALS,) if target is None else ()))
+
+    if writes and not dry_run:
+        _devices_changed(*touch)
+    return {
+        "ok": True,
+        "action": action,
+        "dry_run": bool(dry_run),
+        "matched": len(valid),
+        "changed": changed,
+        "results": results,
+    }
+
+
+# --- planned scans ---
+
+_schedule_listeners: list = []
+
+
+def on_schedule_change(fn) -> None:
+    """fn() is called after anything that can move a next_scan_at (the scheduler wakes on it)."""
+    _schedule_listeners.append(fn)
+
+
+def _schedule_changed() -> None:
+    for fn in list(_schedule_listeners):
+        try:
+            fn()
+        except Exception as e:
+            print(f"[db] ERROR in schedule listener: {e}")
+
+
+SCAN_JITTER_SECONDS = int(os.getenv("SCAN_JITTER_SECONDS", "30"))
+
+_PLAN_COLUMNS = "id, interval, last_scanned_at, next_scan_at, scan_target, timeout, retries, rate, jitter"
+
+
+def _parse_interval(interval) -> int:
     if interval is None:
         raise ValueError("interval is required")
 
@@ -234,36 +1029,143 @@ def planScan(interval: int, scan_target: str, last_scanned_at: str | None = None
 
     if interval_int <= 0:
         raise ValueError("interval must be > 0")
+    return interval_int
+
+
+def _parse_scan_id(scan_id) -> int:
+    try:
+        return int(scan_id)
+    except (TypeError, ValueError):
+        raise ValueError("id must be an integer")
+
+
+def _parse_plan_options(options: dict) -> dict:
+    """timeout/retries/rate/jitter from a request; missing or null means "use the default"."""
+    out = {}
+    for name, cast, minimum in (
+        ("timeout", float, 0.0),
+        ("retries", int, 0),
+        ("rate", float, 0.0),
+        ("jitter", int, 0),
+    ):
+        value = options.get(name)
+        if value is None or value == "":
+            out[name] = None
+            continue
+        try:
+            value = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if value < minimum or (name == "timeout" and value == 0):
+            raise ValueError(f"{name} must be {'> 0' if name == 'timeout' else '>= 0'}")
+        out[name] = value
+    return out
+
+
+def _next_scan_sql(from_dt: datetime, interval_minutes: int, jitter: int | None) -> str:
+    # spreads plans with the same interval so they don't all start in the same second
+    spread = SCAN_JITTER_SECONDS if jitter is None else jitter
+    delay = timedelta(minutes=interval_minutes, seconds=random.uniform(0, spread) if spread > 0 else 0)
+    return _to_sqlite(from_dt + delay)
+
+
+def scan_options(plan: dict) -> dict:
+    """run_scan() keyword arguments for a planned scan row."""
+    options = {}
+    if plan.get("timeout") is not None:
+        options["timeout"] = float(plan["timeout"])
+    if plan.get("retries") is not None:
+        options["rounds"] = int(plan["retries"]) + 1
+    if plan.get("rate") is not None:
+        options["rate"] = float(plan["rate"])
+    # only the adaptive sweep retries and paces, so asking for either selects it
+    if "rounds" in options or "rate" in options:
+        options["engine"] = "adaptive"
+    return options
+
+
+def planScan(
+    interval: int,
+    scan_target: str,
+    last_scanned_at: str | None = None,
+    **options,
+) -> dict:
+    interval_int = _parse_interval(interval)
 
     target = (scan_target or "").strip()
     if not target:
         raise ValueError("scan_target is required")
 
-    # DK-tid (timezone-aware)
-    now_dt = _now_dt_dk()
-    next_dt = now_dt + timedelta(minutes=interval_int)
+    opts = _parse_plan_options(options)
 
     # last_scanned_at kan være None ved første planlægning
     last_sql = last_scanned_at
-    next_sql = _to_sqlite(next_dt)
-
-    _run(
-        """
-        INSERT INTO PlannedScans (interval, last_scanned_at, next_scan_at, scan_target)
-        VALUES (?, ?, ?, ?)
-        """,
-        (interval_int, last_sql, next_sql, target),
-    )
+    next_sql = _next_scan_sql(_now_dt_dk(), interval_int, opts["jitter"])
+
+    with _db.transaction(immediate=True) as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO PlannedScans
+                (interval, last_scanned_at, next_scan_at, scan_target, timeout, retries, rate, jitter)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (interval_int, last_sql, next_sql, target,
+             opts["timeout"], opts["retries"], opts["rate"], opts["jitter"]),
+        )
+        scan_id = cur.lastrowid
+    _schedule_changed()
 
     return {
         "ok": True,
+        "id": scan_id,
         "interval": interval_int,
         "last_scanned_at": last_sql,
         "next_scan_at": next_sql,
         "scan_target": target,
+        **opts,
     }
 
 
+def get_planned_scan(scan_id: int) -> dict | None:
+    rows = _fetch_all(
+        f"SELECT {_PLAN_COLUMNS} FROM PlannedScans WHERE id = ?",
+        (_parse_scan_id(scan_id),),
+    )
+    return rows[0] if rows else None
+
+
+def update_planned_scan(scan_id: int, **fields) -> dict:
+    """Change interval, scan_target and/or options; a new interval reschedules from now."""
+    scan_id = _parse_scan_id(scan_id)
+    current = get_planned_scan(scan_id)
+    if current is None:
+        raise LookupError(f"No planned scan with id {scan_id}")
+
+    updates = {}
+    if fields.get("interval") is not None:
+        updates["interval"] = _parse_interval(fields["interval"])
+    if fields.get("scan_target") is not None:
+        target = str(fields["scan_target"]).strip()
+        if not target:
+            raise ValueError("scan_target is required")
+        updates["scan_target"] = target
+    parsed = _parse_plan_options(fields)
+    updates.update({k: v for k, v in parsed.items() if k in fields})
+
+    if not updates:
+        return {"ok": True, "updated": False, **current}
+
+    if "interval" in updates or "jitter" in updates:
+        jitter = updates.get("jitter", current["jitter"])
+        updates["next_scan_at"] = _next_scan_sql(_now_dt_dk(), updates.get("interval", current["interval"]), jitter)
+
+    assignments = ", ".join(f"{col} = ?" for col in updates)
+    _run(f"UPDATE PlannedScans SET {assignments} WHERE id = ?", (*updates.values(), scan_id))
+    _schedule_changed()
+
+    return {"ok": True, "updated": True, **current, **updates}
+
+
 def update_last_scan(scan_target: str, scanned_at: str | None = None) -> dict:
     target = (scan_target or "").strip()
     if not target:
@@ -288,70 +1190,78 @@ def update_last_scan(scan_target: str, scanned_at: str | None = None) -> dict:
     }
 
 
-def clear_next_scan(scan_target: str) -> dict:
-    target = (scan_target or "").strip()
-    if not target:
-        raise ValueError("scan_target is required")
+def clear_next_scan(scan_target: str | None = None, scan_id: int | None = None) -> dict:
+    """Pauses one plan (scan_id) or every plan of a target."""
+    if scan_id is not None:
+        scan_id = _parse_scan_id(scan_id)
+        where, params, key = "id = ?", (scan_id,), {"id": scan_id}
+    else:
+        target = (scan_target or "").strip()
+        if not target:
+            raise ValueError("scan_target is required")
+        where, params, key = "scan_target = ?", (target,), {"scan_target": target}
 
-    _run(
-        """
-        UPDATE PlannedScans
-        SET next_scan_at = NULL
-        WHERE scan_target = ?
-        """,
-        (target,),
-    )
+    _run(f"UPDATE PlannedScans SET next_scan_at = NULL WHERE {where}", params)
+    _schedule_changed()
 
     return {
         "ok": True,
-        "scan_target": target,
+        **key,
         "next_scan_at": None,
     }
 
 
+def touch_planned_scan(scan_id: int) -> dict:
+    """Marks one plan as scanned now and moves next_scan_at one interval (+ jitter) ahead."""
+    scan_id = _parse_scan_id(scan_id)
+    now_dt = _now_dt_dk()
+    now_sql = _to_sqlite(now_dt)
+
+    with _db.transaction(immediate=True) as conn:
+        row = conn.execute(
+            "SELECT interval, jitter, scan_target FROM PlannedScans WHERE id = ?",
+            (scan_id,),
+        ).fetchone()
+        if row is None:
+            raise LookupError(f"No planned scan with id {scan_id}")
+
+        next_sql = _next_scan_sql(now_dt, int(row["interval"]), row["jitter"])
+        conn.execute(
+            "UPDATE PlannedScans SET last_scanned_at = ?, next_scan_at = ? WHERE id = ?",
+            (now_sql, next_sql, scan_id),
+        )
+    _schedule_changed()
+
+    return {
+        "ok": True,
+        "id": scan_id,
+        "scan_target": row["scan_target"],
+        "last_scanned_at": now_sql,
+        "next_scan_at": next_sql,
+        "interval": int(row["interval"]),
+    }
+
+
 def set_last_and_next_from_interval(scan_target: str) -> dict:
+    """Touches every plan of a target, each with its own interval (see touch_planned_scan)."""
     target = (scan_target or "").strip()
     if not target:
         raise ValueError("scan_target is required")
 
-    # DK-tid (timezone-aware)
-    now_dt = _now_dt_dk()
-    now_sql = _to_sqlite(now_dt)
-
-    rows = _fetch_all(
-        """
-        SELECT interval
-        FROM PlannedScans
-        WHERE scan_target = ?
-        """,
-        (target,),
-    )
-
+    rows = _fetch_all("SELECT id FROM PlannedScans WHERE scan_target = ? ORDER BY id", (target,))
     if not rows:
         raise ValueError(f"No planned scan found for target: {target}")
 
-    interval_minutes = int(rows[0]["interval"])
-
-    next_dt = now_dt + timedelta(minutes=interval_minutes)
-    next_sql = _to_sqlite(next_dt)
-
-    _run(
-        """
-        UPDATE PlannedScans
-        SET
-            last_scanned_at = ?,
-            next_scan_at = ?
-        WHERE scan_target = ?
-        """,
-        (now_sql, next_sql, target),
-    )
+    touched = [touch_planned_scan(r["id"]) for r in rows]
+    first = min(touched, key=lambda t: t["next_scan_at"])
 
     return {
         "ok": True,
         "scan_target": target,
-        "last_scanned_at": now_sql,
-        "next_scan_at": next_sql,
-        "interval": interval_minutes,
+        "last_scanned_at": first["last_scanned_at"],
+        "next_scan_at": first["next_scan_at"],
+        "interval": first["interval"],
+        "ids": [t["id"] for t in touched],
     }
 
 
@@ -360,8 +1270,8 @@ def get_due_planned_scans() -> list[dict]:
     now = _now_sqlite()
 
     return _fetch_all(
-        """
-        SELECT interval, last_scanned_at, next_scan_at, scan_target
+        f"""
+        SELECT {_PLAN_COLUMNS}
         FROM PlannedScans
         WHERE next_scan_at IS NOT NULL
           AND next_scan_at <= ?
@@ -371,43 +1281,203 @@ def get_due_planned_scans() -> list[dict]:
     )
 
 
+def get_schedule_entries() -> list[dict]:
+    """Every active plan with next_scan_at as epoch seconds (for the in-memory timer)."""
+    rows = _fetch_all(
+        f"""
+        SELECT {_PLAN_COLUMNS}
+        FROM PlannedScans
+        WHERE next_scan_at IS NOT NULL
+        """
+    )
+    for r in rows:
+        r["next_at"] = _to_epoch(r["next_scan_at"])
+    return rows
+
+
 def get_all_planned_scans() -> list[dict]:
     return _fetch_all(
-        """
-        SELECT interval, last_scanned_at, next_scan_at, scan_target
+        f"""
+        SELECT {_PLAN_COLUMNS}
         FROM PlannedScans
         ORDER BY
           CASE WHEN next_scan_at IS NULL THEN 1 ELSE 0 END,
           next_scan_at ASC,
-          interval ASC
+          id ASC
         """
     )
 
 
-def delete_planned_scan(interval: int) -> dict:
-    if interval is None:
-        raise ValueError("interval is required")
+def delete_planned_scan(scan_id: int) -> dict:
+    scan_id = _parse_scan_id(scan_id)
+    removed = get_planned_scan(scan_id)
+    if removed is None:
+        return {"ok": True, "deleted": False, "id": scan_id}
 
-    try:
-        interval_int = int(interval)
-    except (TypeError, ValueError):
-        raise ValueError("interval must be an integer")
+    _run("DELETE FROM PlannedScans WHERE id = ?", (scan_id,))
+    _schedule_changed()
 
-    if interval_int <= 0:
-        raise ValueError("interval must be > 0")
+    return {"ok": True, "deleted": True, "id": scan_id, "removed": removed}
 
+
+def delete_planned_scans_by_interval(interval: int) -> dict:
+    # the old API addressed plans by interval; now that is every plan with it
+    interval_int = _parse_interval(interval)
     rows = _fetch_all(
-        """
-        SELECT interval, last_scanned_at, next_scan_at, scan_target
-        FROM PlannedScans
-        WHERE interval = ?
-        """,
+        f"SELECT {_PLAN_COLUMNS} FROM PlannedScans WHERE interval = ? ORDER BY id",
         (interval_int,),
     )
-
     if not rows:
         return {"ok": True, "deleted": False, "interval": interval_int}
 
     _run("DELETE FROM PlannedScans WHERE interval = ?", (interval_int,))
+    _schedule_changed()
+
+    return {"ok": True, "deleted": True, "interval": interval_int, "removed": rows}
+
+
+# --- observation history ---
+
+HISTORY_RAW_DAYS = int(os.getenv("HISTORY_RAW_DAYS", "7"))
+HISTORY_MAX_GAP_SECONDS = int(os.getenv("HISTORY_MAX_GAP_SECONDS", "1800"))
+
+
+def get_device_history(mac_address: str, since: str | int | None = None, until: str | int | None = None) -> dict:
+    mac = (mac_address or "").strip().lower()
+    if not mac:
+        raise ValueError("mac_address is required")
+
+    since_epoch = _to_epoch(since) if since is not None else 0
+    until_epoch = _to_epoch(until) if until is not None else int(time.time())
+
+    with _db.transaction() as conn:
+        dev = conn.execute("SELECT id FROM Devices WHERE mac_address = ?", (mac,)).fetchone()
+        if dev is None:
+            return {"mac_address": mac, "intervals": [], "sightings": []}
+
+        intervals = conn.execute(
+            """
+            SELECT start_at, end_at, ip_address, sightings
+            FROM PresenceIntervals
+            WHERE device_id = ? AND end_at >= ? AND start_at <= ?
+            ORDER BY start_at
+            """,
+            (dev["id"], since_epoch, until_epoch),
+        ).fetchall()
+        sightings = conn.execute(
+            """
+            SELECT seen_at, ip_address, scan_id
+            FROM Sightings
+            WHERE device_id = ? AND seen_at BETWEEN ? AND ?
+            ORDER BY seen_at
+            """,
+            (dev["id"], since_epoch, until_epoch),
+        ).fetchall()
+
+    return {
+        "mac_address": mac,
+        "intervals": [dict(r) for r in intervals],
+        "sightings": [dict(r) for r in sightings],
+    }
+
+
+def compact_sightings(
+    raw_days: int = HISTORY_RAW_DAYS,
+    max_gap_seconds: int = HISTORY_MAX_GAP_SECONDS,
+) -> dict:
+    """
+    Fold raw sightings older than `raw_days` into PresenceIntervals: runs of
+    sightings of the same device+IP with gaps <= max_gap_seconds become one
+    interval (and extend the device's newest interval when they touch it).
+    """
+    cutoff = int(time.time()) - int(raw_days) * 86400
+    folded = 0
+    created = 0
+
+    with _db.transaction(immediate=True) as conn:
+        cur = conn.execute(
+            """
+            SELECT device_id, ip_address, seen_at
+            FROM Sightings
+            WHERE seen_at < ?
+            ORDER BY device_id, ip_address, seen_at
+            """,
+            (cutoff,),
+        )
+
+        # current run: [device_id, ip, start, end, count]
+        run = None
+
+        def flush(r):
+            nonlocal created
+            if r is None:
+                return
+            device_id, ip, start, end, count = r
+            prev = conn.execute(
+                """
+                SELECT start_at, end_at, sightings FROM PresenceIntervals
+                WHERE device_id = ? AND ip_address = ? AND start_at <= ?
+                ORDER BY start_at DESC LIMIT 1
+                """,
+                (device_id, ip, start),
+            ).fetchone()
+            if prev is not None and start - prev["end_at"] <= max_gap_seconds:
+                conn.execute(
+                    """
+                    UPDATE PresenceIntervals
+                    SET end_at = MAX(end_at, ?), sightings = sightings + ?
+                    WHERE device_id = ? AND ip_address = ? AND start_at = ?
+                    """,
+                    (end, count, device_id, ip, prev["start_at"]),
+                )
+                return
+            conn.execute(
+                """
+                INSERT INTO PresenceIntervals (device_id, start_at, end_at, ip_address, sightings)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (device_id, start, end, ip, count),
+            )
+            created += 1
+
+        for device_id, ip, seen_at in cur.fetchall():
+            folded += 1
+            if run is not None and run[0] == device_id and run[1] == ip and seen_at - run[3] <= max_gap_seconds:
+                run[3] = seen_at
+                run[4] += 1
+                continue
+            flush(run)
+            run = [device_id, ip, seen_at, seen_at, 1]
+        flush(run)
+
+        conn.execute("DELETE FROM Sightings WHERE seen_at < ?", (cutoff,))
+
+    return {"ok": True, "folded_sightings": folded, "new_intervals": created, "cutoff": cutoff}
+
+
+# --- scan snapshots (change detection) ---
+
+def get_scan_snapshot(scan_target: str) -> dict | None:
+    rows = _fetch_all(
+        "SELECT scan_target, pairs, refreshed_at, updated_at FROM ScanSnapshots WHERE scan_target = ?",
+        (scan_target,),
+    )
+    if not rows:
+        return None
+    row = rows[0]
+    row["pairs"] = [tuple(p) for p in json.loads(row["pairs"])]
+    return row
 
-    return {"ok": True, "deleted": True, "interval": interval_int, "removed": rows[0]}
+
+def save_scan_snapshot(scan_target: str, pairs, refreshed_at: int) -> None:
+    _run(
+        """
+        INSERT INTO ScanSnapshots (scan_target, pairs, refreshed_at, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(scan_target) DO UPDATE SET
+          pairs        = excluded.pairs,
+          refreshed_at = excluded.refreshed_at,
+          updated_at   = excluded.updated_at
+        """,
+        (scan_target, json.dumps(sorted(pairs)), int(refreshed_at), int(time.time())),
+    )
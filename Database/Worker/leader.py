@@ -0,0 +1,121 @@
+# Database/Worker/leader.py
+"""
+Single-leader election between the processes of one deployment.
+
+Under a multi-worker WSGI server every worker calls app.init() (after the
+fork), but planned scans and housekeeping jobs must only run once. The leader is whoever holds
+an exclusive flock() on SCHEDULER_LOCK_FILE; the kernel drops the lock when
+that process exits (also on a crash), and one of the followers - which retry
+every SCHEDULER_LEADER_RETRY_SECONDS - takes over.
+"""
+from __future__ import annotations
+
+import fcntl
+import os
+import threading
+
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", "Database/scheduler.lock")
+SCHEDULER_LEADER_RETRY_SECONDS = float(os.getenv("SCHEDULER_LEADER_RETRY_SECONDS", "30"))
+
+
+class LeaderLock:
+    def __init__(self, path: str = SCHEDULER_LOCK_FILE):
+        self.path = path
+        self._fd: int | None = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # only informational: who is leading right now
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class Leadership:
+    """
+    Tries to become leader now and then every `retry_seconds` until it does;
+    on_elected() runs once, on_resigned() on stop() if we were leading.
+    """
+
+    def __init__(
+        self,
+        on_elected,
+        on_resigned=None,
+        lock: LeaderLock | None = None,
+        retry_seconds: float = SCHEDULER_LEADER_RETRY_SECONDS,
+    ):
+        self.on_elected = on_elected
+        self.on_resigned = on_resigned
+        self.lock = lock or LeaderLock()
+        self.retry_seconds = float(retry_seconds)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    def _try(self) -> bool:
+        try:
+            if not self.lock.try_acquire():
+                return False
+        except OSError as e:
+            print(f"[leader] ERROR opening lock file {self.lock.path}: {e}")
+            return False
+
+        print(f"[leader] Process {os.getpid()} is now the scheduler leader")
+        try:
+            self.on_elected()
+        except Exception as e:
+            print(f"[leader] ERROR starting leader duties: {e}")
+        return True
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.retry_seconds):
+            if self._try():
+                return
+
+    def start(self) -> bool:
+        """Returns True if this process became leader right away."""
+        if self._try():
+            return True
+        print(f"[leader] Process {os.getpid()} is a follower; retrying every {self.retry_seconds:.0f}s")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="leader-election", daemon=True)
+        self._thread.start()
+        return False
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.lock.held:
+            if self.on_resigned is not None:
+                try:
+                    self.on_resigned()
+                except Exception as e:
+                    print(f"[leader] ERROR stopping leader duties: {e}")
+            self.lock.release()
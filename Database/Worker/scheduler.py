@@ -0,0 +1,206 @@
+# Database/Worker/scheduler.py
+"""
+Event-driven scan scheduler.
+
+Keeps a min-heap of (next_scan_at, plan id) in memory and sleeps exactly until
+the earliest one is due. DB_Data calls back (on_schedule_change) whenever a
+planned scan is added, cleared, deleted or touched, which wakes the thread
+to reload the heap - so an idle schedule costs no DB queries and scans start
+on time.
+
+Only the leader process (Database/Worker/leader.py) runs the thread, but a
+plan can be changed through any WSGI worker. Every process therefore touches
+SCHEDULER_SIGNAL_FILE on a change, and the leader stat()s it every
+SCHEDULER_SIGNAL_POLL_SECONDS. A reload is also forced every
+SCHEDULER_RESYNC_SECONDS as a last safety net (e.g. edits with sqlite3).
+
+A plan that has been submitted stays "in flight" until the scan covering it
+finishes (worker.submit_plan calls back). Its DB row stays due meanwhile, so
+reloads leave it out of the heap instead of submitting it again; a success
+touches the row (new next_scan_at), a failure is retried after
+SCHEDULER_RETRY_SECONDS.
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+
+from Database import DB_Data
+from Database.Worker import worker
+
+SCHEDULER_RESYNC_SECONDS = float(os.getenv("SCHEDULER_RESYNC_SECONDS", "3600"))
+SCHEDULER_RETRY_SECONDS = float(os.getenv("SCHEDULER_RETRY_SECONDS", "15"))
+SCHEDULER_SIGNAL_FILE = os.getenv("SCHEDULER_SIGNAL_FILE", "Database/scheduler.signal")
+SCHEDULER_SIGNAL_POLL_SECONDS = float(os.getenv("SCHEDULER_SIGNAL_POLL_SECONDS", "2"))
+
+
+class NextDueScheduler:
+    def __init__(
+        self,
+        submit=None,
+        resync_seconds: float = SCHEDULER_RESYNC_SECONDS,
+        retry_seconds: float = SCHEDULER_RETRY_SECONDS,
+        signal_path: str | None = SCHEDULER_SIGNAL_FILE,
+        signal_poll_seconds: float = SCHEDULER_SIGNAL_POLL_SECONDS,
+    ):
+        self._submit = submit or worker.submit_plan
+        self.resync_seconds = float(resync_seconds)
+        self.retry_seconds = float(retry_seconds)
+        self.signal_path = signal_path
+        self.signal_poll_seconds = float(signal_poll_seconds)
+        self._signal_mtime: int | None = None
+
+        self._cond = threading.Condition()
+        self._heap: list[tuple[float, int]] = []
+        self._plans: dict[int, dict] = {}
+        self._retry_at: dict[int, float] = {}
+        self._in_flight: set[int] = set()
+        self._dirty = True
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+        self.reloads = 0
+
+    # --- signals -------------------------------------------------------
+
+    def _signal_stat(self) -> int | None:
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _touch_signal(self) -> None:
+        try:
+            with open(self.signal_path, "a"):
+                pass
+            os.utime(self.signal_path)
+        except OSError as e:
+            print(f"[scheduler] Could not touch {self.signal_path}: {e}")
+
+    def notify_changed(self) -> None:
+        if self.signal_path:
+            # tells the leader if the change came in through another process
+            self._touch_signal()
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def retry_later(self, plan_id: int) -> None:
+        # failed scan: the DB still says "due", so only the retry time keeps it from spinning
+        with self._cond:
+            self._in_flight.discard(plan_id)
+            at = time.time() + self.retry_seconds
+            self._retry_at[plan_id] = at
+            heapq.heappush(self._heap, (at, plan_id))
+            self._cond.notify()
+
+    def _scan_finished(self, plan_id: int, ok: bool) -> None:
+        if not ok:
+            self.retry_later(plan_id)
+            return
+        with self._cond:
+            # the touch already signalled a change; reload picks up the new next_scan_at
+            self._in_flight.discard(plan_id)
+            self._dirty = True
+            self._cond.notify()
+
+    # --- lifecycle -----------------------------------------------------
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._dirty = True
+            if self.signal_path:
+                self._signal_mtime = self._signal_stat()
+            self._thread = threading.Thread(target=self._loop, name="scan-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def next_due(self) -> tuple[float, int] | None:
+        with self._cond:
+            return self._heap[0] if self._heap else None
+
+    # --- thread --------------------------------------------------------
+
+    def _reload(self) -> None:
+        entries = DB_Data.get_schedule_entries()
+        now = time.time()
+        heap = []
+        with self._cond:
+            for e in entries:
+                if e["id"] in self._in_flight:
+                    continue
+                at = e["next_at"]
+                retry = self._retry_at.get(e["id"])
+                if retry is not None and at <= now:
+                    at = max(at, retry)
+                else:
+                    self._retry_at.pop(e["id"], None)
+                heap.append((at, e["id"]))
+            heapq.heapify(heap)
+            self._heap = heap
+            self._plans = {e["id"]: e for e in entries}
+            self.reloads += 1
+
+    def _loop(self) -> None:
+        next_sync = 0.0
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if self.signal_path:
+                    mtime = self._signal_stat()
+                    if mtime != self._signal_mtime:
+                        self._signal_mtime = mtime
+                        self._dirty = True
+                reload = self._dirty or time.time() >= next_sync
+                self._dirty = False
+
+            if reload:
+                try:
+                    self._reload()
+                except Exception as e:
+                    print(f"[scheduler] ERROR loading schedule: {e}")
+                next_sync = time.time() + self.resync_seconds
+
+            due = []
+            with self._cond:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+
+                if not due and not self._dirty and not self._stopped:
+                    wake = min(self._heap[0][0] if self._heap else next_sync, next_sync)
+                    if self.signal_path:
+                        wake = min(wake, now + self.signal_poll_seconds)
+                    self._cond.wait(timeout=max(0.0, wake - now))
+
+            for plan_id in dict.fromkeys(due):
+                plan = self._plans.get(plan_id)
+                with self._cond:
+                    if plan is None or plan_id in self._in_flight:
+                        continue
+                    self._in_flight.add(plan_id)
+                try:
+                    # also when the target is already being scanned: the plan then waits for that job
+                    self._submit(plan, on_done=self._scan_finished)
+                except Exception as e:
+                    print(f"[scheduler] ERROR submitting plan {plan_id} ({plan['scan_target']}): {e}")
+                    self.retry_later(plan_id)
+
+
+scan_scheduler = NextDueScheduler()
+DB_Data.on_schedule_change(scan_scheduler.notify_changed)
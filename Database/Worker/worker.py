@@ -3,12 +3,72 @@ from __future__ import annotations
 import threading
 from datetime import datetime
 
-from Scanner import scanner
-from Database.DB_Data import get_due_planned_scans, set_last_and_next_from_interval
+from Scanner import jobs
+from Database.DB_Data import get_due_planned_scans, scan_options, touch_planned_scan
 
 _worker_lock = threading.Lock()
+_in_flight_lock = threading.Lock()
+_in_flight: set[int] = set()  # plan ids waiting for a scan to finish
+
+
+def _on_scan_done(job: dict, scan_id: int) -> None:
+    target = job["target"]
+    total = job["timings"].get("total_s", 0.0)
+
+    if job["status"] != "succeeded":
+        # schedule is left alone so the target is retried on the next tick
+        print(f"[worker] ERROR scanning target='{target}' after {total:.2f}s: {job['error']}")
+        return
+
+    timings = ", ".join(f"{k}={v:.2f}s" for k, v in job["timings"].items() if k != "total_s")
+    try:
+        updated = touch_planned_scan(scan_id)
+        print(
+            f"[worker] Scanned {target} (plan {scan_id}) in {total:.2f}s ({timings}) -> "
+            f"next_scan_at={updated['next_scan_at']} (interval={updated['interval']})"
+        )
+    except Exception as e:
+        print(f"[worker] ERROR updating schedule for target='{target}': {e}")
+
+
+def submit_plan(plan: dict, on_done=None) -> bool:
+    """
+    Queue the scan for a PlannedScans row. If the target is already being
+    scanned (another plan or /StartScan), the plan waits for that job instead.
+    The plan is touched only when a scan covering it succeeds, and
+    on_done(plan_id, ok) is called once that scan has finished.
+    Returns False if no new job was created.
+    """
+    scan_id = plan["id"]
+    target = plan["scan_target"]
+
+    with _in_flight_lock:
+        if scan_id in _in_flight:
+            return False
+        _in_flight.add(scan_id)
+
+    def done(job: dict) -> None:
+        _on_scan_done(job, scan_id)
+        with _in_flight_lock:
+            _in_flight.discard(scan_id)
+        if on_done is not None:
+            on_done(scan_id, job["status"] == "succeeded")
+
+    try:
+        job, created = jobs.submit(target, on_done=done, **scan_options(plan))
+    except Exception:
+        with _in_flight_lock:
+            _in_flight.discard(scan_id)
+        raise
+    if created:
+        print(f"[worker] Scanning target: {target} (plan {scan_id}, job {job['id']})")
+    else:
+        print(f"[worker] {target} is already being scanned (job {job['id']}); plan {scan_id} waits for it")
+    return created
+
 
 def scan_worker_tick() -> None:
+    # polling fallback (SCAN_SCHEDULER=poll); the default is Database/Worker/scheduler.py
     if not _worker_lock.acquire(blocking=False):
         print("[worker] Skipping tick (previous run still executing)")
         return
@@ -19,24 +79,25 @@ def scan_worker_tick() -> None:
         if not due_scans:
             return
 
+        submitted = 0
+        busy = 0
         for row in due_scans:
             target = row.get("scan_target")
             if not target:
                 continue
 
-            print(f"[worker] Scanning target: {target}")
-
             try:
-                scanner.run_scan(target)
+                created = submit_plan(row)
             except Exception as e:
-                print(f"[worker] ERROR scanning target='{target}': {e}")
+                print(f"[worker] ERROR submitting target='{target}': {e}")
                 continue
 
-            try:
-                updated = set_last_and_next_from_interval(target)
-                print(f"[worker] Updated {target} -> next_scan_at={updated['next_scan_at']} (interval={updated['interval']})")
-            except Exception as e:
-                print(f"[worker] ERROR updating schedule for target='{target}': {e}")
+            if created:
+                submitted += 1
+            else:
+                busy += 1
+
+        print(f"[worker] Submitted {submitted} scans ({busy} already running, pool size {jobs.SCAN_WORKERS})")
 
     finally:
         _worker_lock.release()
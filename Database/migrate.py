@@ -0,0 +1,145 @@
+# Database/migrate.py
+"""
+Versioned, in-place schema migrations.
+
+Migrations live in Database/migrations as NNNN_name.sql or NNNN_name.py (the
+latter defines upgrade(conn)). The DB's PRAGMA user_version is the number of
+the last applied migration. Each pending migration runs in its own
+transaction together with the user_version bump, so a failing migration
+leaves the DB at the previous version. Before touching a DB that already has
+data, a copy is written next to it (<db>.bak-v<version>).
+
+Every process of a deployment may call migrate() at start; an exclusive
+flock() on <db>.migrate.lock serialises them, and the version is read again
+once the lock is held, so the first process migrates and the rest find
+nothing pending. Each migration also runs under BEGIN IMMEDIATE and is
+skipped if user_version already reached it (e.g. a tool without the lock).
+"""
+from __future__ import annotations
+
+import fcntl
+import importlib.util
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+_NAME_RE = re.compile(r"^(\d{4})_[\w-]+\.(sql|py)$")
+
+
+def available_migrations() -> list[tuple[int, Path]]:
+    out = []
+    for path in MIGRATIONS_DIR.iterdir():
+        m = _NAME_RE.match(path.name)
+        if m:
+            out.append((int(m.group(1)), path))
+    out.sort()
+
+    versions = [v for v, _ in out]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration numbers in {MIGRATIONS_DIR}")
+    return out
+
+
+def _statements(sql: str):
+    # splits on complete statements, so triggers (BEGIN ... END;) stay whole
+    buf = ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            if buf.strip():
+                yield buf
+            buf = ""
+    if buf.strip() and not buf.strip().startswith("--"):
+        yield buf
+
+
+def _apply(conn: sqlite3.Connection, version: int, path: Path) -> bool:
+    # the write lock first, then the version: another writer may have applied it meanwhile
+    conn.execute("BEGIN IMMEDIATE;")
+    if current_version(conn) >= version:
+        conn.execute("ROLLBACK;")
+        return False
+    try:
+        if path.suffix == ".sql":
+            for stmt in _statements(path.read_text(encoding="utf-8")):
+                conn.execute(stmt)
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{version:04d}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(conn)
+        violations = conn.execute("PRAGMA foreign_key_check;").fetchall()
+        if violations:
+            raise RuntimeError(f"{path.name} left {len(violations)} foreign key violation(s)")
+        conn.execute(f"PRAGMA user_version = {version};")
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+    return True
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version;").fetchone()[0])
+
+
+def _has_data(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchone()
+    return bool(row[0])
+
+
+def migrate(db_path: str | Path, backup: bool = True) -> list[str]:
+    """Bring the DB at db_path up to the newest migration. Returns applied file names."""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    lock_fd = os.open(db_path.with_name(f"{db_path.name}.migrate.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # blocks while another process migrates; released (also on a crash) when the fd closes
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return _migrate_locked(db_path, backup)
+    finally:
+        os.close(lock_fd)
+
+
+def _migrate_locked(db_path: Path, backup: bool) -> list[str]:
+    conn = sqlite3.connect(str(db_path), isolation_level=None, timeout=30)
+    try:
+        conn.row_factory = sqlite3.Row
+        # off while tables are rebuilt; every migration is checked with foreign_key_check instead
+        conn.execute("PRAGMA foreign_keys = OFF;")
+
+        version = current_version(conn)
+        pending = [(v, p) for v, p in available_migrations() if v > version]
+        if not pending:
+            return []
+
+        if backup and _has_data(conn):
+            bak_path = db_path.with_name(f"{db_path.name}.bak-v{version}")
+            bak = sqlite3.connect(str(bak_path))
+            try:
+                conn.backup(bak)
+            finally:
+                bak.close()
+            print(f"[migrate] Backup of v{version} written to {bak_path}")
+
+        applied = []
+        for v, path in pending:
+            if not _apply(conn, v, path):
+                continue
+            applied.append(path.name)
+            print(f"[migrate] Applied {path.name} -> user_version {v}")
+        return applied
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "Database/SqliteDB")
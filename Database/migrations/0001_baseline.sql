@@ -1,4 +1,5 @@
-PRAGMA foreign_keys = ON;
+-- Schema as it was before versioned migrations (everything IF NOT EXISTS,
+-- so it is a no-op on an existing production DB).
 
 CREATE TABLE IF NOT EXISTS ApprovedAddresses (
   id           INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -33,4 +34,10 @@ CREATE TABLE IF NOT EXISTS PlannedScans
   last_scanned_at DATETIME ,
   next_scan_at DATETIME,
   scan_target TEXT NOT NULL 
-)
+);
+
+-- bumped once per write transaction on the device tables (ETag / polling)
+CREATE TABLE IF NOT EXISTS TableVersions (
+  name     TEXT PRIMARY KEY,
+  version  INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,14 @@
+-- get_approved / get_unapproved / list_devices: ORDER BY last_seen DESC, id DESC (+ keyset)
+CREATE INDEX IF NOT EXISTS idx_approved_last_seen
+  ON ApprovedAddresses (last_seen, id);
+
+CREATE INDEX IF NOT EXISTS idx_unapproved_last_seen
+  ON UnApprovedAddresses (last_seen, id);
+
+-- get_due_planned_scans: WHERE next_scan_at <= ? ORDER BY next_scan_at
+CREATE INDEX IF NOT EXISTS idx_planned_next_scan_at
+  ON PlannedScans (next_scan_at);
+
+-- set_last_and_next_from_interval / update_last_scan / clear_next_scan: WHERE scan_target = ?
+CREATE INDEX IF NOT EXISTS idx_planned_scan_target
+  ON PlannedScans (scan_target);
@@ -0,0 +1,36 @@
+-- Observation history: one row per scan, one row per device seen in it.
+-- Integer ids and epoch seconds keep the rows small on the SD card.
+
+CREATE TABLE IF NOT EXISTS Devices (
+  id           INTEGER PRIMARY KEY,
+  mac_address  TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS Scans (
+  id            INTEGER PRIMARY KEY,
+  scan_target   TEXT NOT NULL,
+  started_at    INTEGER NOT NULL,
+  finished_at   INTEGER NOT NULL,
+  device_count  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_scans_started_at
+  ON Scans (started_at);
+
+-- raw sightings, folded into PresenceIntervals by compact_sightings()
+CREATE TABLE IF NOT EXISTS Sightings (
+  device_id   INTEGER NOT NULL REFERENCES Devices(id),
+  seen_at     INTEGER NOT NULL,
+  ip_address  TEXT NOT NULL,
+  scan_id     INTEGER NOT NULL,
+  PRIMARY KEY (device_id, seen_at, ip_address)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS PresenceIntervals (
+  device_id   INTEGER NOT NULL REFERENCES Devices(id),
+  start_at    INTEGER NOT NULL,
+  end_at      INTEGER NOT NULL,
+  ip_address  TEXT NOT NULL,
+  sightings   INTEGER NOT NULL,
+  PRIMARY KEY (device_id, start_at, ip_address)
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+-- Last result set per target, so change detection survives restarts
+CREATE TABLE IF NOT EXISTS ScanSnapshots (
+  scan_target   TEXT PRIMARY KEY,
+  pairs         TEXT NOT NULL,      -- JSON [[mac, ip], ...]
+  refreshed_at  INTEGER NOT NULL,   -- last full write of the target (epoch)
+  updated_at    INTEGER NOT NULL
+);
@@ -0,0 +1,31 @@
+-- PlannedScans gets a surrogate key: interval was the PRIMARY KEY, so two
+-- targets could not share an interval. Also adds per-plan scan options and
+-- jitter (NULL = use the defaults from the environment).
+
+CREATE TABLE PlannedScans_new (
+  id               INTEGER PRIMARY KEY AUTOINCREMENT,
+  interval         INTEGER NOT NULL CHECK (interval > 0),   -- minutes
+  last_scanned_at  DATETIME,
+  next_scan_at     DATETIME,
+  scan_target      TEXT NOT NULL,
+  timeout          REAL,      -- seconds per ARP round
+  retries          INTEGER,   -- extra sweep rounds for hosts that did not answer
+  rate             REAL,      -- packets per second
+  jitter           INTEGER    -- max random delay (s) added to each next_scan_at
+);
+
+INSERT INTO PlannedScans_new (interval, last_scanned_at, next_scan_at, scan_target)
+SELECT interval, last_scanned_at, next_scan_at, scan_target
+FROM PlannedScans
+ORDER BY interval;
+
+DROP TABLE PlannedScans;
+
+ALTER TABLE PlannedScans_new RENAME TO PlannedScans;
+
+-- the indexes from 0002 went with the old table
+CREATE INDEX IF NOT EXISTS idx_planned_next_scan_at
+  ON PlannedScans (next_scan_at);
+
+CREATE INDEX IF NOT EXISTS idx_planned_scan_target
+  ON PlannedScans (scan_target);
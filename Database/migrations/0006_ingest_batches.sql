@@ -0,0 +1,12 @@
+-- Idempotency keys of batches received on /dataIngression.
+-- A key is claimed in the same transaction that writes the batch, so a
+-- sensor re-sending after a lost response (or across a restart) is a no-op.
+CREATE TABLE IF NOT EXISTS IngestBatches (
+  key           TEXT PRIMARY KEY,
+  received_at   INTEGER NOT NULL,   -- epoch
+  scan_id       INTEGER,
+  device_count  INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_ingest_batches_received_at
+  ON IngestBatches (received_at);
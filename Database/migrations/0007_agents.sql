@@ -0,0 +1,18 @@
+-- Remote scanner agents (scanner.py --push) and what each batch came from.
+-- Throughput per agent is summed from IngestBatches over a time window.
+CREATE TABLE IF NOT EXISTS Agents (
+  agent_id        TEXT PRIMARY KEY,
+  hostname        TEXT,
+  version         TEXT,
+  address         TEXT,               -- last remote address
+  first_seen      INTEGER NOT NULL,   -- epoch
+  last_heartbeat  INTEGER NOT NULL,   -- epoch, every request counts
+  last_batch_at   INTEGER,
+  spooled         INTEGER             -- batches waiting in the agent's disk spool
+) WITHOUT ROWID;
+
+ALTER TABLE IngestBatches ADD COLUMN agent_id TEXT;
+ALTER TABLE IngestBatches ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_ingest_batches_agent
+  ON IngestBatches (agent_id, received_at);
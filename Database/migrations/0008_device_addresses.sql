@@ -0,0 +1,46 @@
+-- Every address a device has been seen with, IPv4 and IPv6, one row per
+-- (device, address). A dual-stack host with a link-local, a SLAAC and a few
+-- privacy addresses stays one device instead of one row per address.
+CREATE TABLE IF NOT EXISTS DeviceAddresses (
+  device_id   INTEGER NOT NULL REFERENCES Devices(id),
+  address     TEXT NOT NULL,      -- canonical text (compressed, lower case for IPv6)
+  family      INTEGER NOT NULL CHECK (family IN (4, 6)),
+  first_seen  INTEGER NOT NULL,   -- epoch
+  last_seen   INTEGER NOT NULL,   -- epoch
+  PRIMARY KEY (device_id, address)
+) WITHOUT ROWID;
+
+-- "who has this address" and the NDP candidate lookup per prefix
+CREATE INDEX IF NOT EXISTS idx_device_addresses_address
+  ON DeviceAddresses (family, address);
+
+-- backfill: devices that so far only live in the approve/unapprove tables
+INSERT OR IGNORE INTO Devices (mac_address)
+SELECT mac_address FROM ApprovedAddresses
+UNION
+SELECT mac_address FROM UnApprovedAddresses;
+
+-- exact times from the history first ...
+INSERT OR IGNORE INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+SELECT device_id, ip_address, CASE WHEN instr(ip_address, ':') THEN 6 ELSE 4 END,
+       MIN(first_seen), MAX(last_seen)
+FROM (
+  SELECT device_id, ip_address, seen_at AS first_seen, seen_at AS last_seen FROM Sightings
+  UNION ALL
+  SELECT device_id, ip_address, start_at, end_at FROM PresenceIntervals
+)
+GROUP BY device_id, ip_address;
+
+-- ... then the rest from the device tables (local time read as UTC: off by
+-- the DK offset, good enough for rows that have no history)
+INSERT OR IGNORE INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+SELECT d.id, t.ip_address, CASE WHEN instr(t.ip_address, ':') THEN 6 ELSE 4 END,
+       MIN(COALESCE(CAST(strftime('%s', t.first_seen) AS INTEGER), 0)),
+       MAX(COALESCE(CAST(strftime('%s', t.last_seen) AS INTEGER), 0))
+FROM (
+  SELECT mac_address, ip_address, first_seen, last_seen FROM ApprovedAddresses
+  UNION ALL
+  SELECT mac_address, ip_address, first_seen, last_seen FROM UnApprovedAddresses
+) t
+JOIN Devices d ON d.mac_address = t.mac_address
+GROUP BY d.id, t.ip_address;
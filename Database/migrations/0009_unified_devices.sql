@@ -0,0 +1,70 @@
+-- One row per device instead of one per (mac, ip) pair in two tables.
+-- Devices (from 0003) gets the approval state and the list columns, the
+-- addresses stay in DeviceAddresses (0008). A DHCP renewal now only moves
+-- Devices.ip_address; approving is one UPDATE of state.
+--
+-- state: 'approved', 'unapproved', or NULL for a device that is only in
+-- the history (removed from the lists; a new sighting lists it again).
+
+ALTER TABLE Devices ADD COLUMN state TEXT CHECK (state IN ('approved', 'unapproved'));
+ALTER TABLE Devices ADD COLUMN ip_address TEXT;     -- current address (latest seen)
+ALTER TABLE Devices ADD COLUMN description TEXT;
+ALTER TABLE Devices ADD COLUMN vendor TEXT;
+ALTER TABLE Devices ADD COLUMN first_seen TEXT;     -- DK local time, like the old tables
+ALTER TABLE Devices ADD COLUMN last_seen TEXT;
+
+CREATE TEMP TABLE _listed AS
+SELECT mac_address, ip_address, description, vendor, first_seen, last_seen, 1 AS approved
+FROM ApprovedAddresses
+UNION ALL
+SELECT mac_address, ip_address, description, vendor, first_seen, last_seen, 0
+FROM UnApprovedAddresses;
+
+CREATE INDEX temp._listed_mac ON _listed (mac_address, last_seen);
+
+INSERT OR IGNORE INTO Devices (mac_address)
+SELECT DISTINCT mac_address FROM _listed;
+
+-- a MAC with any approved pair is approved; its description comes from an
+-- approved pair first, its address from the pair seen last
+UPDATE Devices
+SET
+  state = (SELECT CASE WHEN MAX(approved) = 1 THEN 'approved' ELSE 'unapproved' END
+           FROM _listed l WHERE l.mac_address = Devices.mac_address),
+  ip_address = (SELECT ip_address FROM _listed l WHERE l.mac_address = Devices.mac_address
+                ORDER BY l.last_seen DESC LIMIT 1),
+  description = (SELECT description FROM _listed l
+                 WHERE l.mac_address = Devices.mac_address AND l.description IS NOT NULL
+                 ORDER BY l.approved DESC, l.last_seen DESC LIMIT 1),
+  vendor = (SELECT vendor FROM _listed l
+            WHERE l.mac_address = Devices.mac_address AND l.vendor IS NOT NULL
+            ORDER BY l.last_seen DESC LIMIT 1),
+  first_seen = (SELECT MIN(first_seen) FROM _listed l WHERE l.mac_address = Devices.mac_address),
+  last_seen = (SELECT MAX(last_seen) FROM _listed l WHERE l.mac_address = Devices.mac_address)
+WHERE mac_address IN (SELECT mac_address FROM _listed);
+
+-- pairs written since 0008 by add_unapproved / add_approved
+INSERT OR IGNORE INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+SELECT d.id, l.ip_address, CASE WHEN instr(l.ip_address, ':') THEN 6 ELSE 4 END,
+       MIN(COALESCE(CAST(strftime('%s', l.first_seen) AS INTEGER), 0)),
+       MAX(COALESCE(CAST(strftime('%s', l.last_seen) AS INTEGER), 0))
+FROM _listed l
+JOIN Devices d ON d.mac_address = l.mac_address
+GROUP BY d.id, l.ip_address;
+
+DROP TABLE _listed;
+DROP TABLE ApprovedAddresses;
+DROP TABLE UnApprovedAddresses;
+
+-- get_approved / get_unapproved / list_devices: WHERE state = ? ORDER BY last_seen DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_devices_state_last_seen
+  ON Devices (state, last_seen, id);
+
+-- read-only views with the old names and columns, for reports and the sqlite3 shell
+CREATE VIEW ApprovedAddresses AS
+SELECT id, mac_address, ip_address, description, vendor, first_seen, last_seen
+FROM Devices WHERE state = 'approved';
+
+CREATE VIEW UnApprovedAddresses AS
+SELECT id, mac_address, ip_address, description, vendor, first_seen, last_seen
+FROM Devices WHERE state = 'unapproved';
@@ -0,0 +1,13 @@
+-- Keyset pagination on (last_seen, id) can't step past a row whose last_seen
+-- is NULL ((NULL, id) < (?, ?) is NULL), so the rest of the list was
+-- unreachable. Older rows (baseline data, devices approved before they had
+-- a last_seen) get one: first_seen, else the last address sighting (epoch ->
+-- local time like the rest), else the epoch.
+UPDATE Devices
+SET last_seen = COALESCE(
+  first_seen,
+  (SELECT datetime(MAX(a.last_seen), 'unixepoch', 'localtime')
+   FROM DeviceAddresses a WHERE a.device_id = Devices.id),
+  '1970-01-01 00:00:00'
+)
+WHERE last_seen IS NULL;
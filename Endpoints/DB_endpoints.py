@@ -1,23 +1,97 @@
 # Endpoints/ScannerEndpoints.py
-from flask import Blueprint, request, jsonify
+import base64
+import hashlib
+import json
+
+from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required
 from Database import DB_Data
-from Scanner import scanner
 
 DB_bp = Blueprint("DB_bp", __name__)
 
+_PAGE_ARGS = ("limit", "cursor", "vendor", "subnet", "seen_since")
+
+
 def _json():
     return request.get_json(silent=True) or {}
 
+
+def _encode_cursor(after) -> str | None:
+    if after is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    last_seen, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return last_seen, int(row_id)
+
+
+def _device_list(table: str, legacy):
+    """
+    Without query args: the full list as before. With any of limit/cursor/
+    vendor/subnet/seen_since: one keyset page {"items", "next_cursor"}.
+    Either way a weak ETag built from the table version answers 304 when
+    nothing changed, without touching the table itself.
+    """
+    args = {k: request.args.get(k) for k in _PAGE_ARGS if request.args.get(k)}
+
+    query_key = hashlib.sha1(json.dumps(args, sort_keys=True).encode()).hexdigest()[:12]
+    etag = f"{table}-{DB_Data.get_table_version(table)}-{query_key}"
+    if request.if_none_match.contains_weak(etag):
+        resp = make_response("", 304)
+        resp.set_etag(etag, weak=True)
+        return resp
+
+    if not args:
+        resp = jsonify(legacy())
+    else:
+        try:
+            page = DB_Data.list_devices(
+                table,
+                limit=int(args.get("limit", 100)),
+                after=_decode_cursor(args["cursor"]) if "cursor" in args else None,
+                vendor=args.get("vendor"),
+                subnet=args.get("subnet"),
+                seen_since=args.get("seen_since"),
+            )
+        except (ValueError, TypeError) as e:
+            return jsonify({"ok": False, "error": f"Invalid query: {e}"}), 400
+        resp = jsonify({"items": page["items"], "next_cursor": _encode_cursor(page["next_after"])})
+
+    resp.set_etag(etag, weak=True)
+    return resp
+
+
 @DB_bp.get("/getApproved")
 @jwt_required()
 def get_approved():
-    return jsonify(DB_Data.get_approved()), 200
+    return _device_list("ApprovedAddresses", DB_Data.get_approved)
 
 @DB_bp.get("/getUnapproved")
 @jwt_required()
 def get_unapproved():
-    return jsonify(DB_Data.get_unapproved()), 200
+    return _device_list("UnApprovedAddresses", DB_Data.get_unapproved)
+
+@DB_bp.get("/devices/<mac_address>/history")
+@jwt_required()
+def device_history(mac_address):
+    try:
+        return jsonify(DB_Data.get_device_history(
+            mac_address,
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+        )), 200
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+@DB_bp.get("/devices/<mac_address>/addresses")
+@jwt_required()
+def device_addresses(mac_address):
+    try:
+        return jsonify(DB_Data.get_device_addresses(mac_address)), 200
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
 @DB_bp.post("/addUnapproved")
 @jwt_required()
@@ -95,3 +169,32 @@ def remove_unapproved():
     )
     return jsonify({"ok": True}), 200
 
+
+# Bulk: mange enheder i én request og én transaktion, med et resultat pr. enhed
+def _bulk(action: str):
+    data = _json()
+    try:
+        result = DB_Data.bulk_update_devices(
+            action,
+            items=data.get("items"),
+            filter=data.get("filter"),
+            dry_run=bool(data.get("dry_run")),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify(result), 200
+
+@DB_bp.post("/bulk/addApproved")
+@jwt_required()
+def bulk_add_approved():
+    return _bulk("approve")
+
+@DB_bp.post("/bulk/removeApproved")
+@jwt_required()
+def bulk_remove_approved():
+    return _bulk("unapprove")
+
+@DB_bp.post("/bulk/removeUnapproved")
+@jwt_required()
+def bulk_remove_unapproved():
+    return _bulk("remove")
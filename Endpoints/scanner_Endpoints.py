@@ -1,12 +1,22 @@
 # Endpoints/ScannerEndpoints.py
-from flask import Blueprint, request, jsonify
+import json
+import os
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 
+import events
+import ingestion
 from Database import DB_Data
-from Scanner import scanner
+from Scanner import jobs
 
 Scanner_bp = Blueprint("scanner_bp", __name__)
 
+_PLAN_OPTIONS = ("timeout", "retries", "rate", "jitter")
+
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
 def _json():
     return request.get_json(silent=True) or {}
 
@@ -23,17 +33,87 @@ def start_scan():
         }), 400
 
     try:
-        scanner.run_scan(target)
-        return jsonify({
-            "ok": True,
-            "message": f"Scan started for {target}"
-        }), 200
+        # "profile": true kører netop denne scanning under cProfile
+        job, created = jobs.submit(target, profile=bool(data.get("profile")))
     except Exception as e:
         return jsonify({
             "ok": False,
             "error": str(e)
         }), 500
 
+    return jsonify({
+        "ok": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "deduplicated": not created,
+        "message": f"Scan queued for {target}" if created else f"Scan already running for {target}"
+    }), 202
+
+
+def _sse(event: dict) -> str:
+    lines = []
+    if event.get("id") is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event.get('data') or {}, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@Scanner_bp.get("/scans/stream")
+@jwt_required()
+def scans_stream():
+    # EventSource sender selv Last-Event-ID ved reconnect; query-param til første forbindelse
+    raw = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(raw) if raw not in (None, "") else None
+    except ValueError:
+        return jsonify({"ok": False, "error": "Last-Event-ID must be an integer"}), 400
+
+    def generate():
+        subscription = events.subscribe(last_event_id)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                event = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if subscription.closed:
+                    return
+                # kommentar-linje holder proxies og browseren fra at lukke forbindelsen
+                yield _sse(event) if event is not None else ": keep-alive\n\n"
+        finally:
+            subscription.close()
+
+    return Response(
+        stream_with_context(generate()),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@Scanner_bp.get("/scans/<job_id>")
+@jwt_required()
+def scan_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Unknown scan id"}), 404
+    return jsonify({"ok": True, **job}), 200
+
+
+@Scanner_bp.get("/scans")
+@jwt_required()
+def scans_recent():
+    return jsonify(jobs.recent()), 200
+
+
+@Scanner_bp.get("/agents")
+@jwt_required()
+def agents_list():
+    # ?window=sekunder styrer hvor langt tilbage throughput tælles (standard 1 time)
+    try:
+        window = max(60, min(int(request.args.get("window", 3600)), 7 * 86400))
+    except ValueError:
+        return jsonify({"ok": False, "error": "window must be an integer"}), 400
+    return jsonify(DB_Data.get_agents(window, offline_after=ingestion.AGENT_OFFLINE_SECONDS)), 200
+
 
 @Scanner_bp.post("/planScan")
 @jwt_required()
@@ -44,6 +124,7 @@ def plan_scan():
             interval=data.get("interval"),
             scan_target=data.get("scan_target"),
             last_scanned_at=data.get("last_scanned_at"),
+            **{k: data[k] for k in _PLAN_OPTIONS if k in data},
         )
         return jsonify(result), 201
     except Exception as e:
@@ -99,7 +180,11 @@ def planned_due():
 def delete_planned_scan():
     data = _json()
     try:
-        result = DB_Data.delete_planned_scan(interval=data.get("interval"))
+        # {"id": ...} sletter én plan; {"interval": ...} er den gamle form og sletter alle med det interval
+        if data.get("id") is not None:
+            result = DB_Data.delete_planned_scan(data.get("id"))
+        else:
+            result = DB_Data.delete_planned_scans_by_interval(data.get("interval"))
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
@@ -108,3 +193,72 @@ def delete_planned_scan():
 @jwt_required()
 def planned_scans_all():
     return jsonify(DB_Data.get_all_planned_scans()), 200
+
+
+@Scanner_bp.get("/plannedScans/<int:scan_id>")
+@jwt_required()
+def planned_scan_get(scan_id):
+    plan = DB_Data.get_planned_scan(scan_id)
+    if plan is None:
+        return jsonify({"ok": False, "error": "Unknown planned scan id"}), 404
+    return jsonify(plan), 200
+
+
+@Scanner_bp.patch("/plannedScans/<int:scan_id>")
+@jwt_required()
+def planned_scan_update(scan_id):
+    data = _json()
+    fields = {k: data[k] for k in ("interval", "scan_target", *_PLAN_OPTIONS) if k in data}
+    try:
+        result = DB_Data.update_planned_scan(scan_id, **fields)
+        return jsonify(result), 200
+    except LookupError as e:
+        return jsonify({"ok": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+
+@Scanner_bp.delete("/plannedScans/<int:scan_id>")
+@jwt_required()
+def planned_scan_delete(scan_id):
+    result = DB_Data.delete_planned_scan(scan_id)
+    return jsonify(result), 200 if result["deleted"] else 404
+
+
+@Scanner_bp.put("/plannedScans/<int:scan_id>/clearNext")
+@jwt_required()
+def planned_scan_clear_next(scan_id):
+    if DB_Data.get_planned_scan(scan_id) is None:
+        return jsonify({"ok": False, "error": "Unknown planned scan id"}), 404
+    return jsonify(DB_Data.clear_next_scan(scan_id=scan_id)), 200
+
+
+@Scanner_bp.put("/plannedScans/<int:scan_id>/touch")
+@jwt_required()
+def planned_scan_touch(scan_id):
+    try:
+        return jsonify(DB_Data.touch_planned_scan(scan_id)), 200
+    except LookupError as e:
+        return jsonify({"ok": False, "error": str(e)}), 404
+
+
+@Scanner_bp.post("/plannedScans/<int:scan_id>/run")
+@jwt_required()
+def planned_scan_run(scan_id):
+    # kører planen nu med dens egne options; selve skemaet flyttes ikke
+    plan = DB_Data.get_planned_scan(scan_id)
+    if plan is None:
+        return jsonify({"ok": False, "error": "Unknown planned scan id"}), 404
+
+    try:
+        job, created = jobs.submit(plan["scan_target"], **DB_Data.scan_options(plan))
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+    return jsonify({
+        "ok": True,
+        "id": scan_id,
+        "job_id": job["id"],
+        "status": job["status"],
+        "deduplicated": not created,
+    }), 202
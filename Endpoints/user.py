@@ -9,24 +9,13 @@ from flask_jwt_extended import (
     unset_jwt_cookies,
 )
 
-import sqlite3
-from pathlib import Path
+from Database import DB_Data
 
 user_bp = Blueprint("user", __name__)
 
-DB_PATH = Path("Database/SqliteDB")
-
 
 def _get_user(username: str) -> dict | None:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT username, password FROM Users WHERE username = ?", (username,))
-        row = cur.fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return DB_Data.get_user(username)
 
 
 @user_bp.post("/login")
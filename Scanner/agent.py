@@ -0,0 +1,249 @@
+# Scanner/agent.py
+"""
+Agent mode for scanner.py (--push URL): scan locally, upload to a central
+server's /dataIngression instead of writing a local DB.
+
+Every scan result becomes one batch with its own batch_id, written to a
+disk spool first (one JSON file each, like the notifier outbox) and deleted
+only once the server has accepted it. Uploads take up to
+AGENT_UPLOAD_BATCHES spooled batches per request as gzip NDJSON over one
+requests.Session, with a bounded number of retries (backoff, Retry-After).
+If the server stays unreachable the batches wait in the spool for the next
+round, also across restarts; the server drops batches it has already stored
+by batch_id, so re-sending after a lost response is harmless.
+
+Between uploads the agent posts a heartbeat so the server can tell a quiet
+network from a dead Pi.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+AGENT_VERSION = "1"
+AGENT_SPOOL_DIR = Path(os.getenv("AGENT_SPOOL_DIR", "Database/spool"))
+AGENT_SPOOL_MAX_BATCHES = int(os.getenv("AGENT_SPOOL_MAX_BATCHES", "10000"))
+AGENT_UPLOAD_BATCHES = int(os.getenv("AGENT_UPLOAD_BATCHES", "50"))
+AGENT_RETRIES = int(os.getenv("AGENT_RETRIES", "3"))
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "10"))
+AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
+
+
+class Spool:
+    """Batches waiting for upload, oldest first; one file per batch."""
+
+    def __init__(self, directory: Path | str = AGENT_SPOOL_DIR, max_batches: int = AGENT_SPOOL_MAX_BATCHES):
+        self.directory = Path(directory)
+        self.max_batches = int(max_batches)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dropped = 0
+
+    def _files(self) -> list[Path]:
+        return sorted(self.directory.glob("*.json"))
+
+    def __len__(self) -> int:
+        return len(self._files())
+
+    def put(self, batch: dict) -> Path:
+        path = self.directory / f"{time.time():.6f}-{batch['batch_id']}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(batch, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+        # a Pi cut off for weeks must not fill its SD card: the oldest scans go first
+        files = self._files()
+        for old in files[: max(0, len(files) - self.max_batches)]:
+            old.unlink(missing_ok=True)
+            self.dropped += 1
+        return path
+
+    def pending(self, limit: int) -> list[tuple[Path, str]]:
+        """Up to `limit` (path, JSON line) pairs, oldest first."""
+        out = []
+        for path in self._files()[:limit]:
+            try:
+                line = path.read_text(encoding="utf-8").strip()
+                json.loads(line)
+            except (OSError, ValueError) as e:
+                print(f"[agent] Dropping unreadable spool file {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            out.append((path, line))
+        return out
+
+    def remove(self, paths: list[Path]) -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    def reject(self, paths: list[Path]) -> None:
+        # kept for inspection, but out of the way of the next upload
+        rejected = self.directory / "rejected"
+        rejected.mkdir(exist_ok=True)
+        for path in paths:
+            if path.exists():
+                os.replace(path, rejected / path.name)
+
+
+def _session(token: str, agent_id: str, retries: int) -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # safe to repeat: the server deduplicates by batch_id
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": f"netscanner-agent/{AGENT_VERSION}",
+        "X-Agent-Id": agent_id,
+        "X-Agent-Hostname": socket.gethostname(),
+        "X-Agent-Version": AGENT_VERSION,
+    })
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+
+class Agent:
+    def __init__(
+        self,
+        url: str,
+        agent_id: str | None = None,
+        token: str | None = None,
+        spool: Spool | None = None,
+        upload_batches: int = AGENT_UPLOAD_BATCHES,
+        retries: int = AGENT_RETRIES,
+        timeout: float = AGENT_TIMEOUT_SECONDS,
+        session: requests.Session | None = None,
+    ):
+        self.url = url.rstrip("/")
+        self.heartbeat_url = f"{self.url}/heartbeat"
+        self.agent_id = agent_id or socket.gethostname()
+        self.spool = spool or Spool()
+        self.upload_batches = max(1, int(upload_batches))
+        self.timeout = float(timeout)
+        self.session = session or _session(token if token is not None else AGENT_TOKEN, self.agent_id, retries)
+        self.uploaded = 0
+        self.upload_failures = 0
+
+    def scan(self, target: str, engine: str | None = None, **sweep_options) -> dict:
+        """Sweeps `target` and spools the result; nothing is written locally."""
+        from Scanner.scanner import NetworkScanner
+
+        scanner = NetworkScanner(target, engine=engine, **sweep_options)
+        results = scanner.scan_arp()
+        batch = {
+            "batch_id": f"{self.agent_id}-{uuid.uuid4().hex}",
+            "target": target,
+            "started_at": datetime.fromtimestamp(scanner.started_at, timezone.utc).isoformat(timespec="seconds"),
+            "scanned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "devices": results,
+        }
+        self.spool.put(batch)
+        print(f"[agent] Scanned {target}: {len(results)} device(s), {len(self.spool)} batch(es) spooled")
+        return batch
+
+    def upload(self) -> dict:
+        """
+        Sends the spool until it is empty or the server can't take more.
+        Returns {"sent", "duplicates", "rejected", "remaining", "error"}.
+        """
+        sent = duplicates = rejected = 0
+        error = None
+        limit = self.upload_batches
+        while True:
+            chunk = self.spool.pending(limit)
+            if not chunk:
+                break
+            body = gzip.compress(("\n".join(line for _, line in chunk) + "\n").encode("utf-8"), compresslevel=6)
+            try:
+                r = self.session.post(
+                    self.url,
+                    data=body,
+                    headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                error = f"{type(e).__name__}: {e}"
+                break
+
+            if r.status_code == 202:
+                results = r.json().get("batches", [])
+                duplicates += sum(1 for b in results if b.get("status") == "duplicate")
+                sent += len(chunk)
+                self.spool.remove([p for p, _ in chunk])
+                limit = self.upload_batches
+            elif r.status_code in (400, 413):
+                # the server will never take these; halve the chunk until only the
+                # offending batch is left, so it doesn't take good ones down with it
+                if len(chunk) > 1:
+                    if r.status_code == 413:
+                        self.upload_batches = max(1, len(chunk) // 2)
+                    limit = max(1, len(chunk) // 2)
+                    continue
+                rejected += len(chunk)
+                self.spool.reject([p for p, _ in chunk])
+                print(f"[agent] Server rejected {len(chunk)} batch(es): {r.status_code} {r.text[:200]}")
+                limit = self.upload_batches
+            else:
+                error = f"HTTP {r.status_code}"
+                break
+
+        if error:
+            self.upload_failures += 1
+            print(f"[agent] Upload stopped ({error}); {len(self.spool)} batch(es) kept in spool")
+        self.uploaded += sent
+        return {"sent": sent, "duplicates": duplicates, "rejected": rejected, "remaining": len(self.spool), "error": error}
+
+    def heartbeat(self) -> bool:
+        try:
+            r = self.session.post(self.heartbeat_url, json={"spooled": len(self.spool)}, timeout=self.timeout)
+            return r.status_code == 202
+        except requests.RequestException as e:
+            print(f"[agent] Heartbeat failed: {e}")
+            return False
+
+    def run(
+        self,
+        targets: list[str],
+        interval: float | None = None,
+        stop: threading.Event | None = None,
+        engine: str | None = None,
+        **sweep_options,
+    ) -> None:
+        """Scan every target, upload, repeat every `interval` seconds (once when None)."""
+        stop = stop or threading.Event()
+        while True:
+            t0 = time.monotonic()
+            for target in targets:
+                try:
+                    self.scan(target, engine=engine, **sweep_options)
+                except Exception as e:
+                    print(f"[agent] ERROR scanning target='{target}': {e}")
+            summary = self.upload()
+            if not summary["sent"]:
+                self.heartbeat()
+            print(f"[agent] Upload: {summary}")
+
+            if interval is None or stop.wait(max(0.0, interval - (time.monotonic() - t0))):
+                break
+        self.session.close()
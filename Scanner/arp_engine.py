@@ -0,0 +1,285 @@
+# Scanner/arp_engine.py
+"""
+Adaptive ARP sweep.
+
+The target network is split into chunks that are sent at a capped packet
+rate. After the first pass only the hosts that did not answer are probed
+again, for up to `rounds` passes, and the sweep stops early as soon as a
+round brings in no new replies. The per-probe timeout shrinks to a multiple
+of the RTTs actually observed, so small quiet subnets don't wait a full
+second for nothing.
+
+The packet I/O goes through a backend with a single method:
+
+    probe(ips: list[str], timeout: float) -> list[tuple[ip, mac, rtt_s]]
+
+ScapyArpBackend does real ARP with srp(); SimulatedArpBackend answers from a
+host table so the engine can be exercised offline. PcapArpReplies streams
+the ARP replies out of a capture file instead of the network.
+"""
+from __future__ import annotations
+
+import ipaddress
+import random
+import struct
+import threading
+import time
+
+
+class ScapyArpBackend:
+    def __init__(self, iface: str | None = None):
+        self.iface = iface
+
+    def probe(self, ips: list[str], timeout: float) -> list[tuple[str, str, float]]:
+        import scapy.all as scapy
+
+        pkt = scapy.Ether(dst="ff:ff:ff:ff:ff:ff") / scapy.ARP(pdst=ips)
+        kwargs = {"timeout": timeout, "verbose": False}
+        if self.iface:
+            kwargs["iface"] = self.iface
+        answered = scapy.srp(pkt, **kwargs)[0]
+
+        out = []
+        for sent, r in answered:
+            rtt = max(0.0, float(r.time) - float(sent.sent_time or r.time))
+            out.append((r.psrc, r.hwsrc, rtt))
+        return out
+
+
+class SimulatedArpBackend:
+    """Offline stand-in: answers from `hosts` (ip -> mac) with latency and loss."""
+
+    def __init__(
+        self,
+        hosts: dict[str, str],
+        loss: float = 0.0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.hosts = dict(hosts)
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.packets_sent = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def probe(self, ips: list[str], timeout: float) -> list[tuple[str, str, float]]:
+        out = []
+        slowest = 0.0
+        with self._lock:
+            self.packets_sent += len(ips)
+            for ip in ips:
+                mac = self.hosts.get(ip)
+                if mac is None or self._rnd.random() < self.loss:
+                    continue
+                rtt = self.latency + self._rnd.random() * self.jitter
+                if rtt > timeout:
+                    continue
+                slowest = max(slowest, rtt)
+                out.append((ip, mac, rtt))
+
+        # like srp(): returns once everything answered, else after the timeout
+        wait = slowest if len(out) == len(ips) else timeout
+        if wait > 0:
+            time.sleep(wait)
+        return out
+
+
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_LINUX_SLL = 113
+_ETHERTYPE_ARP = 0x0806
+_VLAN_TAGS = (0x8100, 0x88A8)
+_ARP_REPLY = 2
+
+
+def _arp_payload(frame: bytes, linktype: int) -> int | None:
+    """Offset of the ARP header in a raw frame, or None if it isn't ARP."""
+    if linktype == _LINKTYPE_ETHERNET:
+        off, type_at = 14, 12
+    elif linktype == _LINKTYPE_LINUX_SLL:
+        off, type_at = 16, 14
+    else:
+        return None
+    if len(frame) < off:
+        return None
+    ethertype = int.from_bytes(frame[type_at:type_at + 2], "big")
+    # 802.1Q / QinQ tags in front of the real ethertype
+    while ethertype in _VLAN_TAGS and len(frame) >= off + 4:
+        ethertype = int.from_bytes(frame[off + 2:off + 4], "big")
+        off += 4
+    if ethertype != _ETHERTYPE_ARP or len(frame) < off + 28:
+        return None
+    return off
+
+
+class PcapArpReplies:
+    """
+    for ip, mac, ts in PcapArpReplies("capture.pcap"): ...
+
+    Reads the capture one frame at a time (pcap or pcapng) without building
+    scapy packets: the ARP header is picked out of the raw bytes, so a 100k
+    frame file streams in well under a second and memory stays flat. Only
+    IPv4-over-Ethernet replies are yielded; `packets`, `replies` and
+    `skipped` count what was read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.packets = 0
+        self.replies = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        from scapy.utils import RawPcapReader
+
+        mac_text: dict[bytes, str] = {}
+        reader = RawPcapReader(self.path)  # switches to pcapng by magic
+        try:
+            file_linktype = getattr(reader, "linktype", None)
+            for frame, meta in reader:
+                self.packets += 1
+                linktype = getattr(meta, "linktype", file_linktype)
+                off = _arp_payload(frame, linktype)
+                if off is None:
+                    self.skipped += 1
+                    continue
+                htype, ptype, hlen, plen, op = struct.unpack_from("!HHBBH", frame, off)
+                if op != _ARP_REPLY or htype != 1 or ptype != 0x0800 or hlen != 6 or plen != 4:
+                    self.skipped += 1
+                    continue
+
+                raw_mac = frame[off + 8:off + 14]
+                mac = mac_text.get(raw_mac)
+                if mac is None:
+                    mac = mac_text[raw_mac] = ":".join(f"{b:02x}" for b in raw_mac)
+                ip = ".".join(str(b) for b in frame[off + 14:off + 18])
+                if hasattr(meta, "sec"):
+                    ts = meta.sec + meta.usec / 1_000_000
+                else:
+                    ts = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+                self.replies += 1
+                yield ip, mac, ts
+        finally:
+            reader.close()
+
+
+def _chunks(items: list[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _octet_values(part: str) -> range:
+    if part == "*":
+        return range(256)
+    lo, _, hi = part.partition("-")
+    lo, hi = int(lo), int(hi or lo)
+    if not 0 <= lo <= hi <= 255:
+        raise ValueError(f"bad octet range {part}")
+    return range(lo, hi + 1)
+
+
+def expand_target(target: str) -> list[str]:
+    """CIDR / single address, or an IPv4 octet range like 192.168.1.1-50 or 10.0.*.1."""
+    target = target.strip()
+    try:
+        net = ipaddress.ip_network(target, strict=False)
+    except ValueError:
+        parts = target.split(".")
+        if len(parts) != 4 or not any("-" in p or p == "*" for p in parts):
+            raise
+        try:
+            octets = [_octet_values(p) for p in parts]
+        except ValueError:
+            raise ValueError(f"{target} does not appear to be an IPv4 or IPv6 network or range") from None
+        return [f"{a}.{b}.{c}.{d}" for a in octets[0] for b in octets[1] for c in octets[2] for d in octets[3]]
+    if net.num_addresses == 1:
+        return [str(net.network_address)]
+    return [str(ip) for ip in net.hosts()]
+
+
+class ArpSweep:
+    def __init__(
+        self,
+        backend=None,
+        rate: float = 500.0,
+        chunk_size: int = 256,
+        rounds: int = 3,
+        timeout: float = 1.0,
+        min_timeout: float = 0.05,
+        rtt_factor: float = 4.0,
+    ):
+        self.backend = backend or ScapyArpBackend()
+        self.rate = float(rate)  # packets per second, <= 0 means unlimited
+        self.chunk_size = max(1, int(chunk_size))
+        self.rounds = max(1, int(rounds))
+        self.timeout = float(timeout)
+        self.min_timeout = float(min_timeout)
+        self.rtt_factor = float(rtt_factor)
+        self._sleep = time.sleep
+
+    def _next_timeout(self, rtts: list[float]) -> float:
+        if not rtts:
+            return self.timeout
+        rtts = sorted(rtts)
+        p95 = rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))]
+        return min(self.timeout, max(self.min_timeout, p95 * self.rtt_factor))
+
+    def sweep(self, target: str) -> tuple[dict[str, str], dict]:
+        """Returns ({ip: mac}, report)."""
+        addresses = expand_target(target)
+        found: dict[str, str] = {}
+        rtts: list[float] = []
+        rounds = []
+        pending = addresses
+        t_start = time.perf_counter()
+        sent = 0
+
+        for n in range(1, self.rounds + 1):
+            t_round = time.perf_counter()
+            timeout = self.timeout if n == 1 else self._next_timeout(rtts)
+            hits = 0
+            new = 0
+
+            for chunk in _chunks(pending, self.chunk_size):
+                t_chunk = time.perf_counter()
+                for ip, mac, rtt in self.backend.probe(chunk, timeout):
+                    hits += 1
+                    rtts.append(rtt)
+                    if ip not in found:
+                        found[ip] = mac
+                        new += 1
+                sent += len(chunk)
+
+                if self.rate > 0:
+                    budget = len(chunk) / self.rate
+                    spent = time.perf_counter() - t_chunk
+                    if spent < budget:
+                        self._sleep(budget - spent)
+
+            rounds.append({
+                "round": n,
+                "probed": len(pending),
+                "hits": hits,
+                "new": new,
+                "timeout_s": round(timeout, 4),
+                "elapsed_s": round(time.perf_counter() - t_round, 4),
+                "coverage": round(len(found) / len(addresses), 4) if addresses else 0.0,
+            })
+
+            pending = [ip for ip in pending if ip not in found]
+            # replies stopped arriving (or everyone answered): no point in more rounds
+            if not pending or (n > 1 and new == 0):
+                break
+
+        report = {
+            "target": target,
+            "addresses": len(addresses),
+            "found": len(found),
+            "packets_sent": sent,
+            "coverage": round(len(found) / len(addresses), 4) if addresses else 0.0,
+            "elapsed_s": round(time.perf_counter() - t_start, 4),
+            "rounds": rounds,
+        }
+        return found, report
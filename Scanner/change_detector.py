@@ -0,0 +1,116 @@
+# Scanner/change_detector.py
+"""
+Change detection between consecutive scans of the same target.
+
+The previous result set of every target is kept in memory as a set of
+(mac, ip) pairs (and in ScanSnapshots, for restarts). diff() compares a new
+result against it in O(n) and reports appeared, disappeared and IP-changed
+devices. Callers upsert only the changed devices, plus a full write every
+SCAN_REFRESH_SECONDS; the unchanged pairs still get last_seen and a
+sighting on every scan (DB_Data.ingest_scan(unchanged=...)).
+SCAN_REFRESH_SECONDS=0 turns change detection off (every scan is full).
+
+A device removed from the lists (remove_unapproved) while a snapshot still
+holds it would otherwise stay unlisted until the next refresh; the
+DeviceRemovals version is kept with each snapshot, and when it has moved
+(in any process) the next scan of every target is a full write.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from Database import DB_Data
+
+SCAN_REFRESH_SECONDS = int(os.getenv("SCAN_REFRESH_SECONDS", "900"))
+
+_lock = threading.Lock()
+_snapshots: dict[str, dict] = {}  # target -> {"pairs": set, "refreshed_at": int, "removals": int | None}
+_listeners: list = []
+
+
+def add_listener(fn) -> None:
+    """fn(target, delta) is called after every scan that changed something."""
+    _listeners.append(fn)
+
+
+def clear_cache() -> None:
+    """Forget the in-memory snapshots (e.g. after DB_Data was pointed at another DB)."""
+    with _lock:
+        _snapshots.clear()
+
+
+def _pair(r: dict) -> tuple[str, str]:
+    return str(r.get("MAC") or "").strip().lower(), str(r.get("IP") or "").strip()
+
+
+def _load(target: str) -> dict | None:
+    # caller holds _lock
+    snap = _snapshots.get(target)
+    if snap is None:
+        row = DB_Data.get_scan_snapshot(target)
+        if row is None:
+            return None
+        # version unknown after a restart: the first scan writes everything once
+        snap = {"pairs": set(row["pairs"]), "refreshed_at": row["refreshed_at"], "removals": None}
+        _snapshots[target] = snap
+    return snap
+
+
+def diff(target: str, results: list[dict], now: float | None = None) -> dict:
+    now = now or time.time()
+    by_pair = {_pair(r): r for r in results}
+    by_pair.pop(("", ""), None)
+    current = set(by_pair)
+    removals = DB_Data.get_table_version(DB_Data.DEVICE_REMOVALS)
+
+    with _lock:
+        snap = _load(target)
+        previous = set(snap["pairs"]) if snap else set()
+        full_refresh = (
+            snap is None
+            or SCAN_REFRESH_SECONDS <= 0
+            or now - snap["refreshed_at"] >= SCAN_REFRESH_SECONDS
+            or snap.get("removals") != removals
+        )
+
+    appeared_pairs = current - previous
+    gone_pairs = previous - current
+
+    old_ip = {mac: ip for mac, ip in gone_pairs}
+    new_ip = {mac: ip for mac, ip in appeared_pairs}
+    moved = old_ip.keys() & new_ip.keys()
+
+    return {
+        "full_refresh": full_refresh,
+        "appeared": [by_pair[p] for p in appeared_pairs if p[0] not in moved],
+        "disappeared": [{"MAC": mac, "IP": ip} for mac, ip in gone_pairs if mac not in moved],
+        "ip_changed": [{"MAC": mac, "old_ip": old_ip[mac], "new_ip": new_ip[mac]} for mac in moved],
+        # everything that has to be written when this is not a full refresh
+        "changed_results": [by_pair[p] for p in appeared_pairs],
+        # seen again at the same address: only last_seen/sightings are written for these
+        "unchanged": sorted(current & previous),
+        "pairs": current,
+        "removals": removals,
+    }
+
+
+def commit(target: str, delta: dict, now: float | None = None) -> None:
+    """Remember this scan as the new baseline (persisted only when something changed)."""
+    now = int(now or time.time())
+    changed = bool(delta["appeared"] or delta["disappeared"] or delta["ip_changed"])
+
+    with _lock:
+        snap = _snapshots.get(target)
+        refreshed_at = now if delta["full_refresh"] or snap is None else snap["refreshed_at"]
+        if changed or delta["full_refresh"]:
+            DB_Data.save_scan_snapshot(target, delta["pairs"], refreshed_at)
+        _snapshots[target] = {"pairs": set(delta["pairs"]), "refreshed_at": refreshed_at, "removals": delta.get("removals")}
+
+    if changed:
+        for fn in list(_listeners):
+            try:
+                fn(target, delta)
+            except Exception as e:
+                print(f"[changes] ERROR in listener for target='{target}': {e}")
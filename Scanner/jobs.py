@@ -0,0 +1,185 @@
+# Scanner/jobs.py
+"""
+Background scan jobs.
+
+Every scan (API triggered or planned) runs as a job on one bounded executor.
+A target that already has a queued/running job is not scanned twice: submit()
+hands back the existing job instead. Finished jobs are kept in memory (last
+SCAN_JOB_HISTORY) so /scans/<id> can report on them.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import events
+import metrics
+from Scanner import scanner
+
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+SCAN_JOB_HISTORY = int(os.getenv("SCAN_JOB_HISTORY", "200"))
+
+_executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan-job")
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, dict]" = OrderedDict()
+_active: dict[str, str] = {}  # target -> job id (queued or running)
+
+metrics.registry.gauge("scan_jobs_active", "Scan jobs queued or running.", lambda: len(_active))
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _snapshot(job: dict) -> dict:
+    out = {k: v for k, v in job.items() if not k.startswith("_")}
+    out["devices"] = dict(job["devices"])
+    out["timings"] = dict(job["timings"])
+    return out
+
+
+def _trim_history() -> None:
+    # caller holds _lock
+    while len(_jobs) > SCAN_JOB_HISTORY:
+        oldest_id, oldest = next(iter(_jobs.items()))
+        if oldest["status"] in ("queued", "running"):
+            break
+        _jobs.pop(oldest_id)
+
+
+def _run(job_id: str) -> None:
+    with _lock:
+        job = _jobs[job_id]
+        target = job["target"]
+        options = job["_options"]
+        job.update(status="running", started_at=_now_iso(), stage="starting")
+    events.publish("scan-started", {"job_id": job_id, "target": target})
+
+    def progress(stage: str, fraction: float, **info) -> None:
+        with _lock:
+            job["stage"] = stage
+            job["progress"] = round(fraction, 3)
+            job["devices"].update(info)
+
+    t0 = time.perf_counter()
+    try:
+        summary = scanner.run_scan(target, progress=progress, **options)
+        with _lock:
+            job["devices"].update(
+                found=summary["found"],
+                approved=summary["approved"],
+                unapproved=summary["unapproved"],
+                new_unapproved=summary["new_unapproved"],
+                written=summary["written"],
+                **{k: v for k, v in summary["changes"].items() if k != "full_refresh"},
+            )
+            job["timings"].update(summary["timings"])
+            job.update(status="succeeded", stage="done", progress=1.0)
+    except Exception as e:
+        with _lock:
+            job.update(status="failed", error=str(e))
+        print(f"[jobs] ERROR scanning target='{target}': {e}")
+    finally:
+        with _lock:
+            job["timings"]["total_s"] = round(time.perf_counter() - t0, 4)
+            job["finished_at"] = _now_iso()
+            snapshot = _snapshot(job)
+
+        events.publish("scan-finished", {
+            "job_id": job_id,
+            "target": target,
+            "status": snapshot["status"],
+            "error": snapshot["error"],
+            "devices": snapshot["devices"],
+            "timings": snapshot["timings"],
+        })
+
+        # callbacks run while the target is still claimed (e.g. the schedule update);
+        # submit() can attach more until the claim is released, so drain until empty
+        while True:
+            with _lock:
+                callbacks = job["_callbacks"]
+                job["_callbacks"] = []
+                if not callbacks:
+                    if _active.get(target) == job_id:
+                        _active.pop(target)
+                    _trim_history()
+                    break
+            for cb in callbacks:
+                try:
+                    cb(snapshot)
+                except Exception as e:
+                    print(f"[jobs] ERROR in completion callback for target='{target}': {e}")
+
+
+def submit(target: str, on_done=None, **options) -> tuple[dict, bool]:
+    """
+    Queue a scan of `target`. Returns (job, created); created is False when
+    an identical target was already queued/running and that job is returned.
+    `on_done(job)` is called from the worker thread when the job finishes;
+    for an existing job it is added to that job's callbacks.
+    """
+    target = (target or "").strip()
+    if not target:
+        raise ValueError("scan_target is required")
+
+    with _lock:
+        existing = _active.get(target)
+        if existing is not None:
+            job = _jobs[existing]
+            if on_done is not None:
+                job["_callbacks"].append(on_done)
+            return _snapshot(job), False
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "target": target,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "created_at": _now_iso(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "devices": {},
+            "timings": {},
+            "_options": options,
+            "_callbacks": [on_done] if on_done else [],
+        }
+        _jobs[job_id] = job
+        _active[target] = job_id
+
+    try:
+        _executor.submit(_run, job_id)
+    except RuntimeError:
+        # executor is shutting down
+        with _lock:
+            _active.pop(target, None)
+            _jobs.pop(job_id, None)
+        raise
+
+    with _lock:
+        return _snapshot(job), True
+
+
+def is_active(target: str) -> bool:
+    with _lock:
+        return (target or "").strip() in _active
+
+
+def get(job_id: str) -> dict | None:
+    with _lock:
+        job = _jobs.get(job_id)
+        return _snapshot(job) if job else None
+
+
+def recent(limit: int = 50) -> list[dict]:
+    with _lock:
+        jobs = list(_jobs.values())[-limit:]
+        return [_snapshot(j) for j in reversed(jobs)]
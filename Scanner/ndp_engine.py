@@ -0,0 +1,297 @@
+# Scanner/ndp_engine.py
+"""
+IPv6 neighbour discovery sweep.
+
+A /64 can't be swept like an IPv4 subnet, so the NDP engine never
+enumerates the prefix. It asks the link instead:
+
+  1. one ICMPv6 echo to all-nodes (ff02::1), sent from our link-local and,
+     if the interface has one, from our address in the target prefix; every
+     host answers with its link-local / global address and its MAC.
+  2. a Neighbor Solicitation per candidate address, sent to that address's
+     solicited-node group (ff02::1:ffXX:XXXX), which only the owner of the
+     address listens on. Candidates are the addresses seen before in the
+     prefix (DeviceAddresses) plus the EUI-64 address of every MAC found in
+     step 1, minus whatever already answered the echo, so SLAAC and
+     privacy addresses that a host doesn't reply from are still confirmed
+     by their Neighbor Advertisement.
+
+The second step repeats (up to `rounds`) while it brings in new MACs. All
+replies are (address, MAC) pairs, so one MAC usually comes back with
+several addresses.
+
+The packet I/O goes through a backend with a single method:
+
+    discover(prefix, targets, timeout, echo) -> list[tuple[ip, mac, rtt_s]]
+
+ScapyNdpBackend does real ICMPv6 on an interface; SimulatedNdpBackend
+answers from a host table so the engine can be exercised offline.
+"""
+from __future__ import annotations
+
+import ipaddress
+import random
+import threading
+import time
+
+ALL_NODES = "ff02::1"
+_ALL_NODES_MAC = "33:33:00:00:00:01"
+_SOLICITED_NODE_BASE = int(ipaddress.IPv6Address("ff02::1:ff00:0"))
+
+
+def solicited_node(address: str) -> tuple[str, str]:
+    """(solicited-node multicast address, its Ethernet group MAC) for `address`."""
+    group = ipaddress.IPv6Address(_SOLICITED_NODE_BASE | (int(ipaddress.IPv6Address(address)) & 0xFFFFFF))
+    tail = group.packed[-4:]
+    return str(group), "33:33:" + ":".join(f"{b:02x}" for b in tail)
+
+
+def eui64_address(prefix: ipaddress.IPv6Network, mac: str) -> str | None:
+    """The SLAAC (modified EUI-64) address `mac` would take in `prefix`, if it is /64 or shorter."""
+    if prefix.prefixlen > 64:
+        return None
+    raw = bytes(int(b, 16) for b in mac.split(":"))
+    iid = bytes([raw[0] ^ 0x02]) + raw[1:3] + b"\xff\xfe" + raw[3:6]
+    return str(ipaddress.IPv6Address(int(prefix.network_address) | int.from_bytes(iid, "big")))
+
+
+def parse_prefix(target: str) -> ipaddress.IPv6Network:
+    """The target of an NDP scan: an IPv6 prefix (fe80::/64 = link-local only)."""
+    net = ipaddress.ip_network(target.strip(), strict=False)
+    if net.version != 6:
+        raise ValueError(f"NDP needs an IPv6 prefix, got {target}")
+    return net
+
+
+def is_ipv6_target(target: str | None) -> bool:
+    try:
+        return ipaddress.ip_network((target or "").strip(), strict=False).version == 6
+    except ValueError:
+        return False
+
+
+class ScapyNdpBackend:
+    def __init__(self, iface: str | None = None, rate: float = 500.0):
+        self.iface = iface
+        self.rate = float(rate)
+
+    def _sources(self, iface: str, prefix: ipaddress.IPv6Network) -> list[str]:
+        from scapy.arch import in6_getifaddr
+
+        link_local, in_prefix = [], []
+        for addr, _, name in in6_getifaddr():
+            if name != iface:
+                continue
+            ip = ipaddress.IPv6Address(addr.split("%")[0])
+            if ip.is_link_local:
+                link_local.append(str(ip))
+            elif ip in prefix:
+                in_prefix.append(str(ip))
+        # a global source makes hosts answer from their global address, link-local from theirs
+        return link_local[:1] + in_prefix[:1]
+
+    def discover(
+        self,
+        prefix: ipaddress.IPv6Network,
+        targets: list[str],
+        timeout: float,
+        echo: bool = True,
+    ) -> list[tuple[str, str, float]]:
+        import scapy.all as scapy
+        from scapy.layers.inet6 import (
+            ICMPv6EchoReply,
+            ICMPv6EchoRequest,
+            ICMPv6ND_NA,
+            ICMPv6ND_NS,
+            ICMPv6NDOptDstLLAddr,
+            ICMPv6NDOptSrcLLAddr,
+            IPv6,
+        )
+
+        iface = self.iface or str(scapy.conf.iface)
+        own_mac = scapy.get_if_hwaddr(iface).lower()
+        sources = self._sources(iface, prefix)
+        if not sources:
+            raise RuntimeError(f"{iface} has no IPv6 link-local address")
+        echo_id = random.randint(1, 0xFFFF)
+
+        pkts = []
+        if echo:
+            for src in sources:
+                pkts.append(
+                    scapy.Ether(dst=_ALL_NODES_MAC) / IPv6(src=src, dst=ALL_NODES, hlim=255)
+                    / ICMPv6EchoRequest(id=echo_id, seq=len(pkts))
+                )
+        for tgt in targets:
+            group, group_mac = solicited_node(tgt)
+            src = sources[-1] if ipaddress.IPv6Address(tgt) in prefix and not prefix.is_link_local else sources[0]
+            pkts.append(
+                scapy.Ether(dst=group_mac) / IPv6(src=src, dst=group, hlim=255)
+                / ICMPv6ND_NS(tgt=tgt) / ICMPv6NDOptSrcLLAddr(lladdr=own_mac)
+            )
+        if not pkts:
+            return []
+
+        ready = threading.Event()
+        sniffer = scapy.AsyncSniffer(
+            iface=iface,
+            filter="icmp6",
+            lfilter=lambda p: p.haslayer(ICMPv6EchoReply) or p.haslayer(ICMPv6ND_NA),
+            started_callback=ready.set,
+            store=True,
+        )
+        sniffer.start()
+        ready.wait(2.0)
+        t_sent = time.time()
+        scapy.sendp(pkts, iface=iface, inter=1.0 / self.rate if self.rate > 0 else 0, verbose=False)
+        time.sleep(timeout)
+        captured = sniffer.stop() or []
+
+        out = []
+        for p in captured:
+            mac = str(p.src).lower()
+            if p.haslayer(ICMPv6ND_NA):
+                ip = p[ICMPv6ND_NA].tgt
+                if p.haslayer(ICMPv6NDOptDstLLAddr):
+                    mac = str(p[ICMPv6NDOptDstLLAddr].lladdr).lower()
+            elif p[ICMPv6EchoReply].id == echo_id:
+                ip = p[IPv6].src
+            else:
+                continue
+            if mac == own_mac:
+                continue
+            out.append((str(ipaddress.IPv6Address(ip)), mac, max(0.0, float(p.time) - t_sent)))
+        return out
+
+
+class SimulatedNdpBackend:
+    """
+    Offline stand-in: `hosts` is mac -> [IPv6 addresses]. The all-nodes echo
+    is answered with each host's first link-local and first in-prefix address
+    (what a real host picks as reply source); other addresses, e.g. privacy
+    addresses, are only found by a solicitation for exactly that address.
+    """
+
+    def __init__(self, hosts: dict[str, list[str]], loss: float = 0.0, latency: float = 0.0, seed: int | None = None):
+        self.hosts = {mac: [str(ipaddress.IPv6Address(a)) for a in addrs] for mac, addrs in hosts.items()}
+        self.owner = {addr: mac for mac, addrs in self.hosts.items() for addr in addrs}
+        self.loss = loss
+        self.latency = latency
+        self.packets_sent = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def discover(
+        self,
+        prefix: ipaddress.IPv6Network,
+        targets: list[str],
+        timeout: float,
+        echo: bool = True,
+    ) -> list[tuple[str, str, float]]:
+        out = []
+        with self._lock:
+            self.packets_sent += len(targets) + (2 if echo else 0)
+            if echo:
+                for mac, addrs in self.hosts.items():
+                    link_local = [a for a in addrs if ipaddress.IPv6Address(a).is_link_local]
+                    in_prefix = [a for a in addrs if ipaddress.IPv6Address(a) in prefix and a not in link_local]
+                    for a in link_local[:1] + in_prefix[:1]:
+                        if self._rnd.random() >= self.loss:
+                            out.append((a, mac, self.latency))
+            for tgt in targets:
+                mac = self.owner.get(str(ipaddress.IPv6Address(tgt)))
+                if mac is not None and self._rnd.random() >= self.loss:
+                    out.append((str(ipaddress.IPv6Address(tgt)), mac, self.latency))
+        # multicast replies have no "all answered" point: always wait the window out
+        if timeout > 0:
+            time.sleep(min(timeout, max(self.latency, 0.0)))
+        return out
+
+
+class NdpSweep:
+    def __init__(
+        self,
+        backend=None,
+        rate: float = 500.0,
+        chunk_size: int = 256,
+        rounds: int = 3,
+        timeout: float = 1.0,
+    ):
+        self.backend = backend or ScapyNdpBackend(rate=rate)
+        self.rate = float(rate)  # packets per second, <= 0 means unlimited
+        self.chunk_size = max(1, int(chunk_size))
+        self.rounds = max(1, int(rounds))
+        self.timeout = float(timeout)
+        self._sleep = time.sleep
+
+    def _solicit(self, prefix, targets: list[str], echo: bool) -> tuple[list, int]:
+        replies = []
+        sent = 2 if echo else 0
+        if not targets:
+            return self.backend.discover(prefix, [], self.timeout, echo=echo), sent
+        for i in range(0, len(targets), self.chunk_size):
+            t_chunk = time.perf_counter()
+            chunk = targets[i:i + self.chunk_size]
+            replies += self.backend.discover(prefix, chunk, self.timeout, echo=echo and i == 0)
+            sent += len(chunk)
+
+            # same budget as ArpSweep, so a backend passed in (that paces itself differently) still keeps the rate
+            if self.rate > 0:
+                budget = len(chunk) / self.rate
+                spent = time.perf_counter() - t_chunk
+                if spent < budget:
+                    self._sleep(budget - spent)
+        return replies, sent
+
+    def sweep(self, target: str, known: list[str] = ()) -> tuple[dict[tuple[str, str], float], dict]:
+        """Returns ({(ip, mac): rtt}, report); `known` are addresses seen in the prefix before."""
+        prefix = parse_prefix(target)
+        found: dict[tuple[str, str], float] = {}
+        asked: set[str] = set()
+        rounds = []
+        sent = 0
+        t_start = time.perf_counter()
+
+        # round 1 is the all-nodes echo alone; known addresses that answered it need no NS
+        known = [str(ipaddress.IPv6Address(a)) for a in known if ipaddress.IPv6Address(a) in prefix]
+        pending: list[str] = []
+        for n in range(1, self.rounds + 1):
+            t_round = time.perf_counter()
+            asked.update(pending)
+            macs_before = {mac for _, mac in found}
+            replies, n_sent = self._solicit(prefix, pending, echo=n == 1)
+            sent += n_sent
+            new = 0
+            for ip, mac, rtt in replies:
+                if (ip, mac) not in found:
+                    found[(ip, mac)] = rtt
+                    new += 1
+            rounds.append({
+                "round": n,
+                "probed": len(pending),
+                "hits": len(replies),
+                "new": new,
+                "timeout_s": self.timeout,
+                "elapsed_s": round(time.perf_counter() - t_round, 4),
+            })
+
+            # next: the SLAAC address of every new MAC (and after the echo, the known addresses)
+            answered = {ip for ip, _ in found}
+            candidates = known if n == 1 else []
+            for mac in sorted({mac for _, mac in found} - macs_before):
+                addr = eui64_address(prefix, mac) if not prefix.is_link_local else None
+                if addr:
+                    candidates.append(addr)
+            pending = list(dict.fromkeys(a for a in candidates if a not in asked and a not in answered))
+            if not pending:
+                break
+
+        report = {
+            "target": str(prefix),
+            "addresses": len(found),
+            "devices": len({mac for _, mac in found}),
+            "packets_sent": sent,
+            "elapsed_s": round(time.perf_counter() - t_start, 4),
+            "rounds": rounds,
+        }
+        return found, report
@@ -0,0 +1,167 @@
+# Scanner/oui.py
+"""
+Process-wide MAC vendor (OUI) index.
+
+The vendor list is read once from local files into plain dicts keyed by the
+integer prefix, and every scan in the process shares it. Nothing here ever
+touches the network; use scripts/update_vendors.py to refresh the files and
+refresh_if_changed() (or refresh_in_background()) to pick them up.
+
+Supported files (OUI_FILE, comma separated, default: mac_vendor_lookup's cache):
+  - mac-vendors.txt lines "PREFIX:Vendor" with a 6 (MA-L), 7 (MA-M) or
+    9 (MA-S) hex digit prefix
+  - IEEE registry CSVs (oui.csv, mam.csv, mas.csv)
+"""
+from __future__ import annotations
+
+import csv
+import os
+import threading
+
+import metrics
+
+_DEFAULT_FILES = [
+    os.path.expanduser("~/.cache/mac-vendors.txt"),
+    "Database/mac-vendors.txt",
+]
+
+
+class OuiIndex:
+    def __init__(self):
+        self.by24: dict[int, str] = {}
+        self.by28: dict[int, str] = {}
+        self.by36: dict[int, str] = {}
+        # 24-bit prefixes that are split into MA-M/MA-S blocks
+        self.split: set[int] = set()
+
+    def add(self, prefix_hex: str, vendor: str) -> None:
+        prefix_hex = prefix_hex.replace(":", "").replace("-", "").strip().upper()
+        vendor = vendor.strip()
+        if not prefix_hex or not vendor:
+            return
+        try:
+            value = int(prefix_hex, 16)
+        except ValueError:
+            return
+
+        bits = len(prefix_hex) * 4
+        if bits == 24:
+            self.by24[value] = vendor
+        elif bits == 28:
+            self.by28[value] = vendor
+            self.split.add(value >> 4)
+        elif bits == 36:
+            self.by36[value] = vendor
+            self.split.add(value >> 12)
+
+    def lookup_int(self, mac: int) -> str | None:
+        p24 = mac >> 24
+        if p24 in self.split:
+            vendor = self.by36.get(mac >> 12) or self.by28.get(mac >> 20)
+            if vendor:
+                return vendor
+        return self.by24.get(p24)
+
+    def __len__(self) -> int:
+        return len(self.by24) + len(self.by28) + len(self.by36)
+
+
+def _load_file(index: OuiIndex, path: str) -> None:
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8", errors="replace") as f:
+            for row in csv.DictReader(f):
+                index.add(row.get("Assignment") or "", row.get("Organization Name") or "")
+        return
+
+    with open(path, "rb") as f:
+        # hele filen på én gang er langt hurtigere end linje for linje
+        for line in f.read().splitlines():
+            if b":" not in line:
+                continue
+            prefix, vendor = line.split(b":", 1)
+            index.add(prefix.decode("ascii", "replace"), vendor.decode("utf-8", "replace"))
+
+
+def _vendor_files() -> list[str]:
+    configured = os.getenv("OUI_FILE")
+    if configured:
+        return [p.strip() for p in configured.split(",") if p.strip()]
+    return [p for p in _DEFAULT_FILES if os.path.exists(p)][:1]
+
+
+_index = OuiIndex()
+_loaded = False
+_mtimes: dict[str, float] = {}
+_load_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+
+def _mtimes_for(paths: list[str]) -> dict[str, float]:
+    out = {}
+    for p in paths:
+        try:
+            out[p] = os.path.getmtime(p)
+        except OSError:
+            pass
+    return out
+
+
+def load(paths: list[str] | None = None) -> int:
+    """(Re)build the index from the vendor files and swap it in atomically."""
+    global _index, _loaded, _mtimes
+
+    paths = paths or _vendor_files()
+    index = OuiIndex()
+    with metrics.span("oui_load"):
+        for p in paths:
+            try:
+                _load_file(index, p)
+            except OSError as e:
+                print(f"[oui] Could not read vendor file {p}: {e}")
+
+    with _load_lock:
+        _index = index
+        _loaded = True
+        _mtimes = _mtimes_for(paths)
+
+    print(f"[oui] Loaded {len(index)} vendor prefixes from {', '.join(paths) or 'no files'}")
+    return len(index)
+
+
+def _ensure_loaded() -> None:
+    if _loaded:
+        return
+    with _init_lock:
+        if not _loaded:
+            load()
+
+
+def refresh_if_changed(paths: list[str] | None = None) -> bool:
+    paths = paths or _vendor_files()
+    if _loaded and _mtimes_for(paths) == _mtimes:
+        return False
+    load(paths)
+    return True
+
+
+def refresh_in_background(paths: list[str] | None = None) -> threading.Thread:
+    t = threading.Thread(target=refresh_if_changed, args=(paths,), name="oui-refresh", daemon=True)
+    t.start()
+    return t
+
+
+def mac_to_int(mac: str) -> int:
+    return int(mac.replace(":", "").replace("-", "").replace(".", ""), 16)
+
+
+def lookup(mac: str) -> str | None:
+    _ensure_loaded()
+    try:
+        return _index.lookup_int(mac_to_int(mac))
+    except ValueError:
+        return None
+
+
+def size() -> int:
+    _ensure_loaded()
+    return len(_index)
@@ -0,0 +1,308 @@
+# Scanner/passive.py
+"""
+Passive listener: learns devices from the ARP and DHCP traffic they send
+anyway, between (or instead of) active sweeps.
+
+The kernel only hands us ARP and DHCP packets (PASSIVE_BPF_FILTER), so the
+sniffer thread sees a few packets per second even on a busy LAN. Each one is
+reduced to an (IP, MAC) pair:
+
+  ARP request / reply   sender IP + MAC (ARP probes from 0.0.0.0 are skipped)
+  gratuitous ARP        the same, announced by the host itself
+  DHCP REQUEST / ACK    client MAC (chaddr) + requested / assigned address
+
+A seen-set keeps the pairs flushed in the last PASSIVE_SEEN_TTL_SECONDS, so
+the chatter of known hosts never reaches the DB. New pairs are collected and
+written every PASSIVE_FLUSH_SECONDS (or at PASSIVE_BATCH_MAX pairs) by the
+listener's flush loop, never on the sniffer thread, with one
+ingest_scan() under scan_target "passive:<iface>", and new unapproved
+devices go to the notifier like after a sweep.
+
+replay(path) feeds a pcap file through the same path, with the capture's
+own timestamps as the clock, so the listener can be tested offline.
+"""
+from __future__ import annotations
+
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+from optparse import OptionParser
+
+import events
+import metrics
+
+PASSIVE_BPF_FILTER = os.getenv("PASSIVE_BPF_FILTER", "arp or (udp and (port 67 or port 68))")
+PASSIVE_FLUSH_SECONDS = float(os.getenv("PASSIVE_FLUSH_SECONDS", "5"))
+PASSIVE_BATCH_MAX = int(os.getenv("PASSIVE_BATCH_MAX", "256"))
+PASSIVE_SEEN_TTL_SECONDS = float(os.getenv("PASSIVE_SEEN_TTL_SECONDS", "600"))
+PASSIVE_SEEN_MAX = int(os.getenv("PASSIVE_SEEN_MAX", "65536"))
+
+_DHCP_REQUEST = 3
+_DHCP_ACK = 5
+_ZERO_MACS = ("00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff")
+
+passive_packets = metrics.registry.counter(
+    "passive_packets_total", "Packets seen by the passive listener by outcome.", ("outcome",)
+)
+
+
+def _usable_ip(ip: str | None) -> bool:
+    if not ip:
+        return False
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return not (addr.is_unspecified or addr.is_multicast or addr.is_loopback or ip == "255.255.255.255")
+
+
+def _dhcp_options(pkt) -> dict:
+    out = {}
+    for opt in pkt["DHCP"].options:
+        if isinstance(opt, tuple) and len(opt) >= 2:
+            out[opt[0]] = opt[1]
+    return out
+
+
+def parse_packet(pkt) -> tuple[str, str, str] | None:
+    """(ip, mac, kind) for an ARP/DHCP packet that identifies a host, else None."""
+    if pkt.haslayer("ARP"):
+        arp = pkt["ARP"]
+        if arp.op not in (1, 2):
+            return None
+        ip, mac = arp.psrc, str(arp.hwsrc).lower()
+        if not _usable_ip(ip) or mac in _ZERO_MACS:
+            return None
+        if arp.op == 1 and arp.psrc == arp.pdst:
+            kind = "garp"
+        else:
+            kind = "arp-request" if arp.op == 1 else "arp-reply"
+        return ip, mac, kind
+
+    if pkt.haslayer("DHCP") and pkt.haslayer("BOOTP"):
+        bootp = pkt["BOOTP"]
+        options = _dhcp_options(pkt)
+        msg_type = options.get("message-type")
+        mac = ":".join(f"{b:02x}" for b in bytes(bootp.chaddr)[:6])
+        if mac in _ZERO_MACS:
+            return None
+        if msg_type == _DHCP_ACK:
+            ip = bootp.yiaddr
+        elif msg_type == _DHCP_REQUEST:
+            ip = options.get("requested_addr") or bootp.ciaddr
+        else:
+            return None
+        if not _usable_ip(str(ip)):
+            return None
+        return str(ip), mac, "dhcp-ack" if msg_type == _DHCP_ACK else "dhcp-request"
+
+    return None
+
+
+def ingest_sink(scan_target: str):
+    """Default flush target: one ingest_scan per micro-batch, alerts as after a sweep."""
+    from Database.DB_Data import ingest_scan
+    import notifier
+
+    def sink(results: list[dict]) -> dict:
+        summary = ingest_scan(results, scan_target=scan_target)
+        events.publish("device-found", {
+            "target": scan_target,
+            "devices": [{"mac": r["MAC"], "ip": r["IP"], "vendor": r.get("VENDOR")} for r in results],
+            "ip_changed": [],
+        })
+        notifier.notify_new_unapproved(summary["new_unapproved"])
+        return summary
+
+    return sink
+
+
+class PassiveListener:
+    def __init__(
+        self,
+        iface: str | None = None,
+        sink=None,
+        flush_interval: float = PASSIVE_FLUSH_SECONDS,
+        batch_max: int = PASSIVE_BATCH_MAX,
+        seen_ttl: float = PASSIVE_SEEN_TTL_SECONDS,
+        seen_max: int = PASSIVE_SEEN_MAX,
+        bpf_filter: str = PASSIVE_BPF_FILTER,
+    ):
+        self.iface = iface
+        self.scan_target = f"passive:{iface or 'default'}"
+        self.sink = sink or ingest_sink(self.scan_target)
+        self.flush_interval = float(flush_interval)
+        self.batch_max = max(1, int(batch_max))
+        self.seen_ttl = float(seen_ttl)
+        self.seen_max = int(seen_max)
+        self.bpf_filter = bpf_filter
+
+        self._seen: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush: float | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.stats = {"packets": 0, "parsed": 0, "suppressed": 0, "flushed": 0, "batches": 0}
+
+    # --- packet path ---------------------------------------------------
+
+    def handle(self, pkt, now: float | None = None) -> None:
+        """Sniffer callback; `now` is the packet time on replay."""
+        now = time.monotonic() if now is None else now
+        parsed = parse_packet(pkt)
+        with self._lock:
+            self.stats["packets"] += 1
+            if self._last_flush is None:
+                self._last_flush = now
+            if parsed is None:
+                passive_packets.inc(outcome="ignored")
+            else:
+                ip, mac, _ = parsed
+                key = (mac, ip)
+                self.stats["parsed"] += 1
+                last = self._seen.get(key)
+                if key in self._pending or (last is not None and now - last < self.seen_ttl):
+                    self.stats["suppressed"] += 1
+                    passive_packets.inc(outcome="duplicate")
+                else:
+                    self._pending[key] = {"MAC": mac, "IP": ip}
+                    passive_packets.inc(outcome="new")
+
+            if self._pending and (
+                len(self._pending) >= self.batch_max or now - self._last_flush >= self.flush_interval
+            ):
+                # never write here: on a live capture this is the sniffer thread, and a
+                # busy DB would stall it until the socket buffer overflows
+                self._wake.set()
+
+    def _take(self, now: float) -> list[dict]:
+        # caller holds _lock
+        batch = list(self._pending.values())
+        for key in self._pending:
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+        while len(self._seen) > self.seen_max:
+            self._seen.popitem(last=False)
+        self._pending = {}
+        self._last_flush = now
+        return batch
+
+    def _write(self, batch: list[dict]) -> None:
+        from Scanner.scanner import lookup_vendor
+
+        for r in batch:
+            r["VENDOR"] = lookup_vendor(r["MAC"])
+        try:
+            with metrics.span("passive_flush"):
+                self.sink(batch)
+        except Exception as e:
+            # forget them again so the next packet from these hosts retries the write
+            with self._lock:
+                for r in batch:
+                    self._seen.pop((r["MAC"], r["IP"]), None)
+            print(f"[passive] ERROR writing {len(batch)} sighting(s): {e}")
+            return
+        with self._lock:
+            self.stats["flushed"] += len(batch)
+            self.stats["batches"] += 1
+
+    def flush(self, now: float | None = None) -> int:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            batch = self._take(now) if self._pending else []
+        if batch:
+            self._write(batch)
+        return len(batch)
+
+    # --- live / offline ------------------------------------------------
+
+    def replay(self, path: str) -> dict:
+        """Streams a pcap file through handle(); returns stats plus pps."""
+        from scapy.utils import PcapReader
+
+        t0 = time.perf_counter()
+        last = None
+        with PcapReader(path) as reader:
+            for pkt in reader:
+                last = float(pkt.time)
+                self.handle(pkt, now=last)
+                if self._wake.is_set():
+                    self._wake.clear()
+                    self.flush(now=last)
+        self.flush(now=last)
+        elapsed = time.perf_counter() - t0
+        return {**self.stats, "seconds": round(elapsed, 4), "pps": round(self.stats["packets"] / elapsed, 1) if elapsed else None}
+
+    def run(self) -> None:
+        """Sniffs until stop(); flushes on the timer even when the LAN is quiet."""
+        from scapy.sendrecv import AsyncSniffer
+
+        kwargs = {"filter": self.bpf_filter, "prn": self.handle, "store": False}
+        if self.iface:
+            kwargs["iface"] = self.iface
+        sniffer = AsyncSniffer(**kwargs)
+        sniffer.start()
+        print(f"[passive] Listening on {self.iface or 'default interface'} ({self.bpf_filter})")
+        try:
+            # every DB write happens here; handle() only wakes the loop when a batch is full
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.flush()
+        finally:
+            if sniffer.running:
+                sniffer.stop()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_logged, name="passive-listener", daemon=True)
+        self._thread.start()
+
+    def _run_logged(self) -> None:
+        try:
+            self.run()
+        except Exception as e:
+            print(f"[passive] ERROR listener stopped: {e}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-i", "--iface", dest="iface", help="interface to sniff on (default: scapy's)")
+    parser.add_option("-r", "--replay", dest="replay", metavar="FILE", help="read packets from a pcap file instead")
+    parser.add_option("--flush", dest="flush", type="float", default=PASSIVE_FLUSH_SECONDS,
+                      help="seconds between DB writes")
+    (options, _) = parser.parse_args(args=argv)
+
+    from Database.DB_Data import DB_PATH
+    from Database.migrate import migrate
+    import notifier
+
+    migrate(DB_PATH)
+    listener = PassiveListener(iface=options.iface, flush_interval=options.flush)
+    if options.replay:
+        listener.scan_target = f"passive:{os.path.basename(options.replay)}"
+        listener.sink = ingest_sink(listener.scan_target)
+        print(f"[passive] Replay: {listener.replay(options.replay)}")
+    else:
+        try:
+            listener.run()
+        except KeyboardInterrupt:
+            pass
+    notifier.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
-import scapy.all as scapy
+import os
+import time
 from optparse import OptionParser
-from mac_vendor_lookup import MacLookup
-from Database.DB_Data import add_unapproved
-from mailalarm import send_unapproved_mail
+from Scanner import oui, change_detector
+from Scanner.arp_engine import ArpSweep, PcapArpReplies, ScapyArpBackend, expand_target
+from Scanner.ndp_engine import NdpSweep, ScapyNdpBackend, is_ipv6_target
+from Database.DB_Data import DB_PATH, ingest_scan, known_addresses
+from Database.migrate import migrate
+import events
+import metrics
+import notifier
 
 
 def is_randomized_mac(mac: str) -> bool:
@@ -13,71 +19,357 @@ def is_randomized_mac(mac: str) -> bool:
     return bool(first_byte & 0b00000010)
 
 
+def lookup_vendor(mac: str) -> str:
+    if is_randomized_mac(mac):
+        return "Random"
+
+    # shared in-memory index, never hits the network on the scan path
+    return oui.lookup(mac) or "Unknown"
+
+
+# called when no backend is passed; benchmarks swap in a simulated network here
+backend_factory = ScapyArpBackend
+ndp_backend_factory = ScapyNdpBackend
+
+
 class NetworkScanner:
-    def __init__(self, target):
+    def __init__(self, target, engine: str | None = None, backend=None, **sweep_options):
         self.target = target
-        self.lookup = MacLookup()
-        try:
-            self.lookup.load_vendors()
-        except Exception:
-            self.lookup.update_vendors()
+        # "burst" = one srp() burst (old behaviour), "adaptive" = chunked, rate limited, retrying sweep,
+        # "ndp" = IPv6 neighbour discovery (the default for an IPv6 prefix)
+        if engine is None and is_ipv6_target(target):
+            engine = "ndp"
+        self.engine = (engine or os.getenv("SCAN_ENGINE", "burst")).lower()
+        self.backend = backend or (ndp_backend_factory() if self.engine == "ndp" else backend_factory())
+        self.sweep_options = sweep_options
+        # NDP: addresses seen in the prefix before, solicited directly (set by _run_scan from the DB)
+        self.known_addresses: list[str] = []
+        self.last_sweep: dict | None = None
+        self.timings: dict[str, float] = {}
+        self.started_at: float | None = None
+        self.last_pcap: dict | None = None
 
     def get_vendor(self, mac: str) -> str:
-        if is_randomized_mac(mac):
-            return "Random"
+        return lookup_vendor(mac)
+
+    def scan_arp(self):
+        self.started_at = time.time()
+        if self.engine == "adaptive":
+            return self.scan_arp_adaptive()
+        if self.engine == "ndp":
+            return self.scan_ndp()
 
+        # one broadcast burst for the whole target (srp() with the Scapy backend)
         try:
-            return self.lookup.lookup(mac)
-        except Exception:
-            return "Unknown"
+            addresses = expand_target(self.target)
+        except ValueError:
+            # not a network or range (e.g. a host name): let ARP(pdst=...) resolve it, as before
+            addresses = None
+        with metrics.span("srp"):
+            answered = self.backend.probe(addresses or [self.target], self.sweep_options.get("timeout", 1))
 
-    def scan_arp(self):
-        arp = scapy.ARP(pdst=self.target)
-        ether = scapy.Ether(dst="ff:ff:ff:ff:ff:ff")
-        answered = scapy.srp(ether / arp, timeout=1, verbose=False)[0]
-
-        results = []
-        for _, r in answered:
-            mac = r.hwsrc
-            results.append({
-                "IP": r.psrc,
-                "MAC": mac,
-                "VENDOR": self.get_vendor(mac),
-            })
+        sent = len(addresses) if addresses is not None else None
+        if sent is not None:
+            metrics.packets_sent.inc(sent)
+        metrics.packets_answered.inc(len(answered))
+        metrics.record(packets_sent=sent, packets_answered=len(answered))
+
+        with metrics.span("vendor"):
+            results = []
+            for ip, mac, _ in answered:
+                results.append({
+                    "IP": ip,
+                    "MAC": mac,
+                    "VENDOR": self.get_vendor(mac),
+                })
+        return results
+
+    def scan_arp_adaptive(self):
+        sweep = ArpSweep(backend=self.backend, **self.sweep_options)
+        with metrics.span("srp"):
+            found, report = sweep.sweep(self.target)
+        self.last_sweep = report
+
+        answered = sum(r["hits"] for r in report["rounds"])
+        metrics.packets_sent.inc(report["packets_sent"])
+        metrics.packets_answered.inc(answered)
+        metrics.record(
+            packets_sent=report["packets_sent"],
+            packets_answered=answered,
+            rounds=len(report["rounds"]),
+            coverage=report["coverage"],
+        )
+
+        for r in report["rounds"]:
+            print(
+                f"[scanner] round {r['round']}: probed {r['probed']}, hits {r['hits']}, "
+                f"new {r['new']}, coverage {r['coverage']:.1%} ({r['elapsed_s']:.2f}s)"
+            )
+
+        with metrics.span("vendor"):
+            return [
+                {"IP": ip, "MAC": mac, "VENDOR": self.get_vendor(mac)}
+                for ip, mac in found.items()
+            ]
+
+    def scan_ndp(self):
+        """
+        IPv6 hosts on the link via multicast echo and solicited-node NS; one
+        result per (address, MAC), so a dual-stack host comes back with all
+        the addresses that answered.
+        """
+        sweep = NdpSweep(backend=self.backend, **self.sweep_options)
+        with metrics.span("srp"):
+            found, report = sweep.sweep(self.target, known=self.known_addresses)
+        self.last_sweep = report
+
+        answered = sum(r["hits"] for r in report["rounds"])
+        metrics.packets_sent.inc(report["packets_sent"])
+        metrics.packets_answered.inc(answered)
+        metrics.record(
+            packets_sent=report["packets_sent"],
+            packets_answered=answered,
+            rounds=len(report["rounds"]),
+            ipv6_addresses=report["addresses"],
+        )
+        for r in report["rounds"]:
+            print(
+                f"[scanner] ndp round {r['round']}: solicited {r['probed']}, replies {r['hits']}, "
+                f"new {r['new']} ({r['elapsed_s']:.2f}s)"
+            )
+        print(f"[scanner] ndp: {report['addresses']} address(es) on {report['devices']} device(s)")
+
+        with metrics.span("vendor"):
+            vendors: dict[str, str] = {}
+            results = []
+            for ip, mac in found:
+                vendor = vendors.get(mac)
+                if vendor is None:
+                    vendor = vendors[mac] = self.get_vendor(mac)
+                results.append({"IP": ip, "MAC": mac, "VENDOR": vendor})
+        return results
+
+    def scan_pcap(self, path: str):
+        """
+        ARP replies from a capture instead of the network, streamed frame by
+        frame; the same (IP, MAC) answered many times is one result.
+        """
+        self.started_at = time.time()
+        source = PcapArpReplies(path)
+        t0 = time.perf_counter()
+        with metrics.span("pcap"):
+            pairs = dict.fromkeys((mac, ip) for ip, mac, _ in source)
+        elapsed = time.perf_counter() - t0
+        self.last_pcap = {
+            "file": path,
+            "packets": source.packets,
+            "arp_replies": source.replies,
+            "read_s": round(elapsed, 4),
+            "pps": round(source.packets / elapsed, 1) if elapsed else None,
+        }
+        metrics.packets_answered.inc(source.replies)
+        metrics.record(pcap_packets=source.packets, packets_answered=source.replies)
+
+        with metrics.span("vendor"):
+            vendors: dict[str, str] = {}
+            results = []
+            for mac, ip in pairs:
+                vendor = vendors.get(mac)
+                if vendor is None:
+                    vendor = vendors[mac] = self.get_vendor(mac)
+                results.append({"IP": ip, "MAC": mac, "VENDOR": vendor})
         return results
 
-    def display_result(self, results):
+    def display_result(self, results, limit: int | None = None):
         print("_" * 80)
         print("IP\t\t\tMAC Address\t\tVendor")
         print("-" * 80)
-        for r in results:
+        for r in results[:limit]:
             print(f"{r['IP']}\t\t{r['MAC']}\t{r['VENDOR']}")
+        if limit is not None and len(results) > limit:
+            print(f"... and {len(results) - limit} more")
         print("-" * 80)
 
     def send_to_db(self, results):
-        for r in results:
-            add_unapproved(
-                mac_address=r["MAC"],
-                ip_address=r["IP"],
-                vendor=r["VENDOR"],
-            )
-        send_unapproved_mail()
+        t0 = time.perf_counter()
+        with metrics.span("diff"):
+            delta = change_detector.diff(self.target, results)
+
+        # unchanged devices are only upserted on the periodic full refresh; in between
+        # they just get last_seen and a sighting, and still count in the Scans row
+        with metrics.span("db"):
+            if delta["full_refresh"]:
+                summary = ingest_scan(results, scan_target=self.target, started_at=self.started_at)
+            else:
+                summary = ingest_scan(
+                    delta["changed_results"],
+                    scan_target=self.target,
+                    started_at=self.started_at,
+                    unchanged=delta["unchanged"],
+                )
+
+            change_detector.commit(self.target, delta)
+        if delta["changed_results"]:
+            # one event per write, not per device, so a first full sweep can't flood the client buffers
+            events.publish("device-found", {
+                "target": self.target,
+                "devices": [
+                    {"mac": r["MAC"], "ip": r["IP"], "vendor": r.get("VENDOR")} for r in delta["changed_results"]
+                ],
+                "ip_changed": delta["ip_changed"],
+            })
+        summary["changes"] = {
+            "appeared": len(delta["appeared"]),
+            "disappeared": len(delta["disappeared"]),
+            "ip_changed": len(delta["ip_changed"]),
+            "full_refresh": delta["full_refresh"],
+        }
+        self.timings["db_s"] = round(time.perf_counter() - t0, 4)
+        print(
+            f"[scanner] Wrote {summary['seen']} of {len(results)} devices "
+            f"({'full refresh' if delta['full_refresh'] else 'delta'}: "
+            f"+{len(delta['appeared'])} -{len(delta['disappeared'])} ~{len(delta['ip_changed'])}; "
+            f"{len(summary['new_unapproved'])} new unapproved)"
+        )
+        # only the delta is queued; mail goes out from the notifier thread
+        t0 = time.perf_counter()
+        with metrics.span("notify"):
+            notifier.notify_new_unapproved(summary["new_unapproved"])
+        self.timings["notify_s"] = round(time.perf_counter() - t0, 4)
+        return summary
+
+def run_scan(
+    target: str,
+    engine: str | None = None,
+    progress=None,
+    profile: bool = False,
+    pcap: str | None = None,
+    **sweep_options,
+) -> dict:
+    """
+    Sweep, store and alert for one target. `progress(stage, fraction, **info)`
+    is called between the steps (used by Scanner/jobs.py). The stage timings
+    and counts are written to metrics.SCAN_METRICS_FILE; profile=True also
+    runs the scan under cProfile. With `pcap` the ARP replies are read from
+    that capture instead of the network and the summary gets a "pcap" entry
+    with packets/s and devices/s.
+    """
+    engine_name = "pcap" if pcap else engine or ("ndp" if is_ipv6_target(target) else os.getenv("SCAN_ENGINE", "burst"))
+    with metrics.trace(target, engine=engine_name):
+        if profile:
+            with metrics.profiled(f"scan-{target}"):
+                return _run_scan(target, engine, progress, pcap, **sweep_options)
+        return _run_scan(target, engine, progress, pcap, **sweep_options)
 
-def run_scan(target: str) -> None:
-    scanner = NetworkScanner(target)
-    res = scanner.scan_arp()
-    scanner.display_result(res)
-    scanner.send_to_db(res)
+
+def _run_scan(target: str, engine: str | None, progress, pcap: str | None = None, **sweep_options) -> dict:
+    report = progress or (lambda stage, fraction, **info: None)
+    scanner = NetworkScanner(target, engine=engine, **sweep_options)
+    if scanner.engine == "ndp" and not pcap:
+        scanner.known_addresses = known_addresses(target)
+
+    report("sweep", 0.05)
+    t_start = t0 = time.perf_counter()
+    res = scanner.scan_pcap(pcap) if pcap else scanner.scan_arp()
+    scanner.timings["sweep_s"] = round(time.perf_counter() - t0, 4)
+    scanner.display_result(res, limit=50 if pcap else None)
+
+    report("store", 0.7, found=len(res))
+    summary = scanner.send_to_db(res)
+
+    metrics.devices_found.observe(len(res))
+    metrics.record(
+        found=len(res),
+        written=summary["seen"],
+        new_unapproved=len(summary["new_unapproved"]),
+        scan_id=summary["scan_id"],
+        changes=summary["changes"],
+    )
+    summary_pcap = None
+    if scanner.last_pcap is not None:
+        total = time.perf_counter() - t_start
+        # dps over the whole pipeline: read, classify, diff, store
+        summary_pcap = {**scanner.last_pcap, "total_s": round(total, 4), "dps": round(len(res) / total, 1) if total else None}
+        print(
+            f"[scanner] pcap: {summary_pcap['packets']} packets ({summary_pcap['pps']} pps), "
+            f"{len(res)} devices ({summary_pcap['dps']} dps)"
+        )
+    return {
+        "target": target,
+        "found": len(res),
+        "approved": summary["approved"],
+        "unapproved": summary["unapproved"],
+        "new_unapproved": len(summary["new_unapproved"]),
+        "written": summary["seen"],
+        "changes": summary["changes"],
+        "timings": dict(scanner.timings),
+        "pcap": summary_pcap,
+    }
 
 def main(argv=None):
     parser = OptionParser()
     parser.add_option("-t", "--target", dest="target")
+    parser.add_option("-e", "--engine", dest="engine",
+                      help="burst (default), adaptive or ndp (default for an IPv6 prefix)")
+    parser.add_option("--rate", dest="rate", type="float", help="adaptive: packets per second")
+    parser.add_option("--rounds", dest="rounds", type="int", help="adaptive: max probe rounds")
+    parser.add_option("--chunk", dest="chunk_size", type="int", help="adaptive: addresses per chunk")
+    parser.add_option("--timeout", dest="timeout", type="float", help="adaptive: first round timeout (s)")
+    parser.add_option("--profile", dest="profile", action="store_true", default=False,
+                      help="run the scan under cProfile (stats in SCAN_PROFILE_DIR)")
+    parser.add_option("--push", dest="push", metavar="URL",
+                      help="agent mode: upload results to a central /dataIngression instead of the local DB")
+    parser.add_option("--agent-id", dest="agent_id", help="agent mode: id reported to the server (default hostname)")
+    parser.add_option("--interval", dest="interval", type="float",
+                      help="agent mode: rescan every N seconds instead of once")
+    parser.add_option("--spool", dest="spool", help="agent mode: spool directory (default AGENT_SPOOL_DIR)")
+    parser.add_option("--pcap", dest="pcap", metavar="FILE",
+                      help="read ARP replies from a capture instead of the network (target defaults to pcap:FILE)")
     (options, _) = parser.parse_args(args=argv)
 
+    if options.pcap:
+        if options.push:
+            parser.error("--pcap can't be combined with --push")
+        if not os.path.isfile(options.pcap):
+            parser.error(f"{options.pcap} not found")
+        options.target = options.target or f"pcap:{os.path.basename(options.pcap)}"
     if not options.target:
         parser.error("Specify target IP range")
 
-    run_scan(options.target)
+    sweep_options = {
+        k: v
+        for k, v in (
+            ("rate", options.rate),
+            ("rounds", options.rounds),
+            ("chunk_size", options.chunk_size),
+            ("timeout", options.timeout),
+        )
+        if v is not None
+    }
+
+    if options.push:
+        from Scanner.agent import Agent, Spool
+
+        agent = Agent(
+            options.push,
+            agent_id=options.agent_id,
+            spool=Spool(options.spool) if options.spool else None,
+        )
+        # several targets (VLANs on one Pi) as a comma separated list
+        targets = [t.strip() for t in options.target.split(",") if t.strip()]
+        try:
+            agent.run(targets, interval=options.interval, engine=options.engine, **sweep_options)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if options.agent_id or options.interval or options.spool:
+        parser.error("--agent-id, --interval and --spool need --push")
+
+    migrate(DB_PATH)
+    run_scan(options.target, engine=options.engine, profile=options.profile, pcap=options.pcap, **sweep_options)
+    # CLI run: don't exit before the alert for this scan has been tried
+    notifier.flush()
 
 
 if __name__ == "__main__":
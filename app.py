@@ -1,7 +1,10 @@
+import atexit
 import os
+import signal
+import sys
 from datetime import timedelta
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_apscheduler import APScheduler
@@ -11,6 +14,15 @@ from Endpoints.DB_endpoints import DB_bp
 from Endpoints.scanner_Endpoints import Scanner_bp
 
 from Database.Worker.worker import scan_worker_tick
+from Database.Worker.scheduler import scan_scheduler
+from Database.Worker.leader import Leadership
+from Database import DB_Data
+from Database.migrate import migrate
+from Scanner import oui
+from Scanner.passive import PassiveListener
+import ingestion
+import metrics
+import notifier
 
 app = Flask(__name__)
 
@@ -44,28 +56,118 @@ CORS(
 
 
 scheduler = APScheduler()
+app.config["SCHEDULER_API_ENABLED"] = False
+scheduler.init_app(app)
 
-@app.before_request
-def start_scheduler():
-    app.config["SCHEDULER_API_ENABLED"] = False
 
-    # Hvis den allerede kører, så gør ingenting
-    if scheduler.running:
-        return
+# PASSIVE_IFACE=eth0 lytter efter ARP/DHCP mellem scanningerne (kræver root ligesom srp)
+passive_listener = PassiveListener(iface=os.getenv("PASSIVE_IFACE")) if os.getenv("PASSIVE_IFACE") else None
+
 
-    scheduler.init_app(app)
+def _start_leader_jobs():
+    # kun i den proces der har leader-låsen, så scans ikke kører dobbelt
+    if os.getenv("SCAN_SCHEDULER", "timer") == "poll":
+        scheduler.add_job(
+            id="scan_worker",
+            func=scan_worker_tick,
+            trigger="interval",
+            seconds=15,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+    else:
+        # sleeps until the next next_scan_at, woken early by schedule changes
+        scan_scheduler.start()
 
+    if passive_listener is not None:
+        passive_listener.start()
+
+    # folds raw sightings older than HISTORY_RAW_DAYS into presence intervals
     scheduler.add_job(
-        id="scan_worker",
-        func=scan_worker_tick,
-        trigger="interval",
-        seconds=15,
+        id="compact_sightings",
+        func=DB_Data.compact_sightings,
+        trigger="cron",
+        hour=3,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+    # idempotency keys from /dataIngression older than INGEST_KEY_TTL_SECONDS
+    scheduler.add_job(
+        id="prune_ingest_keys",
+        func=ingestion.prune_keys,
+        trigger="cron",
+        hour=3,
+        minute=30,
         replace_existing=True,
         max_instances=1,
         coalesce=True,
     )
 
+
+def _stop_leader_jobs():
+    scan_scheduler.stop()
+    if passive_listener is not None:
+        passive_listener.stop()
+
+
+leadership = Leadership(on_elected=_start_leader_jobs, on_resigned=_stop_leader_jobs)
+
+
+def start_background_jobs():
+    # Warm the shared vendor index at process start instead of on the first scan
+    oui.refresh_in_background()
+    # Sends whatever is left in the alert outbox from before a restart
+    notifier.start()
+    # remote sensor batches are written from here, not from the request threads
+    ingestion.start()
+
+    # picks up a new vendor file (scripts/update_vendors.py) without a restart
+    scheduler.add_job(
+        id="oui_refresh",
+        func=oui.refresh_if_changed,
+        trigger="interval",
+        hours=1,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
     scheduler.start()
+    leadership.start()
+
+
+def stop_background_jobs():
+    leadership.stop()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    # accepted sensor batches are written before the connections close
+    ingestion.stop()
+    # pending alerts go to the outbox instead of being lost
+    notifier.flush(timeout=5.0)
+    notifier.stop()
+    DB_Data.close_connections()
+
+
+_started_pid: int | None = None
+
+
+def init():
+    """
+    Migrates the DB and starts the background jobs in this process, once.
+    Importing app does neither (tests, benchmarks, a WSGI master with
+    --preload); `python app.py` calls this, a WSGI server calls it in every
+    worker after the fork (gunicorn.conf.py does that for gunicorn).
+    """
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    _started_pid = os.getpid()
+    # Upgrade the DB schema in place before anything touches it. Not only in the
+    # leader: followers serve requests too, and migrate() has its own file lock
+    migrate(DB_Data.DB_PATH)
+    start_background_jobs()
+    atexit.register(stop_background_jobs)
 
 
 
@@ -73,38 +175,84 @@ def start_scheduler():
 def home():
     return "Api Køre"
 
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Prometheus scrape; tallene er per proces
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
 app.register_blueprint(user_bp, url_prefix="/api/v1/")
 app.register_blueprint(DB_bp, url_prefix="/api/v1/")
 app.register_blueprint(Scanner_bp, url_prefix="/api/v1/")
 
+def _ingest_disabled():
+    # uden INGEST_TOKEN (eller INGEST_ALLOW_ANONYMOUS=1) tager vi ikke imod data fra hvem som helst
+    return jsonify({"ok": False, "error": "Ingestion disabled: set INGEST_TOKEN (or INGEST_ALLOW_ANONYMOUS=1)"}), 503
+
+
 @app.post("/dataIngression")
 def data_ingression():
-    data = request.get_json()
+    # Pi-sensorer: JSON, JSON-array eller NDJSON, evt. gzip; skrives af ingest-tråden
+    if not ingestion.enabled():
+        return _ingest_disabled()
+    if not ingestion.authorized(request.headers.get("Authorization")):
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    if (request.content_length or 0) > ingestion.INGEST_MAX_BYTES:
+        return jsonify({"ok": False, "error": "Body too large"}), 413
 
-    if not data:
-        return jsonify({"ok": False, "error": "Missing/invalid JSON"}), 400
+    try:
+        agent = ingestion.agent_from_headers(request.headers, request.remote_addr)
+        raw = request.get_data(cache=False)
+        batches = ingestion.parse_request(
+            raw,
+            content_encoding=request.headers.get("Content-Encoding", ""),
+            content_type=request.mimetype,
+        )
+        results = ingestion.submit(
+            batches,
+            idempotency_key=request.headers.get("Idempotency-Key"),
+            agent=agent,
+            nbytes=len(raw),
+        )
+    except ingestion.IngestError as e:
+        response = jsonify({"ok": False, "error": str(e)})
+        if e.status == 503:
+            response.headers["Retry-After"] = "5"
+        return response, e.status
 
-    scanned_at = data.get("scanned_at")
-    target = data.get("target")
-    devices = data.get("devices")
+    accepted = [b for b, r in zip(batches, results) if r["status"] == "accepted"]
+    return jsonify({
+        "ok": True,
+        "accepted": len(accepted),
+        "duplicates": len(results) - len(accepted),
+        "received_devices": sum(len(b["devices"]) for b in accepted),
+        "batches": results,
+    }), 202
 
-    if not scanned_at or not target or not isinstance(devices, list):
-        return jsonify(
-            {"ok": False, "error": "Expected scanned_at, target, devices(list)"}
-        ), 400
 
-    for d in devices:
-        if "IP" not in d or "MAC" not in d:
-            return jsonify(
-                {"ok": False, "error": "Each device must have IP and MAC"}
-            ), 400
-
-    print(
-        f"Received scan: target={target}, devices={len(devices)}, scanned_at={scanned_at}"
-    )
+@app.post("/dataIngression/heartbeat")
+def data_ingression_heartbeat():
+    # agenter melder sig mellem uploads, så vi kan se om de lever
+    if not ingestion.enabled():
+        return _ingest_disabled()
+    if not ingestion.authorized(request.headers.get("Authorization")):
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    try:
+        agent = ingestion.agent_from_headers(request.headers, request.remote_addr)
+    except ingestion.IngestError as e:
+        return jsonify({"ok": False, "error": str(e)}), e.status
+    if agent is None:
+        return jsonify({"ok": False, "error": "X-Agent-Id is required"}), 400
 
-    return jsonify({"ok": True, "received_devices": len(devices)}), 200
+    spooled = (request.get_json(silent=True) or {}).get("spooled")
+    if isinstance(spooled, int) and not isinstance(spooled, bool):
+        agent["spooled"] = spooled
+    ingestion.heartbeat(agent)
+    return jsonify({"ok": True}), 202
 
 
 if __name__ == "__main__":
+    # SIGTERM (systemd stop) skal også gå igennem atexit-oprydningen
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    init()
     app.run(host="0.0.0.0", port=5000)
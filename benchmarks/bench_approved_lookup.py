@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Cost of the "is this device approved?" check in add_unapproved with a large
+number of approved devices (default 10k rows).
+
+Run from the repo root:
+    python -m benchmarks.bench_approved_lookup
+"""
+from __future__ import annotations
+
+import sqlite3
+from optparse import OptionParser
+
+from Database import DB_Data
+from benchmarks.common import fake_results, temp_database, timed
+
+
+def _legacy_is_approved(mac: str, ip: str) -> bool:
+    # the old full-table scan, kept here only as the baseline
+    return any(
+        (str(r.get("mac_address", "")).strip().lower() == mac)
+        and (str(r.get("ip_address", "")).strip() == ip)
+        for r in DB_Data.get_approved()
+    )
+
+
+def _seed_approved(db_path, results: list[dict]) -> None:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.executemany(
+            """
+            INSERT INTO Devices (mac_address, state, ip_address, vendor, first_seen, last_seen)
+            VALUES (?, 'approved', ?, ?, '2024-01-01 00:00:00', '2024-01-01 00:00:00')
+            """,
+            [(r["MAC"], r["IP"], r["VENDOR"]) for r in results],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-n", "--approved", dest="approved", type="int", default=10_000)
+    parser.add_option("-c", "--calls", dest="calls", type="int", default=200)
+    (options, _) = parser.parse_args(args=argv)
+
+    approved = fake_results(options.approved)
+    # half the probes hit approved rows, half are unknown devices
+    probes = approved[: options.calls // 2] + fake_results(options.calls - options.calls // 2, offset=options.approved)
+
+    with temp_database() as db_path:
+        _seed_approved(db_path, approved)
+
+        legacy_s = timed(lambda: [_legacy_is_approved(r["MAC"], r["IP"]) for r in probes])
+        upsert_s = timed(
+            lambda: [
+                DB_Data.add_unapproved(mac_address=r["MAC"], ip_address=r["IP"], vendor=r["VENDOR"])
+                for r in probes
+            ]
+        )
+
+    print(f"approved rows: {options.approved}, calls: {len(probes)}")
+    print(f"legacy lookup only : {legacy_s / len(probes) * 1e3:8.3f} ms/call")
+    print(f"add_unapproved     : {upsert_s / len(probes) * 1e3:8.3f} ms/call (lookup + write)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Adaptive ARP sweep against a simulated subnet: coverage, rounds and time
+for different loss rates. No network access needed.
+
+Run from the repo root:
+    python -m benchmarks.bench_arp_sweep
+"""
+from __future__ import annotations
+
+import random
+from optparse import OptionParser
+
+from Scanner.arp_engine import ArpSweep, SimulatedArpBackend, expand_target
+from benchmarks.common import fake_mac
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-t", "--target", dest="target", default="10.20.0.0/22")
+    parser.add_option("-n", "--hosts", dest="hosts", type="int", default=600)
+    parser.add_option("-l", "--loss", dest="loss", default="0,0.1,0.3")
+    parser.add_option("--latency", dest="latency", type="float", default=0.002)
+    parser.add_option("--rounds", dest="rounds", type="int", default=4)
+    parser.add_option("--rate", dest="rate", type="float", default=0)
+    (options, _) = parser.parse_args(args=argv)
+
+    addresses = expand_target(options.target)
+    live = random.Random(0).sample(addresses, min(options.hosts, len(addresses)))
+    hosts = {ip: fake_mac(i) for i, ip in enumerate(live)}
+
+    print(f"{'loss':>5} {'found':>6} {'coverage':>9} {'rounds':>7} {'packets':>8} {'time s':>7}")
+    for loss in (float(x) for x in options.loss.split(",")):
+        backend = SimulatedArpBackend(hosts, loss=loss, latency=options.latency, jitter=options.latency, seed=1)
+        sweep = ArpSweep(backend=backend, rate=options.rate, rounds=options.rounds, timeout=0.2)
+        found, report = sweep.sweep(options.target)
+        print(
+            f"{loss:>5.2f} {len(found):>6} {len(found) / len(hosts):>9.1%} {len(report['rounds']):>7} "
+            f"{report['packets_sent']:>8} {report['elapsed_s']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
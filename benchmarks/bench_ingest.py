@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Ingest time vs. device count: per-device add_unapproved() vs. ingest_scan().
+
+Run from the repo root:
+    python -m benchmarks.bench_ingest
+"""
+from __future__ import annotations
+
+from optparse import OptionParser
+
+from Database import DB_Data
+from benchmarks.common import fake_results, temp_database, timed
+
+
+def _per_device(results: list[dict]) -> None:
+    for r in results:
+        DB_Data.add_unapproved(mac_address=r["MAC"], ip_address=r["IP"], vendor=r["VENDOR"])
+
+
+def _bulk(results: list[dict]) -> None:
+    DB_Data.ingest_scan(results)
+
+
+def run(sizes: list[int], approved_ratio: float) -> list[dict]:
+    rows = []
+    for n in sizes:
+        results = fake_results(n)
+        n_approved = int(n * approved_ratio)
+        row = {"devices": n, "approved": n_approved}
+
+        for name, fn in (("per_device", _per_device), ("ingest_scan", _bulk)):
+            with temp_database():
+                for r in results[:n_approved]:
+                    DB_Data.add_approved(mac_address=r["MAC"], ip_address=r["IP"], vendor=r["VENDOR"])
+                # first scan inserts, second scan is the steady state (all upserts)
+                row[f"{name}_first_s"] = timed(fn, results)
+                row[f"{name}_repeat_s"] = timed(fn, results)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-s", "--sizes", dest="sizes", default="10,100,600,2000")
+    parser.add_option("-a", "--approved-ratio", dest="approved_ratio", type="float", default=0.5)
+    (options, _) = parser.parse_args(args=argv)
+
+    sizes = [int(x) for x in options.sizes.split(",") if x.strip()]
+    rows = run(sizes, options.approved_ratio)
+
+    print(f"{'devices':>8} {'per-device 1st':>15} {'per-device rep':>15} {'ingest 1st':>12} {'ingest rep':>12} {'speedup':>8}")
+    for r in rows:
+        speedup = r["per_device_repeat_s"] / r["ingest_scan_repeat_s"] if r["ingest_scan_repeat_s"] else 0
+        print(
+            f"{r['devices']:>8} {r['per_device_first_s']:>15.4f} {r['per_device_repeat_s']:>15.4f} "
+            f"{r['ingest_scan_first_s']:>12.4f} {r['ingest_scan_repeat_s']:>12.4f} {speedup:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
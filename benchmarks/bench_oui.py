@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Vendor resolution cost per device with the shared OUI index.
+
+Builds a synthetic vendor file (MA-L plus some MA-M/MA-S blocks) unless
+--file points at a real one.
+
+Run from the repo root:
+    python -m benchmarks.bench_oui
+"""
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+from optparse import OptionParser
+from pathlib import Path
+
+from Scanner import oui
+from Scanner.scanner import NetworkScanner
+
+
+def _write_vendor_file(path: Path, n_oui: int) -> list[int]:
+    rnd = random.Random(1)
+    prefixes = rnd.sample(range(0x000000, 0xFFFFFF), n_oui)
+    lines = [f"{p:06X}:Vendor {p:06X}" for p in prefixes]
+    # split a few prefixes into MA-M / MA-S blocks like the IEEE registry does
+    for p in prefixes[:50]:
+        lines.append(f"{p:06X}{rnd.randrange(16):X}:MA-M block of {p:06X}")
+        lines.append(f"{p:06X}{rnd.randrange(4096):03X}:MA-S block of {p:06X}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return prefixes
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-f", "--file", dest="file")
+    parser.add_option("-n", "--hosts", dest="hosts", type="int", default=1000)
+    (options, _) = parser.parse_args(args=argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if options.file:
+            files = [options.file]
+            prefixes = []
+        else:
+            vendor_file = Path(tmp) / "mac-vendors.txt"
+            prefixes = _write_vendor_file(vendor_file, 35_000)
+            files = [str(vendor_file)]
+
+        t0 = time.perf_counter()
+        oui.load(files)
+        load_s = time.perf_counter() - t0
+        prefixes = prefixes or list(oui._index.by24) or [0x00163E]
+
+        rnd = random.Random(2)
+        macs = []
+        for _ in range(options.hosts):
+            n = (rnd.choice(prefixes) << 24) | rnd.randrange(1 << 24)
+            n &= ~(0x02 << 40)  # keep it globally administered
+            macs.append(":".join(f"{(n >> s) & 0xFF:02x}" for s in range(40, -8, -8)))
+
+        scanner = NetworkScanner("0.0.0.0/32")
+        t0 = time.perf_counter()
+        for mac in macs:
+            scanner.get_vendor(mac)
+        lookup_s = time.perf_counter() - t0
+
+    print(f"index load : {load_s * 1e3:.1f} ms ({oui.size()} prefixes)")
+    print(f"lookups    : {options.hosts} in {lookup_s * 1e3:.2f} ms -> {lookup_s / options.hosts * 1e6:.2f} us/device")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/common.py
+from __future__ import annotations
+
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from Database import DB_Data
+from Database.DB_Connections import DB_Connections
+from Database.migrate import migrate
+from Scanner import change_detector
+
+
+@contextmanager
+def temp_database():
+    """Fresh DB from the migrations, with DB_Data pointed at it for the duration."""
+    old_db = DB_Data._db
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.sqlite"
+        migrate(db_path, backup=False)
+
+        DB_Data._db = DB_Connections(str(db_path))
+        change_detector.clear_cache()
+        try:
+            yield db_path
+        finally:
+            DB_Data._db.close_all()
+            DB_Data._db = old_db
+            change_detector.clear_cache()
+
+
+def fake_mac(i: int, prefix: int = 0x00163E) -> str:
+    # globally administered MACs so vendor lookup would treat them as real
+    n = (prefix << 24) | (i & 0xFFFFFF)
+    return ":".join(f"{(n >> s) & 0xFF:02x}" for s in range(40, -8, -8))
+
+
+def fake_ip(i: int, base: str = "10.0.0.0") -> str:
+    a, b, c, d = (int(x) for x in base.split("."))
+    n = ((a << 24) | (b << 16) | (c << 8) | d) + i + 1
+    return ".".join(str((n >> s) & 0xFF) for s in (24, 16, 8, 0))
+
+
+def fake_results(n: int, offset: int = 0) -> list[dict]:
+    return [
+        {"IP": fake_ip(offset + i), "MAC": fake_mac(offset + i), "VENDOR": "Bench Vendor"}
+        for i in range(n)
+    ]
+
+
+def timed(fn, *args, **kwargs) -> float:
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+def measure(fn, *args, repeat: int = 5, warmup: int = 1, **kwargs) -> dict:
+    """min/median/p95 wall time of fn(*args, **kwargs) over `repeat` runs."""
+    for _ in range(warmup):
+        fn(*args, **kwargs)
+    runs = sorted(timed(fn, *args, **kwargs) for _ in range(max(1, repeat)))
+    return {
+        "runs": len(runs),
+        "min_s": round(runs[0], 6),
+        "median_s": round(statistics.median(runs), 6),
+        "p95_s": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 6),
+    }
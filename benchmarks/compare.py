@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmarks.suite result files and flag regressions.
+
+Every numeric *_s field (median_s for the repeated measurements) present in
+both files is compared; exits 1 if anything got slower than --threshold.
+
+Run from the repo root:
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+from __future__ import annotations
+
+import json
+import sys
+from optparse import OptionParser
+
+# noise floor: one-shot timings under a few ms swing too much to call a regression
+MIN_SECONDS = 0.005
+
+
+def _timings(path: str) -> dict[tuple[str, str, str], float]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    out = {}
+    for section, rows in report.get("results", {}).items():
+        for row in rows:
+            for key, value in row.items():
+                if not key.endswith("_s") or not isinstance(value, (int, float)):
+                    continue
+                # repeated measurements: median only; min/p95 would triple the noise
+                if key in ("min_s", "p95_s"):
+                    continue
+                out[(section, row["name"], key)] = float(value)
+    return out
+
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog OLD.json NEW.json")
+    parser.add_option("-t", "--threshold", dest="threshold", type="float", default=1.25,
+                      help="new/old ratio that counts as a regression (default 1.25)")
+    (options, args) = parser.parse_args(args=argv)
+    if len(args) != 2:
+        parser.error("Specify OLD.json and NEW.json")
+
+    old, new = _timings(args[0]), _timings(args[1])
+    shared = sorted(set(old) & set(new))
+    if not shared:
+        print("No common measurements.")
+        return 0
+
+    regressions = 0
+    print(f"{'section':<10} {'benchmark':<40} {'metric':<18} {'old':>10} {'new':>10} {'ratio':>7}")
+    for key in shared:
+        a, b = old[key], new[key]
+        ratio = b / a if a else float("inf") if b else 1.0
+        flag = ""
+        if ratio > options.threshold and max(a, b) >= MIN_SECONDS:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 / options.threshold and max(a, b) >= MIN_SECONDS:
+            flag = "  faster"
+        section, name, metric = key
+        print(f"{section:<10} {name:<40} {metric:<18} {a:>10.5f} {b:>10.5f} {ratio:>6.2f}x{flag}")
+
+    only = len(set(old) ^ set(new))
+    if only:
+        print(f"({only} measurement(s) only in one of the files)")
+    print(f"{regressions} regression(s) over {options.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
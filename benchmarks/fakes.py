@@ -0,0 +1,172 @@
+# benchmarks/fakes.py
+"""
+Offline stand-ins for the two things a scan talks to: the L2 network and
+Mailgun.
+
+FakeL2Network answers ARP for a set of synthetic hosts (with latency and
+loss) through the same probe() interface as ScapyArpBackend, and can be
+installed as Scanner.scanner.backend_factory so every scan in the process
+(run_scan, jobs, the worker) uses it.
+
+write_arp_pcap() writes large synthetic captures of ARP replies (plus
+noise) for the --pcap input mode.
+
+MailgunStub is a local HTTP server that accepts the form POSTs
+mailalarm.send_mail() makes and records them; it can also answer with a
+status code or add latency to exercise the notifier's retries.
+"""
+from __future__ import annotations
+
+import ipaddress
+import os
+import random
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from Scanner.arp_engine import SimulatedArpBackend, expand_target
+from benchmarks.common import fake_ip, fake_mac
+
+
+def synthetic_hosts(target: str, count: int, seed: int = 0) -> dict[str, str]:
+    """`count` random live addresses inside `target` -> stable fake MACs."""
+    addresses = expand_target(target)
+    live = random.Random(seed).sample(addresses, min(count, len(addresses)))
+    return {ip: fake_mac(int(ipaddress.ip_address(ip))) for ip in live}
+
+
+class FakeL2Network(SimulatedArpBackend):
+    """SimulatedArpBackend that can cover several targets and be installed process wide."""
+
+    def add_target(self, target: str, count: int, seed: int = 0) -> dict[str, str]:
+        hosts = synthetic_hosts(target, count, seed)
+        with self._lock:
+            self.hosts.update(hosts)
+        return hosts
+
+    @contextmanager
+    def installed(self):
+        from Scanner import scanner
+
+        previous = scanner.backend_factory
+        scanner.backend_factory = lambda: self
+        try:
+            yield self
+        finally:
+            scanner.backend_factory = previous
+
+
+def _mac_bytes(mac: str) -> bytes:
+    return bytes(int(x, 16) for x in mac.split(":"))
+
+
+def _arp_reply_frame(ip: str, mac: str, vlan: int | None) -> bytes:
+    src = _mac_bytes(mac)
+    tag = struct.pack("!HH", 0x8100, vlan) if vlan is not None else b""
+    arp = struct.pack("!HHBBH", 1, 0x0800, 6, 4, 2) + src + bytes(int(x) for x in ip.split(".")) \
+        + b"\x02\x00\x00\x00\x00\x01" + bytes([10, 0, 0, 254])
+    return b"\x02\x00\x00\x00\x00\x01" + src + tag + b"\x08\x06" + arp
+
+
+def write_arp_pcap(path: str, frames: int, devices: int, noise: float = 0.2, vlan_ratio: float = 0.1, seed: int = 0) -> dict:
+    """
+    Classic pcap of `frames` Ethernet frames: ARP replies from `devices`
+    hosts (each answering many times), a share of them 802.1Q tagged, and
+    `noise` of the frames IPv4/UDP that the reader has to skip. Written with
+    struct directly, since building 100k+ scapy packets takes minutes.
+    """
+    rnd = random.Random(seed)
+    hosts = [(fake_ip(i, base="10.80.0.0"), fake_mac(i, prefix=0x00163F)) for i in range(devices)]
+    noise_frame = b"\xff" * 6 + b"\x02\x00\x00\x00\x00\x02" + b"\x08\x00" + b"\x45" + b"\x00" * 41
+    t = 1_700_000_000
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for n in range(frames):
+            if rnd.random() < noise:
+                frame = noise_frame
+            else:
+                ip, mac = hosts[n % devices] if n < devices else rnd.choice(hosts)
+                frame = _arp_reply_frame(ip, mac, 10 if rnd.random() < vlan_ratio else None)
+            f.write(struct.pack("<IIII", t + n // 1000, (n % 1000) * 1000, len(frame), len(frame)))
+            f.write(frame)
+    return {"frames": frames, "devices": devices, "bytes": os.path.getsize(path)}
+
+
+class _MailgunHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+
+        if stub.latency:
+            time.sleep(stub.latency)
+        with stub.lock:
+            stub.requests.append(form)
+            status = stub.fail_next.pop(0) if stub.fail_next else 200
+
+        body = b'{"id": "<stub>", "message": "Queued. Thank you."}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MailgunStub:
+    """
+    with MailgunStub() as stub:  # mailalarm now posts to stub.url
+        ...
+    stub.requests -> list of the posted forms (subject, text, ...)
+    """
+
+    def __init__(self, latency: float = 0.0, fail_next: list[int] | None = None):
+        self.latency = latency
+        self.fail_next = list(fail_next or [])
+        self.requests: list[dict] = []
+        self.lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._previous: tuple | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v3/stub/messages"
+
+    def wait_for(self, count: int, timeout: float = 10.0) -> bool:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if len(self.requests) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def __enter__(self) -> "MailgunStub":
+        import mailalarm
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _MailgunHandler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="mailgun-stub", daemon=True).start()
+
+        self._previous = (mailalarm.MAILGUN_URL, os.environ.get("MAILGUN_KEY"))
+        mailalarm.MAILGUN_URL = self.url
+        os.environ["MAILGUN_KEY"] = "stub-key"
+        return self
+
+    def __exit__(self, *exc) -> None:
+        import mailalarm
+
+        url, key = self._previous
+        mailalarm.MAILGUN_URL = url
+        if key is None:
+            os.environ.pop("MAILGUN_KEY", None)
+        else:
+            os.environ["MAILGUN_KEY"] = key
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Synthetic DB fixtures for the benchmarks: 10k - 1M device rows with
+realistic spread (approved/unapproved split, vendors, last_seen over the
+last 30 days), plus optional observation history and planned scans.
+
+Rows go in with plain sqlite3 and executemany, bypassing DB_Data, so a 1M
+row fixture takes seconds rather than minutes.
+
+Run from the repo root to keep a fixture around:
+    python -m benchmarks.fixtures --devices 1000000 --out /tmp/fixture-1m.sqlite
+"""
+from __future__ import annotations
+
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from optparse import OptionParser
+from pathlib import Path
+
+from Database.migrate import migrate
+from benchmarks.common import fake_ip, fake_mac, temp_database
+
+VENDORS = ["Apple, Inc.", "Samsung Electronics", "Raspberry Pi Trading", "Intel Corporate", "Ubiquiti", "Unknown", "Random"]
+
+_BATCH = 50_000
+
+
+def _device_rows(start: int, stop: int, state: str, rnd: random.Random, now: datetime):
+    for i in range(start, stop):
+        last = now - timedelta(seconds=rnd.randrange(30 * 86400))
+        first = last - timedelta(seconds=rnd.randrange(90 * 86400))
+        yield (
+            i + 1,
+            fake_mac(i),
+            state,
+            fake_ip(i),
+            None,
+            VENDORS[i % len(VENDORS)],
+            first.strftime("%Y-%m-%d %H:%M:%S"),
+            last.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+
+def _insert_devices(conn, state: str, start: int, stop: int, rnd: random.Random, now: datetime) -> None:
+    # device i gets id i + 1, so the history rows below can refer to it directly
+    for lo in range(start, stop, _BATCH):
+        conn.executemany(
+            """
+            INSERT INTO Devices (id, mac_address, state, ip_address, description, vendor, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _device_rows(lo, min(stop, lo + _BATCH), state, rnd, now),
+        )
+
+
+def _insert_history(conn, devices: int, scans: int, now: datetime) -> None:
+    # every scan sees every device, one scan per 15 minutes back from now
+    epoch_now = int(now.timestamp())
+    for n in range(scans):
+        seen = epoch_now - (scans - n) * 900
+        scan_id = conn.execute(
+            "INSERT INTO Scans (scan_target, started_at, finished_at, device_count) VALUES (?, ?, ?, ?)",
+            ("10.0.0.0/8", seen - 5, seen, devices),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO Sightings (device_id, seen_at, ip_address, scan_id) VALUES (?, ?, ?, ?)",
+            ((i + 1, seen, fake_ip(i), scan_id) for i in range(devices)),
+        )
+
+
+def _insert_plans(conn, plans: int, now: datetime) -> None:
+    conn.executemany(
+        "INSERT INTO PlannedScans (interval, next_scan_at, scan_target) VALUES (?, ?, ?)",
+        (
+            (
+                15 + (i % 4) * 15,
+                (now + timedelta(minutes=1 + i % 60)).strftime("%Y-%m-%d %H:%M:%S"),
+                f"10.{100 + i // 256}.{i % 256}.0/24",
+            )
+            for i in range(plans)
+        ),
+    )
+
+
+def generate(
+    db_path: str | Path,
+    devices: int = 10_000,
+    approved_ratio: float = 0.2,
+    history_scans: int = 0,
+    plans: int = 0,
+    seed: int = 0,
+) -> dict:
+    """Migrates db_path and fills it; returns the row counts and build time."""
+    t0 = time.perf_counter()
+    migrate(db_path, backup=False)
+
+    rnd = random.Random(seed)
+    now = datetime.now()
+    n_approved = int(devices * approved_ratio)
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        # build speed only matters here; the benchmark itself uses the app's PRAGMAs
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.execute("BEGIN;")
+        _insert_devices(conn, "approved", 0, n_approved, rnd, now)
+        _insert_devices(conn, "unapproved", n_approved, devices, rnd, now)
+        conn.execute(
+            """
+            INSERT INTO DeviceAddresses (device_id, address, family, first_seen, last_seen)
+            SELECT id, ip_address, 4, CAST(strftime('%s', first_seen) AS INTEGER), CAST(strftime('%s', last_seen) AS INTEGER)
+            FROM Devices
+            """
+        )
+        if history_scans:
+            _insert_history(conn, devices, history_scans, now)
+        if plans:
+            _insert_plans(conn, plans, now)
+        conn.execute("COMMIT;")
+        conn.execute("ANALYZE;")
+    finally:
+        conn.close()
+
+    return {
+        "devices": devices,
+        "approved": n_approved,
+        "unapproved": devices - n_approved,
+        "sightings": devices * history_scans,
+        "plans": plans,
+        "build_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+@contextmanager
+def fixture_database(**kwargs):
+    """temp_database() filled by generate(**kwargs); yields (db_path, info)."""
+    with temp_database() as db_path:
+        yield db_path, generate(db_path, **kwargs)
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("-o", "--out", dest="out", help="fixture DB to create (must not exist)")
+    parser.add_option("-n", "--devices", dest="devices", type="int", default=10_000)
+    parser.add_option("-a", "--approved-ratio", dest="approved_ratio", type="float", default=0.2)
+    parser.add_option("--history-scans", dest="history_scans", type="int", default=0)
+    parser.add_option("--plans", dest="plans", type="int", default=0)
+    (options, _) = parser.parse_args(args=argv)
+
+    if not options.out:
+        parser.error("Specify --out")
+    if Path(options.out).exists():
+        parser.error(f"{options.out} already exists")
+
+    info = generate(
+        options.out,
+        devices=options.devices,
+        approved_ratio=options.approved_ratio,
+        history_scans=options.history_scans,
+        plans=options.plans,
+    )
+    print(f"Wrote {options.out}: {info}")
+
+
+if __name__ == "__main__":
+    main()
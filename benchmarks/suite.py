@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite, fully offline.
+
+Sections (all by default, or pick with --only):
+  run_scan   whole scans against FakeL2Network: first scan (all new, alert
+             mail delivered to MailgunStub) and steady state (no changes)
+  worker     scan_worker_tick() with N due plans until every job finished
+  db         DB_Data functions on fixtures of --sizes device rows
+  endpoints  the Flask API (test client) on a --endpoint-size fixture
+  pcap       run_scan(pcap=...) over synthetic captures of --pcap-frames
+             frames: packets/s read and devices/s through the whole pipeline
+  ingest     load test of /dataIngression over real HTTP: --sensors
+             simulated Pis posting gzip NDJSON batches for --duration seconds
+  ndp        IPv6 scans of a /64 with --hosts dual-addressed hosts against
+             SimulatedNdpBackend: packets sent, addresses and device rows
+  churn      --churn-scans scans of --hosts devices where 10% renew to a new
+             DHCP address each time: table rows, WAL bytes per scan, alerts
+
+Results go to a JSON file (default benchmarks/results/<time>-<commit>.json)
+that benchmarks/compare.py can diff against another run.
+
+Run from the repo root:
+    python -m benchmarks.suite --sizes 10000,100000,1000000
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from optparse import OptionParser
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+SECTIONS = ("run_scan", "worker", "db", "endpoints", "pcap", "ingest", "ndp", "churn")
+
+
+def _prepare_env(tmp: str) -> None:
+    # must run before anything from the app is imported: these are read at import time
+    os.environ["DB_PATH"] = os.path.join(tmp, "app.sqlite")
+    os.environ["NOTIFY_OUTBOX_DIR"] = os.path.join(tmp, "outbox")
+    os.environ["NOTIFY_RETRY_BASE_SECONDS"] = "0.05"
+    os.environ["SCHEDULER_LOCK_FILE"] = os.path.join(tmp, "scheduler.lock")
+    os.environ["SCHEDULER_SIGNAL_FILE"] = os.path.join(tmp, "scheduler.signal")
+    os.environ["SCAN_METRICS_FILE"] = ""
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-benchmark-secret")
+    # the simulated sensors post without a token
+    os.environ["INGEST_ALLOW_ANONYMOUS"] = "1"
+
+
+def _git(*args) -> str | None:
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def _meta(argv) -> dict:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "argv": list(argv or sys.argv[1:]),
+    }
+
+
+# --- sections ------------------------------------------------------------
+
+def bench_run_scan(host_counts: list[int], latency: float, loss: float, repeat: int) -> list[dict]:
+    import notifier
+    from Scanner import scanner
+    from benchmarks.common import measure, temp_database, timed
+    from benchmarks.fakes import FakeL2Network, MailgunStub
+
+    rows = []
+    for engine in ("burst", "adaptive"):
+        for hosts in host_counts:
+            prefix = 32 - max(8, (hosts * 2 - 1).bit_length())
+            target = f"10.60.0.0/{prefix}"
+            network = FakeL2Network({}, loss=loss, latency=latency, jitter=latency, seed=1)
+            network.add_target(target, hosts)
+            options = {"timeout": 0.05} if engine == "burst" else {"timeout": 0.05, "rate": 0, "rounds": 3}
+
+            with temp_database(), network.installed(), MailgunStub() as mail:
+                first = {}
+                first_s = timed(lambda: first.update(scanner.run_scan(target, engine=engine, **options)))
+                t0 = time.perf_counter()
+                notifier.flush()
+                delivered = mail.wait_for(1, timeout=5)
+                mail_s = time.perf_counter() - t0
+
+                # nothing changed since the first scan: the common case
+                steady = {}
+                steady_times = measure(
+                    lambda: steady.update(scanner.run_scan(target, engine=engine, **options)),
+                    repeat=max(3, repeat // 4),
+                    warmup=0,
+                )
+
+            rows.append({
+                "name": f"{engine}-{hosts}",
+                "engine": engine,
+                "target": target,
+                "hosts": hosts,
+                "found": first["found"],
+                "packets_sent": network.packets_sent,
+                "first_scan_s": round(first_s, 6),
+                "first_db_s": first["timings"].get("db_s"),
+                "alert_delivery_s": round(mail_s, 6),
+                "alert_delivered": delivered,
+                "steady_scan_s": steady_times["median_s"],
+                "steady_db_s": steady["timings"].get("db_s"),
+                "steady_written": steady["written"],
+            })
+    return rows
+
+
+def bench_worker(plan_counts: list[int], hosts_per_target: int, latency: float) -> list[dict]:
+    from Database import DB_Data
+    from Database.Worker import worker
+    from Scanner import jobs
+    from benchmarks.common import temp_database
+    from benchmarks.fakes import FakeL2Network
+
+    rows = []
+    for plans in plan_counts:
+        targets = [f"10.70.{i}.0/24" for i in range(plans)]
+        network = FakeL2Network({}, latency=latency, jitter=latency, seed=1)
+        for i, target in enumerate(targets):
+            network.add_target(target, hosts_per_target, seed=i)
+
+        with temp_database(), network.installed():
+            for target in targets:
+                DB_Data.planScan(5, target, timeout=0.05, jitter=0)
+            DB_Data._run("UPDATE PlannedScans SET next_scan_at = ?", (DB_Data._now_sqlite(),))
+
+            t0 = time.perf_counter()
+            worker.scan_worker_tick()
+            tick_s = time.perf_counter() - t0
+            while any(jobs.is_active(t) for t in targets):
+                time.sleep(0.005)
+            total_s = time.perf_counter() - t0
+            remaining_due = len(DB_Data.get_due_planned_scans())
+
+        rows.append({
+            "name": f"plans-{plans}",
+            "plans": plans,
+            "hosts_per_target": hosts_per_target,
+            "workers": jobs.SCAN_WORKERS,
+            "tick_s": round(tick_s, 6),
+            "all_done_s": round(total_s, 6),
+            "scans_per_sec": round(plans / total_s, 2) if total_s else None,
+            "still_due": remaining_due,
+        })
+    return rows
+
+
+def bench_db(sizes: list[int], repeat: int) -> list[dict]:
+    from Database import DB_Data
+    from benchmarks.common import fake_mac, fake_results, measure
+    from benchmarks.fixtures import fixture_database
+
+    rows = []
+    for size in sizes:
+        history = 4 if size <= 100_000 else 0
+        with fixture_database(devices=size, history_scans=history, plans=50) as (_, info):
+            page = DB_Data.list_devices("UnApprovedAddresses", limit=100)
+            for _ in range(8):
+                page = DB_Data.list_devices("UnApprovedAddresses", limit=100, after=page["next_after"])
+            deep_cursor = page["next_after"]
+
+            # the first 600 fixture devices are approved: a steady-state scan of a busy /22
+            scan = fake_results(600)
+            counter = iter(range(10**9))
+
+            cases = {
+                "list_devices_first_page": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100),
+                "list_devices_page_10": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100, after=deep_cursor),
+                "list_devices_vendor": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100, vendor="Ubiquiti"),
+                "list_devices_subnet": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100, subnet="10.0.200.0/24"),
+                "ingest_scan_600": lambda: DB_Data.ingest_scan(scan),
+                "add_unapproved_new": lambda: DB_Data.add_unapproved(
+                    mac_address=fake_mac(next(counter), prefix=0x020000), ip_address="192.168.99.1"
+                ),
+                "get_table_version": lambda: DB_Data.get_table_version("UnApprovedAddresses"),
+                "get_due_planned_scans": DB_Data.get_due_planned_scans,
+                "get_all_planned_scans": DB_Data.get_all_planned_scans,
+            }
+            if size - info["approved"] >= 300:
+                # triage 300 unapproved devices and back: per-device calls vs one bulk request
+                triage = [fake_mac(i) for i in range(info["approved"], info["approved"] + 300)]
+
+                def triage_single():
+                    for mac in triage:
+                        DB_Data.add_approved(mac_address=mac)
+                    for mac in triage:
+                        DB_Data.remove_approved(mac_address=mac)
+
+                def triage_bulk():
+                    DB_Data.bulk_update_devices("approve", items=triage)
+                    DB_Data.bulk_update_devices("unapprove", items=triage)
+
+                cases["triage_300_single"] = triage_single
+                cases["triage_300_bulk"] = triage_bulk
+            if info["approved"] <= 200_000:
+                cases["get_approved_full"] = DB_Data.get_approved
+            if history:
+                cases["get_device_history"] = lambda: DB_Data.get_device_history("00:16:3e:00:00:05")
+
+            for name, fn in cases.items():
+                rows.append({"name": f"{name}@{size}", "function": name, "rows": size, **measure(fn, repeat=repeat)})
+            rows.append({"name": f"fixture_build@{size}", "function": "fixture_build", "rows": size, "build_s": info["build_s"]})
+    return rows
+
+
+def bench_endpoints(size: int, repeat: int) -> list[dict]:
+    import app as appmod
+    from flask_jwt_extended import create_access_token
+
+    from benchmarks.common import measure
+    from benchmarks.fixtures import fixture_database
+
+    # importing app starts no background jobs: this process only benchmarks requests
+    client = appmod.app.test_client()
+    with appmod.app.app_context():
+        token = create_access_token(identity="benchmark")
+    client.set_cookie("access_token_cookie", token, path="/api/v1/")
+
+    rows = []
+    with fixture_database(devices=size, history_scans=2 if size <= 100_000 else 0, plans=50):
+        etag = client.get("/api/v1/getUnapproved?limit=100").headers.get("ETag")
+
+        def get(url, expect=200, **kwargs):
+            r = client.get(url, **kwargs)
+            if r.status_code != expect:
+                raise RuntimeError(f"{url} -> {r.status_code}")
+
+        cases = {
+            "getUnapproved_page": lambda: get("/api/v1/getUnapproved?limit=100"),
+            "getUnapproved_304": lambda: get(
+                "/api/v1/getUnapproved?limit=100", expect=304, headers={"If-None-Match": etag}
+            ),
+            "getApproved_vendor": lambda: get("/api/v1/getApproved?limit=100&vendor=Apple,%20Inc."),
+            "plannedScans_all": lambda: get("/api/v1/plannedScans/all"),
+            "metrics": lambda: get("/metrics"),
+        }
+        if size <= 100_000:
+            cases["device_history"] = lambda: get("/api/v1/devices/00:16:3e:00:00:05/history")
+
+        for name, fn in cases.items():
+            rows.append({"name": f"{name}@{size}", "endpoint": name, "rows": size, **measure(fn, repeat=repeat)})
+    return rows
+
+
+def bench_pcap(frame_counts: list[int], devices: int) -> list[dict]:
+    from Scanner import scanner
+    from benchmarks.common import temp_database
+    from benchmarks.fakes import write_arp_pcap
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for frames in frame_counts:
+            path = os.path.join(tmp, f"arp-{frames}.pcap")
+            info = write_arp_pcap(path, frames, min(devices, frames))
+            with temp_database():
+                first = scanner.run_scan(f"pcap:{frames}", pcap=path)
+                # same capture again: every device known, nothing new to write
+                steady = scanner.run_scan(f"pcap:{frames}", pcap=path)
+            rows.append({
+                "name": f"pcap-{frames}",
+                "frames": frames,
+                "devices": first["found"],
+                "file_bytes": info["bytes"],
+                "arp_replies": first["pcap"]["arp_replies"],
+                "read_s": first["pcap"]["read_s"],
+                "first_total_s": first["pcap"]["total_s"],
+                "steady_total_s": steady["pcap"]["total_s"],
+                "packets_per_sec": first["pcap"]["pps"],
+                "devices_per_sec": first["pcap"]["dps"],
+            })
+    return rows
+
+
+def bench_ndp(host_counts: list[int], latency: float) -> list[dict]:
+    import ipaddress
+
+    from Database import DB_Data
+    from Scanner import scanner
+    from Scanner.ndp_engine import SimulatedNdpBackend, eui64_address
+    from benchmarks.common import fake_mac, temp_database
+
+    prefix = ipaddress.IPv6Network("2001:db8:60::/64")
+    link_local = ipaddress.IPv6Network("fe80::/64")
+    rows = []
+    for hosts in host_counts:
+        # link-local + SLAAC + a stable DHCPv6-style address + a privacy address per host
+        table = {}
+        for i in range(hosts):
+            mac = fake_mac(i, prefix=0x00163F)
+            table[mac] = [
+                eui64_address(link_local, mac),
+                str(prefix.network_address + 0x1000 + i),
+                eui64_address(prefix, mac),
+                str(prefix.network_address + (0x5EED << 32) + i * 7919),
+            ]
+        network = SimulatedNdpBackend(table, latency=latency, seed=1)
+        previous = scanner.ndp_backend_factory
+        scanner.ndp_backend_factory = lambda: network
+        try:
+            with temp_database():
+                t0 = time.perf_counter()
+                first = scanner.run_scan(str(prefix), timeout=latency * 4)
+                first_s = time.perf_counter() - t0
+                sent_first = network.packets_sent
+                t0 = time.perf_counter()
+                steady = scanner.run_scan(str(prefix), timeout=latency * 4)
+                steady_s = time.perf_counter() - t0
+                with DB_Data._db.transaction() as conn:
+                    device_rows = conn.execute("SELECT COUNT(*) FROM Devices").fetchone()[0]
+                    address_rows = conn.execute("SELECT COUNT(*) FROM DeviceAddresses").fetchone()[0]
+        finally:
+            scanner.ndp_backend_factory = previous
+        rows.append({
+            "name": f"ndp-{hosts}",
+            "hosts": hosts,
+            "prefix_addresses": prefix.num_addresses,
+            "found": first["found"],
+            "found_steady": steady["found"],
+            "packets_sent": sent_first,
+            "packets_sent_steady": network.packets_sent - sent_first,
+            "device_rows": device_rows,
+            "address_rows": address_rows,
+            "first_scan_s": round(first_s, 6),
+            "steady_scan_s": round(steady_s, 6),
+        })
+    return rows
+
+
+def bench_churn(host_counts: list[int], scans: int, churn: float = 0.1) -> list[dict]:
+    import random
+    import sqlite3
+
+    from Database import DB_Data
+    from benchmarks.common import fake_ip, fake_mac, temp_database
+
+    rows = []
+    for hosts in host_counts:
+        rnd = random.Random(hosts)
+        # DHCP pool four times the device count, every device starts on its own lease
+        lease = {i: i for i in range(hosts)}
+        free = list(range(hosts, hosts * 4))
+        with temp_database() as db_path:
+            wal = Path(f"{db_path}-wal")
+
+            def checkpoint() -> None:
+                # outside the pool: a checkpoint can't run inside its transactions
+                side = sqlite3.connect(str(db_path), isolation_level=None)
+                side.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                side.close()
+
+            # scan 0 makes every device known; everyone is approved, like a triaged network
+            DB_Data.ingest_scan([{"IP": fake_ip(lease[i]), "MAC": fake_mac(i), "VENDOR": None} for i in range(hosts)])
+            DB_Data.bulk_update_devices("approve", items=[fake_mac(i) for i in range(hosts)])
+
+            alerts = 0
+            wal_bytes = []
+            t0 = time.perf_counter()
+            for _ in range(scans):
+                for i in rnd.sample(range(hosts), int(hosts * churn)):
+                    free.append(lease[i])
+                    lease[i] = free.pop(rnd.randrange(len(free) - 1))
+                checkpoint()
+                summary = DB_Data.ingest_scan(
+                    [{"IP": fake_ip(lease[i]), "MAC": fake_mac(i), "VENDOR": None} for i in range(hosts)]
+                )
+                alerts += len(summary["new_unapproved"])
+                wal_bytes.append(wal.stat().st_size if wal.exists() else 0)
+            elapsed = time.perf_counter() - t0
+
+            with DB_Data._db.transaction() as conn:
+                device_rows = conn.execute("SELECT COUNT(*) FROM Devices").fetchone()[0]
+                address_rows = conn.execute("SELECT COUNT(*) FROM DeviceAddresses").fetchone()[0]
+                unapproved = conn.execute("SELECT COUNT(*) FROM Devices WHERE state = 'unapproved'").fetchone()[0]
+            checkpoint()
+            db_bytes = Path(db_path).stat().st_size
+        rows.append({
+            "name": f"churn-{hosts}x{scans}",
+            "hosts": hosts,
+            "scans": scans,
+            "churn": churn,
+            "device_rows": device_rows,
+            "address_rows": address_rows,
+            "unapproved_after": unapproved,
+            "new_unapproved_alerts": alerts,
+            "db_bytes": db_bytes,
+            "wal_bytes_per_scan": int(sum(wal_bytes) / len(wal_bytes)) if wal_bytes else 0,
+            "scan_write_s": round(elapsed / scans, 6) if scans else None,
+        })
+    return rows
+
+
+def bench_ingest(sensor_counts: list[int], devices_per_batch: int, duration: float) -> list[dict]:
+    import gzip
+    import logging
+    import statistics
+    import threading
+
+    import requests
+    from werkzeug.serving import make_server
+
+    import app as appmod
+    import ingestion
+    from benchmarks.common import fake_ip, fake_mac, temp_database
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, appmod.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/dataIngression"
+
+    rows = []
+    try:
+        for sensors in sensor_counts:
+            latencies: list[float] = []
+            counts = {"sent": 0, "rejected": 0, "errors": 0}
+            lock = threading.Lock()
+
+            def sensor(n: int, deadline: float) -> None:
+                # every sensor reports its own /24; the device list is serialised once
+                base = n * 256
+                devices = json.dumps([
+                    {"IP": fake_ip(base + i), "MAC": fake_mac(base + i, prefix=0x02AB00), "VENDOR": None}
+                    for i in range(devices_per_batch)
+                ])
+                session = requests.Session()
+                seq = 0
+                while time.perf_counter() < deadline:
+                    line = (
+                        f'{{"target": "10.{n // 256}.{n % 256}.0/24", "scanned_at": {time.time():.0f}, '
+                        f'"batch_id": "bench-{sensors}-{n}-{seq}", "devices": {devices}}}\n'
+                    )
+                    seq += 1
+                    t0 = time.perf_counter()
+                    r = session.post(
+                        url,
+                        data=gzip.compress(line.encode(), compresslevel=5),
+                        headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"},
+                    )
+                    elapsed = time.perf_counter() - t0
+                    with lock:
+                        if r.status_code == 202:
+                            counts["sent"] += 1
+                            latencies.append(elapsed)
+                        elif r.status_code == 503:
+                            counts["rejected"] += 1
+                        else:
+                            counts["errors"] += 1
+                    if r.status_code == 503:
+                        time.sleep(0.05)
+                session.close()
+
+            with temp_database():
+                written_before = ingestion._writer.written
+                t0 = time.perf_counter()
+                deadline = t0 + duration
+                threads = [threading.Thread(target=sensor, args=(n, deadline)) for n in range(sensors)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                send_s = time.perf_counter() - t0
+                ingestion.flush(timeout=120)
+                total_s = time.perf_counter() - t0
+                written = ingestion._writer.written - written_before
+
+            latencies.sort()
+            rows.append({
+                "name": f"sensors-{sensors}",
+                "sensors": sensors,
+                "devices_per_batch": devices_per_batch,
+                "batches_accepted": counts["sent"],
+                "batches_rejected": counts["rejected"],
+                "errors": counts["errors"],
+                "batches_written": written,
+                "accepted_per_sec": round(counts["sent"] / send_s, 1),
+                "written_per_sec": round(written / total_s, 1),
+                "devices_per_sec": round(written * devices_per_batch / total_s, 1),
+                "drain_s": round(total_s - send_s, 6),
+                "median_s": round(statistics.median(latencies), 6) if latencies else None,
+                "p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 6) if latencies else None,
+            })
+    finally:
+        server.shutdown()
+    return rows
+
+
+# --- runner --------------------------------------------------------------
+
+def _ints(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("--only", dest="only", default=",".join(SECTIONS), help="comma separated sections")
+    parser.add_option("-s", "--sizes", dest="sizes", default="10000,100000", help="db: fixture device rows")
+    parser.add_option("--endpoint-size", dest="endpoint_size", type="int", default=100_000)
+    parser.add_option("--hosts", dest="hosts", default="50,250,1000", help="run_scan/ndp/churn: live hosts per target")
+    parser.add_option("--plans", dest="plans", default="4,16", help="worker: due plans per tick")
+    parser.add_option("--latency", dest="latency", type="float", default=0.002)
+    parser.add_option("--loss", dest="loss", type="float", default=0.02)
+    parser.add_option("--pcap-frames", dest="pcap_frames", default="100000", help="pcap: frames per capture")
+    parser.add_option("--pcap-devices", dest="pcap_devices", type="int", default=2000, help="pcap: distinct hosts")
+    parser.add_option("--sensors", dest="sensors", default="10,50", help="ingest: concurrent sensors")
+    parser.add_option("--batch-devices", dest="batch_devices", type="int", default=100, help="ingest: devices per batch")
+    parser.add_option("--duration", dest="duration", type="float", default=5.0, help="ingest: seconds of load")
+    parser.add_option("--churn-scans", dest="churn_scans", type="int", default=48, help="churn: scans per run")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=20)
+    parser.add_option("-o", "--out", dest="out", help="results JSON (default benchmarks/results/...)")
+    (options, _) = parser.parse_args(args=argv)
+
+    sections = [s.strip() for s in options.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"Unknown section(s): {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _prepare_env(tmp)
+        from Database.migrate import migrate
+
+        migrate(os.environ["DB_PATH"], backup=False)
+
+        report = {"meta": _meta(argv), "results": {}}
+        for section in sections:
+            t0 = time.perf_counter()
+            print(f"[bench] {section} ...", flush=True)
+            if section == "run_scan":
+                rows = bench_run_scan(_ints(options.hosts), options.latency, options.loss, options.repeat)
+            elif section == "worker":
+                rows = bench_worker(_ints(options.plans), 50, options.latency)
+            elif section == "db":
+                rows = bench_db(_ints(options.sizes), options.repeat)
+            elif section == "endpoints":
+                rows = bench_endpoints(options.endpoint_size, options.repeat)
+            elif section == "pcap":
+                rows = bench_pcap(_ints(options.pcap_frames), options.pcap_devices)
+            elif section == "ingest":
+                rows = bench_ingest(_ints(options.sensors), options.batch_devices, options.duration)
+            elif section == "ndp":
+                rows = bench_ndp(_ints(options.hosts), options.latency)
+            else:
+                rows = bench_churn(_ints(options.hosts), options.churn_scans)
+            report["results"][section] = rows
+            print(f"[bench] {section} done in {time.perf_counter() - t0:.1f}s", flush=True)
+            for row in rows:
+                fields = ", ".join(f"{k}={v}" for k, v in row.items() if k != "name" and (k.endswith("_s") or k.endswith("_per_sec") or k in ("found", "still_due")))
+                print(f"    {row['name']:<40} {fields}")
+
+        # background threads write into tmp; stop them before it goes away
+        if "app" in sys.modules:
+            sys.modules["app"].stop_background_jobs()
+        if "notifier" in sys.modules:
+            sys.modules["notifier"].stop()
+
+    out = Path(options.out) if options.out else (
+        RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{(report['meta']['commit'] or 'nogit')[:10]}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[bench] Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# events.py
+"""
+In-process pub/sub bus for live dashboard updates (/scans/stream).
+
+Producers (scan jobs, the scanner, DB_Data writes) call publish(); it never
+blocks and never touches the DB. Every event gets an increasing id and is
+kept in a ring buffer of the last EVENTS_HISTORY events, so a client that
+reconnects with Last-Event-ID is replayed what it missed.
+
+Each subscriber has its own buffer of at most EVENTS_CLIENT_BUFFER events. A
+client that falls further behind loses its oldest events and is sent a
+"resync" event instead, telling it to refetch the lists once rather than
+holding the producers up. Like the metrics, the bus is per process.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1024"))
+EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "256"))
+
+
+class Subscription:
+    def __init__(self, bus: "EventBus", maxlen: int):
+        self._bus = bus
+        self._buffer: deque = deque()
+        self._maxlen = maxlen
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def _put(self, event: dict) -> None:
+        # caller holds nothing; publish() may run on any thread
+        with self._cond:
+            if len(self._buffer) >= self._maxlen:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None) -> dict | None:
+        """Next event, or None after `timeout` seconds (keep-alive time) or once closed."""
+        with self._cond:
+            if not self._buffer and not self.closed:
+                self._cond.wait(timeout)
+            if self.dropped:
+                # the client missed events: one resync instead of the gap
+                dropped, self.dropped = self.dropped, 0
+                return {"id": None, "type": "resync", "data": {"dropped": dropped}}
+            if self._buffer:
+                return self._buffer.popleft()
+            return None
+
+    def close(self) -> None:
+        self._bus._unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class EventBus:
+    def __init__(self, history: int = EVENTS_HISTORY, client_buffer: int = EVENTS_CLIENT_BUFFER):
+        self.client_buffer = client_buffer
+        self._history: deque = deque(maxlen=history)
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        # ids keep increasing across restarts, so a stale Last-Event-ID is never "in the future"
+        self._ids = itertools.count(int(time.time() * 1000))
+        self.published = 0
+
+    def publish(self, type: str, data: dict | None = None) -> dict:
+        with self._lock:
+            event = {"id": next(self._ids), "type": type, "time": time.time(), "data": data or {}}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            sub._put(event)
+        return event
+
+    def subscribe(self, last_event_id: int | None = None) -> Subscription:
+        """
+        New subscriber; with last_event_id the events after it are queued
+        first (or a resync if they are no longer in the history).
+        """
+        sub = Subscription(self, self.client_buffer)
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._history[0]["id"] if self._history else None
+                if oldest is None or last_event_id < oldest - 1 or last_event_id > self._history[-1]["id"]:
+                    sub._put({"id": None, "type": "resync", "data": {"reason": "history"}})
+                else:
+                    for event in self._history:
+                        if event["id"] > last_event_id:
+                            sub._put(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+bus = EventBus()
+metrics.registry.gauge("event_stream_clients", "Open /scans/stream subscriptions.", lambda: bus.subscribers)
+
+
+def publish(type: str, data: dict | None = None) -> dict:
+    return bus.publish(type, data)
+
+
+def subscribe(last_event_id: int | None = None) -> Subscription:
+    return bus.subscribe(last_event_id)
@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+"""
+gunicorn settings, picked up by `gunicorn app:app` from the repo root.
+
+Importing app starts nothing, so every worker calls app.init() after the
+fork: the schema migration (serialised by migrate()'s own file lock) and the
+background jobs, of which the scheduler and housekeeping only run in the
+worker that holds the leader lock (Database/Worker/leader.py).
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+# /api/v1/scans/stream holds a request open, so requests get threads, not whole workers
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def post_fork(server, worker):
+    import app
+
+    app.init()
@@ -0,0 +1,487 @@
+# ingestion.py
+"""
+Remote scan ingestion for /dataIngression (Pi sensors).
+
+The request thread only decodes and validates the body and puts the batches
+on a bounded queue; it never waits for SQLite. A single writer thread takes
+whatever has queued up (up to INGEST_WRITE_BATCH batches) and writes it with
+DB_Data.ingest_batches in one transaction, so many sensors reporting at once
+cost one commit per round instead of one per request. New unapproved devices
+go to the notifier like local scans.
+
+Bodies are one batch object, a JSON array of them, or NDJSON (one batch per
+line), optionally gzip-compressed. A batch is
+
+    {"target": "10.0.0.0/24", "scanned_at": "2026-01-01T12:00:00+01:00",
+     "started_at": ..., "batch_id": "...", "devices": [{"IP", "MAC", "VENDOR"}]}
+
+Re-sent batches are dropped by idempotency key: the batch's batch_id, or
+"<Idempotency-Key header>:<index>". Keys are checked against the recent
+ones in memory when the request arrives, and claimed in the DB in the same
+transaction as the write, so a batch is stored once also across restarts.
+Batches without a key are always written.
+
+Agents (scanner.py --push) identify themselves with X-Agent-Id (plus
+X-Agent-Hostname / X-Agent-Version) and post heartbeats between uploads;
+both are recorded by the writer thread too. Every request needs
+"Authorization: Bearer <INGEST_TOKEN>"; without a token configured the
+endpoint is closed, unless INGEST_ALLOW_ANONYMOUS=1 opens it to anyone.
+"""
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(8 * 1024 * 1024)))
+INGEST_MAX_DEVICES = int(os.getenv("INGEST_MAX_DEVICES", "65536"))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "1000"))
+INGEST_WRITE_BATCH = int(os.getenv("INGEST_WRITE_BATCH", "50"))
+INGEST_RECENT_KEYS = int(os.getenv("INGEST_RECENT_KEYS", "100000"))
+INGEST_KEY_TTL_SECONDS = int(os.getenv("INGEST_KEY_TTL_SECONDS", str(7 * 86400)))
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+INGEST_ALLOW_ANONYMOUS = os.getenv("INGEST_ALLOW_ANONYMOUS", "0") == "1"
+AGENT_OFFLINE_SECONDS = int(os.getenv("AGENT_OFFLINE_SECONDS", "300"))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+batches_received = metrics.registry.counter(
+    "ingest_batches_total", "Batches received on /dataIngression by outcome.", ("status",)
+)
+write_duration = metrics.registry.histogram("ingest_write_seconds", "Wall time of one ingest writer transaction.")
+
+
+class IngestError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+# --- request identity ----------------------------------------------------
+
+_AGENT_ID_RE = re.compile(r"^[\w.:@-]{1,100}$")
+
+
+def enabled() -> bool:
+    """False while no INGEST_TOKEN is set and anonymous ingestion wasn't asked for."""
+    return bool(INGEST_TOKEN) or INGEST_ALLOW_ANONYMOUS
+
+
+def authorized(authorization: str | None) -> bool:
+    if not INGEST_TOKEN:
+        return INGEST_ALLOW_ANONYMOUS
+    scheme, _, token = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), INGEST_TOKEN.encode())
+
+
+def agent_from_headers(headers, remote_addr: str | None = None) -> dict | None:
+    """The agent a request came from, or None for anonymous sensors."""
+    agent_id = (headers.get("X-Agent-Id") or "").strip()
+    if not agent_id:
+        return None
+    if not _AGENT_ID_RE.match(agent_id):
+        raise IngestError("Invalid X-Agent-Id")
+    return {
+        "agent_id": agent_id,
+        "hostname": (headers.get("X-Agent-Hostname") or "").strip()[:200] or None,
+        "version": (headers.get("X-Agent-Version") or "").strip()[:50] or None,
+        "address": remote_addr,
+        "seen_at": int(time.time()),
+    }
+
+
+# --- decoding ------------------------------------------------------------
+
+def _gunzip(raw: bytes) -> bytes:
+    # bounded, so a small gzip bomb can't expand to gigabytes in memory
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        out = d.decompress(raw, INGEST_MAX_BYTES + 1)
+    except zlib.error as e:
+        raise IngestError(f"Invalid gzip body: {e}")
+    if len(out) > INGEST_MAX_BYTES or d.unconsumed_tail:
+        raise IngestError(f"Body larger than {INGEST_MAX_BYTES} bytes uncompressed", 413)
+    return out
+
+
+def decode_body(raw: bytes, content_encoding: str = "", content_type: str = "") -> list[dict]:
+    """Request body -> list of batch objects (not validated yet)."""
+    if len(raw) > INGEST_MAX_BYTES:
+        raise IngestError(f"Body larger than {INGEST_MAX_BYTES} bytes", 413)
+
+    encoding = (content_encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip") or (not encoding and raw[:2] == b"\x1f\x8b"):
+        raw = _gunzip(raw)
+    elif encoding not in ("", "identity"):
+        raise IngestError(f"Unsupported Content-Encoding: {content_encoding}", 415)
+
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raise IngestError("Body is not UTF-8")
+
+    if (content_type or "").split(";")[0].strip().lower() in NDJSON_TYPES:
+        batches = []
+        for n, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                batches.append(json.loads(line))
+            except ValueError as e:
+                raise IngestError(f"Line {n}: invalid JSON ({e})")
+        return batches
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise IngestError("Missing/invalid JSON")
+    return data if isinstance(data, list) else [data]
+
+
+# --- validation ----------------------------------------------------------
+
+_MAC_RE = re.compile(r"^[0-9a-fA-F]{2}([:-])[0-9a-fA-F]{2}(?:\1[0-9a-fA-F]{2}){4}$")
+_TIME = (str, int, float)
+
+
+# epoch seconds up to 2100; milliseconds (1.7e12) would pass "> 0" and then fail in the writer
+_MAX_EPOCH = 4102444800
+
+
+def _is_time(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, str):
+        value = value.strip()
+        if not value.isdigit():
+            try:
+                return 1970 < datetime.fromisoformat(value).year < 2100
+            except ValueError:
+                return False
+        value = int(value)
+    return 0 < value < _MAX_EPOCH
+
+
+def _is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value.strip())
+        return True
+    except ValueError:
+        return False
+
+
+# field -> (types, required, extra check)
+BATCH_SCHEMA = {
+    "target": (str, True, lambda v: bool(v.strip())),
+    "scanned_at": (_TIME, True, _is_time),
+    "started_at": (_TIME, False, _is_time),
+    "batch_id": (str, False, lambda v: 0 < len(v) <= 200),
+    "devices": (list, True, lambda v: len(v) <= INGEST_MAX_DEVICES),
+}
+DEVICE_SCHEMA = {
+    "IP": (str, True, _is_ip),
+    "MAC": (str, True, lambda v: bool(_MAC_RE.match(v.strip()))),
+    "VENDOR": ((str, type(None)), False, None),
+}
+
+
+def compile_schema(schema: dict):
+    """Turns a schema dict into one validator function, built once at import."""
+    fields = tuple(
+        (name, types, required, check, " or ".join(t.__name__ for t in (types if isinstance(types, tuple) else (types,))))
+        for name, (types, required, check) in schema.items()
+    )
+
+    def validate(obj, where: str) -> None:
+        if not isinstance(obj, dict):
+            raise IngestError(f"{where}: expected an object")
+        for name, types, required, check, type_names in fields:
+            if name not in obj:
+                if required:
+                    raise IngestError(f"{where}: {name} is required")
+                continue
+            value = obj[name]
+            if not isinstance(value, types) or isinstance(value, bool):
+                raise IngestError(f"{where}: {name} must be {type_names}")
+            if check is not None and value is not None and not check(value):
+                raise IngestError(f"{where}: invalid {name}")
+
+    return validate
+
+
+_validate_batch = compile_schema(BATCH_SCHEMA)
+_validate_device = compile_schema(DEVICE_SCHEMA)
+
+
+def validate(batches: list) -> None:
+    if not batches:
+        raise IngestError("Expected scanned_at, target, devices(list)")
+    for i, batch in enumerate(batches):
+        _validate_batch(batch, f"batch {i}")
+        for j, device in enumerate(batch["devices"]):
+            _validate_device(device, f"batch {i} device {j}")
+
+
+# --- writer --------------------------------------------------------------
+
+def _db_write(batches: list[dict]) -> list[dict]:
+    from Database import DB_Data
+
+    return DB_Data.ingest_batches(batches)
+
+
+def _db_heartbeats(agents: list[dict]) -> None:
+    from Database import DB_Data
+
+    DB_Data.record_agent_heartbeats(agents)
+
+
+def _notify(devices: list[dict]) -> None:
+    import notifier
+
+    notifier.notify_new_unapproved(devices)
+
+
+class IngestWriter:
+    def __init__(
+        self,
+        write=None,
+        write_heartbeats=None,
+        queue_max: int = INGEST_QUEUE_MAX,
+        write_batch: int = INGEST_WRITE_BATCH,
+        recent_keys: int = INGEST_RECENT_KEYS,
+    ):
+        self.write = write or _db_write
+        self.write_heartbeats = write_heartbeats or _db_heartbeats
+        self.queue_max = int(queue_max)
+        self.write_batch = max(1, int(write_batch))
+        self.recent_keys = int(recent_keys)
+
+        self._queue: queue.Queue = queue.Queue()
+        self._queued = 0
+        self._recent: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    # --- request side --------------------------------------------------
+
+    def submit(
+        self,
+        batches: list[dict],
+        idempotency_key: str | None = None,
+        agent: dict | None = None,
+        nbytes: int = 0,
+    ) -> list[dict]:
+        """
+        Queues validated batches; returns {"key", "status"} per batch, status
+        "accepted" or "duplicate". Raises IngestError(503) when the queue is
+        full; nothing of the request is queued then. `nbytes` (the request
+        body size) is split over the batches for the agent's throughput.
+        """
+        self.start()
+        results, items = [], []
+        with self._lock:
+            if self._queued + len(batches) > self.queue_max:
+                batches_received.inc(len(batches), status="rejected")
+                raise IngestError("Ingest queue is full, retry later", 503)
+
+            for i, batch in enumerate(batches):
+                key = batch.get("batch_id") or (f"{idempotency_key}:{i}" if idempotency_key else None)
+                if key is not None and key in self._recent:
+                    self._recent.move_to_end(key)
+                    results.append({"key": key, "status": "duplicate"})
+                    continue
+                if key is not None:
+                    self._recent[key] = "queued"
+                    while len(self._recent) > self.recent_keys:
+                        self._recent.popitem(last=False)
+                items.append({
+                    "key": key,
+                    "target": batch["target"].strip(),
+                    "scanned_at": batch["scanned_at"],
+                    "started_at": batch.get("started_at"),
+                    "devices": [
+                        {"IP": d["IP"].strip(), "MAC": d["MAC"].strip().lower().replace("-", ":"), "VENDOR": d.get("VENDOR")}
+                        for d in batch["devices"]
+                    ],
+                    "agent": agent,
+                    "bytes": nbytes // len(batches),
+                })
+                results.append({"key": key, "status": "accepted"})
+            self._queued += len(items)
+
+        for item in items:
+            self._queue.put(("batch", item))
+        if agent is not None and not items:
+            # every batch was a duplicate: nothing reaches ingest_batches, but the agent is alive
+            self._queue.put(("heartbeat", agent))
+        batches_received.inc(len(items), status="accepted")
+        batches_received.inc(len(batches) - len(items), status="duplicate")
+        return results
+
+    def heartbeat(self, agent: dict) -> None:
+        self.start()
+        self._queue.put(("heartbeat", agent))
+
+    @property
+    def queued(self) -> int:
+        with self._lock:
+            return self._queued
+
+    def flush(self, timeout: float = 30.0) -> None:
+        """Waits until everything queued before the call has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(timeout)
+
+    # --- lifecycle -----------------------------------------------------
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="ingest-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        # batches already queued are written before the thread exits
+        if self._thread is None:
+            return
+        self._queue.put(("stop", None))
+        self._thread.join(timeout)
+
+    # --- writer thread -------------------------------------------------
+
+    def _write_items(self, items: list[dict]) -> None:
+        t0 = time.perf_counter()
+        try:
+            results = self.write(items)
+        except Exception as e:
+            if len(items) == 1:
+                self._failed(items[0], e)
+                return
+            # one bad batch must not take the others down with it
+            for item in items:
+                self._write_items([item])
+            return
+        finally:
+            write_duration.observe(time.perf_counter() - t0)
+
+        new_devices = []
+        with self._lock:
+            for result in results:
+                if result["key"] is not None:
+                    self._recent[result["key"]] = result["status"]
+                if result["status"] == "duplicate":
+                    self.duplicates += 1
+                else:
+                    self.written += 1
+                    new_devices += result.get("new_unapproved") or []
+        batches_received.inc(sum(r["status"] == "written" for r in results), status="written")
+        batches_received.inc(sum(r["status"] == "duplicate" for r in results), status="duplicate")
+        if new_devices:
+            _notify(new_devices)
+
+    def _failed(self, item: dict, error: Exception) -> None:
+        with self._lock:
+            self.failed += 1
+            # forget the key so the sensor's retry is not answered as a duplicate
+            if item["key"] is not None:
+                self._recent.pop(item["key"], None)
+        batches_received.inc(status="failed")
+        print(f"[ingest] ERROR writing batch target='{item['target']}' key={item['key']}: {error}")
+
+    def _loop(self) -> None:
+        while True:
+            kind, payload = self._queue.get()
+            items, waiters, heartbeats, stopping = [], [], {}, False
+            while True:
+                if kind == "batch":
+                    items.append(payload)
+                elif kind == "heartbeat":
+                    heartbeats[payload["agent_id"]] = payload
+                elif kind == "flush":
+                    waiters.append(payload)
+                elif kind == "stop":
+                    stopping = True
+                if len(items) >= self.write_batch:
+                    break
+                try:
+                    kind, payload = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if items:
+                try:
+                    self._write_items(items)
+                finally:
+                    with self._lock:
+                        self._queued -= len(items)
+            if heartbeats:
+                try:
+                    self.write_heartbeats(list(heartbeats.values()))
+                except Exception as e:
+                    print(f"[ingest] ERROR recording {len(heartbeats)} agent heartbeat(s): {e}")
+            for done in waiters:
+                done.set()
+            if stopping:
+                if self._queue.empty():
+                    return
+                self._queue.put(("stop", None))
+
+
+_writer = IngestWriter()
+metrics.registry.gauge("ingest_queue_batches", "Batches waiting for the ingest writer.", lambda: _writer.queued)
+
+
+def parse_request(raw: bytes, content_encoding: str = "", content_type: str = "") -> list[dict]:
+    batches = decode_body(raw, content_encoding, content_type)
+    validate(batches)
+    return batches
+
+
+def submit(
+    batches: list[dict],
+    idempotency_key: str | None = None,
+    agent: dict | None = None,
+    nbytes: int = 0,
+) -> list[dict]:
+    return _writer.submit(batches, idempotency_key, agent=agent, nbytes=nbytes)
+
+
+def heartbeat(agent: dict) -> None:
+    _writer.heartbeat(agent)
+
+
+def flush(timeout: float = 30.0) -> None:
+    _writer.flush(timeout)
+
+
+def start() -> None:
+    _writer.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    _writer.stop(timeout)
+
+
+def prune_keys() -> int:
+    from Database import DB_Data
+
+    return DB_Data.prune_ingest_batches(INGEST_KEY_TTL_SECONDS)
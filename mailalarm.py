@@ -6,37 +6,29 @@ from dotenv import load_dotenv
 
 load_dotenv("keys.env")
 
-MAILGUN_URL = "https://api.mailgun.net/v3/sandbox00adcd4f8fc14cb68ebba91928172f20.mailgun.org/messages"
+# MAILGUN_URL can point at a local stand-in server when testing
+MAILGUN_URL = os.getenv("MAILGUN_URL", "https://api.mailgun.net/v3/sandbox00adcd4f8fc14cb68ebba91928172f20.mailgun.org/messages")
 MAILGUN_FROM = "Mailgun Sandbox <postmaster@sandbox00adcd4f8fc14cb68ebba91928172f20.mailgun.org>"
 MAILGUN_TO = "Owner of the network <mikkel@mohrhansen.dk>"
 
-def send_unapproved_mail():
-    api_key = os.getenv("MAILGUN_KEY")
-    if not api_key:
-        print("Error: MAILGUN_KEY environment variable not set.")
-        return
-    
-    unapproved = get_unapproved()
 
-    if not unapproved:
-        print("No unapproved IP addresses found.")
-    else:
-        subject = f"[ALERT] {len(unapproved)} Unapproved IP Address(es) Detected"
-        lines = ["Uanpproved IP addresses detected on your network:", ""]
-
-        for i, d in enumerate(unapproved, start=1):
-             lines += [
-                f"{i}. IP: {d.get('ip_address', '')}",
-                f"   MAC: {d.get('mac_address', '')}",
-                f"   Vendor: {d.get('vendor') or 'Unknown'}",
-                f"   Description: {d.get('description') or ''}",
-                f"   First seen: {d.get('first_seen') or ''}",
-                f"   Last seen:  {d.get('last_seen') or ''}",
-                "",
-            ]
-        text = "\n".join(lines)
+class MailError(RuntimeError):
+    """permanent=True: sending again won't help (no key, rejected by Mailgun)."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def mail_configured() -> bool:
+    return bool(os.getenv("MAILGUN_KEY"))
 
 
+def send_mail(subject: str, text: str) -> None:
+    api_key = os.getenv("MAILGUN_KEY")
+    if not api_key:
+        raise MailError("MAILGUN_KEY environment variable not set.", permanent=True)
+
     r = requests.post(
         MAILGUN_URL,
         auth=("api", api_key),
@@ -51,8 +43,41 @@ def send_unapproved_mail():
 
     if r.status_code == 200:
         print("Mail has been sent successfully!")
-    else: 
-        raise RuntimeError (f"Failed to send mail: {r.status_code} - {r.text}")
+    else:
+        # 4xx (bad key, bad recipient, ...) stays 4xx; 429 and 5xx are worth a retry
+        permanent = 400 <= r.status_code < 500 and r.status_code != 429
+        raise MailError(f"Failed to send mail: {r.status_code} - {r.text}", permanent=permanent)
+
+
+def send_unapproved_mail():
+    # Full inventory mail - the scan path uses notifier.py (only new devices)
+    api_key = os.getenv("MAILGUN_KEY")
+    if not api_key:
+        print("Error: MAILGUN_KEY environment variable not set.")
+        return
+    
+    unapproved = get_unapproved()
+
+    if not unapproved:
+        print("No unapproved IP addresses found.")
+        return
+
+    subject = f"[ALERT] {len(unapproved)} Unapproved IP Address(es) Detected"
+    lines = ["Uanpproved IP addresses detected on your network:", ""]
+
+    for i, d in enumerate(unapproved, start=1):
+         lines += [
+            f"{i}. IP: {d.get('ip_address', '')}",
+            f"   MAC: {d.get('mac_address', '')}",
+            f"   Vendor: {d.get('vendor') or 'Unknown'}",
+            f"   Description: {d.get('description') or ''}",
+            f"   First seen: {d.get('first_seen') or ''}",
+            f"   Last seen:  {d.get('last_seen') or ''}",
+            "",
+        ]
+    text = "\n".join(lines)
+
+    send_mail(subject, text)
     
 if __name__ == "__main__":
-    send_unapproved_mail()
\ No newline at end of file
+    send_unapproved_mail()
@@ -0,0 +1,315 @@
+# metrics.py
+"""
+Lightweight in-process instrumentation for the scan pipeline.
+
+Counters, gauges and histograms live in one registry; render() writes them
+in the Prometheus text format for /metrics. Values are per process (each WSGI
+worker exposes its own).
+
+span(name) times a block. The duration goes into the scan_stage_seconds
+histogram and, while a scan trace is active on the thread (trace()), into
+that trace as well. Every finished trace is appended as one JSON line to
+SCAN_METRICS_FILE.
+
+profiled() runs a block under cProfile and dumps the stats to
+SCAN_PROFILE_DIR; it is opt-in per scan (run_scan(..., profile=True)).
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+SCAN_METRICS_FILE = os.getenv("SCAN_METRICS_FILE", "Database/scan-metrics.jsonl")
+SCAN_METRICS_MAX_BYTES = int(os.getenv("SCAN_METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+SCAN_PROFILE_DIR = os.getenv("SCAN_PROFILE_DIR", "Database/profiles")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labelnames: tuple[str, ...], labels: dict) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[n]) for n in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labelnames, key, extra: tuple = ()) -> str:
+    pairs = [*zip(labelnames, key), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # an unlabelled counter is exported as 0 before its first inc()
+        self._values: dict[tuple, float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("counters only go up")
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _fmt_labels(self.labelnames, key), value
+
+
+class Gauge:
+    """Read at scrape time from a callback, so nothing has to keep it up to date."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def samples(self):
+        try:
+            value = float(self.fn())
+        except Exception:
+            return
+        yield self.name, "", value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self, **labels) -> dict:
+        with self._lock:
+            state = self._values.get(_label_key(self.labelnames, labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": state[-1], "sum": state[-2]}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                le = (("le", _fmt_value(bound) if math.isinf(bound) else repr(bound)),)
+                yield f"{self.name}_bucket", _fmt_labels(self.labelnames, key, le), count
+            yield f"{self.name}_sum", _fmt_labels(self.labelnames, key), state[-2]
+            yield f"{self.name}_count", _fmt_labels(self.labelnames, key), state[-1]
+
+
+class Registry:
+    _NAME_RE = re.compile(r"^[a-zA-Z_:][a-zA-Z0-9_:]*$")
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        if not self._NAME_RE.match(metric.name):
+            raise ValueError(f"invalid metric name: {metric.name}")
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # module reloads / repeated registration hand back the same metric
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn) -> Gauge:
+        return self._register(Gauge(name, help, fn))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, labels, value in m.samples():
+                lines.append(f"{name}{labels} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+scans_total = registry.counter("scans_total", "Finished scans by outcome.", ("status",))
+scan_duration = registry.histogram("scan_duration_seconds", "Wall time of a whole scan.")
+stage_duration = registry.histogram("scan_stage_seconds", "Wall time per scan stage.", ("stage",))
+devices_found = registry.histogram(
+    "scan_devices_found", "Devices answering per scan.", buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+packets_sent = registry.counter("scan_packets_sent_total", "ARP requests sent.")
+packets_answered = registry.counter("scan_packets_answered_total", "ARP replies received.")
+rows_upserted = registry.counter("db_rows_upserted_total", "Device rows written by ingest_scan.", ("table",))
+connections_opened = registry.counter("db_connections_opened_total", "SQLite connections opened by the pool.")
+alerts_sent = registry.counter("notifier_messages_sent_total", "Alert messages delivered.")
+alert_failures = registry.counter("notifier_send_failures_total", "Failed alert delivery attempts.")
+
+
+# --- per-scan traces -----------------------------------------------------
+
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stage_duration.observe(elapsed, stage=name)
+        current = getattr(_local, "trace", None)
+        if current is not None:
+            current["spans"][name] = round(current["spans"].get(name, 0.0) + elapsed, 6)
+
+
+def record(**fields) -> None:
+    """Adds fields (counts, ids...) to the scan trace running on this thread, if any."""
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current.update(fields)
+
+
+@contextmanager
+def trace(target: str, **fields):
+    """
+    Collects spans and record() fields for one scan and writes them as one
+    JSON line when the block exits (also on failure).
+    """
+    data = {"target": target, "started_at": datetime.now().isoformat(timespec="seconds"), "spans": {}, **fields}
+    previous = getattr(_local, "trace", None)
+    _local.trace = data
+    t0 = time.perf_counter()
+    status = "failed"
+    try:
+        yield data
+        status = "succeeded"
+    finally:
+        _local.trace = previous
+        total = time.perf_counter() - t0
+        data.update(status=status, total_s=round(total, 6))
+        scans_total.inc(status=status)
+        scan_duration.observe(total)
+        write_trace(data)
+
+
+def _rotate(path: str) -> None:
+    try:
+        if os.path.getsize(path) >= SCAN_METRICS_MAX_BYTES:
+            os.replace(path, path + ".1")
+    except OSError:
+        pass
+
+
+def write_trace(data: dict, path: str | None = None) -> None:
+    path = SCAN_METRICS_FILE if path is None else path
+    if not path:
+        return
+    line = json.dumps(data, default=str)
+    try:
+        with _file_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _rotate(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"[metrics] Could not write scan metrics to {path}: {e}")
+
+
+# --- opt-in profiling ----------------------------------------------------
+
+# the interpreter allows one active profiler at a time
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiled(label: str, out_dir: str | None = None, top: int = 25):
+    """
+    Runs the block under cProfile and writes <out_dir>/<time>-<label>.prof.
+    If another scan is already being profiled the block just runs.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        print(f"[metrics] Profiler busy, running {label} without it")
+        yield None
+        return
+
+    out_dir = out_dir or SCAN_PROFILE_DIR
+    profiler = cProfile.Profile()
+    path = None
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+
+        os.makedirs(out_dir, exist_ok=True)
+        safe = re.sub(r"[^\w.-]+", "_", label)
+        path = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{safe}.prof")
+        profiler.dump_stats(path)
+
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(top)
+        print(f"[metrics] Profile written to {path}\n{buf.getvalue()}")
+        record(profile=path)
+    finally:
+        _profile_lock.release()
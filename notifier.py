@@ -0,0 +1,267 @@
+# notifier.py
+"""
+Background dispatcher for "new unapproved device" alerts.
+
+The scan path only drops events on a queue (notify_new_unapproved) and moves
+on. A single dispatcher thread coalesces events for NOTIFY_WINDOW_SECONDS,
+writes one message with just the new devices to a persistent outbox
+(one JSON file per message) and hands it to the transport. Failed sends stay
+in the outbox and are retried with exponential backoff, also across restarts,
+up to NOTIFY_MAX_ATTEMPTS; then, or right away on a permanent failure, the
+message moves to the dead-letter directory (<outbox>/dead).
+
+The transport is any callable taking the message dict and raising on failure
+(an exception with permanent=True is not retried); the default sends through
+mailalarm.send_mail (Mailgun, or whatever MAILGUN_URL points at). Without a
+MAILGUN_KEY nothing is queued for it.
+"""
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+
+NOTIFY_WINDOW_SECONDS = float(os.getenv("NOTIFY_WINDOW_SECONDS", "60"))
+NOTIFY_OUTBOX_DIR = Path(os.getenv("NOTIFY_OUTBOX_DIR", "Database/outbox"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "5"))
+NOTIFY_RETRY_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "900"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "20"))
+
+
+def mailgun_transport(message: dict) -> None:
+    from mailalarm import send_mail
+
+    send_mail(message["subject"], message["text"])
+
+
+def mailgun_configured() -> bool:
+    from mailalarm import mail_configured  # loads keys.env
+
+    return mail_configured()
+
+
+def build_message(devices: list[dict]) -> dict:
+    subject = f"[ALERT] {len(devices)} new unapproved device(s) detected"
+    lines = ["New unapproved devices detected on your network:", ""]
+    for i, d in enumerate(devices, start=1):
+        lines += [
+            f"{i}. IP: {d.get('ip_address', '')}",
+            f"   MAC: {d.get('mac_address', '')}",
+            f"   Vendor: {d.get('vendor') or 'Unknown'}",
+            f"   First seen: {d.get('first_seen') or ''}",
+            "",
+        ]
+    return {"subject": subject, "text": "\n".join(lines), "devices": devices}
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        transport=None,
+        window: float = NOTIFY_WINDOW_SECONDS,
+        outbox_dir: Path | str = NOTIFY_OUTBOX_DIR,
+        retry_base: float = NOTIFY_RETRY_BASE_SECONDS,
+        retry_max: float = NOTIFY_RETRY_MAX_SECONDS,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+    ):
+        self.transport = transport or mailgun_transport
+        self.window = float(window)
+        self.outbox_dir = Path(outbox_dir)
+        self.dead_dir = self.outbox_dir / "dead"
+        self.retry_base = float(retry_base)
+        self.retry_max = float(retry_max)
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._events: queue.Queue = queue.Queue()
+        self._pending: dict[tuple[str, str], dict] = {}
+        self._window_ends: float | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.dropped_unconfigured = 0
+
+    # --- producer side -------------------------------------------------
+
+    def notify(self, devices: list[dict]) -> None:
+        if not devices:
+            return
+        self.start()
+        self._events.put(("devices", list(devices)))
+
+    def flush(self, timeout: float = 30.0) -> None:
+        """Close the current window now and wait until the outbox has been tried once."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._events.put(("flush", done))
+        done.wait(timeout)
+
+    # --- lifecycle -----------------------------------------------------
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.outbox_dir.mkdir(parents=True, exist_ok=True)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._events.put(("wake", None))
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- outbox --------------------------------------------------------
+
+    def _write(self, path: Path, message: dict) -> None:
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(message), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _dead_letter(self, path: Path, message: dict, reason: str) -> None:
+        self.dead_dir.mkdir(parents=True, exist_ok=True)
+        self._write(path, message)
+        os.replace(path, self.dead_dir / path.name)
+        self.dead += 1
+        print(f"[notifier] Giving up on alert {path.name} ({reason}); moved to {self.dead_dir}")
+
+    def _enqueue_outbox(self, devices: list[dict]) -> None:
+        if self.transport is mailgun_transport and not mailgun_configured():
+            # no key: a queued mail could never be sent
+            if not self.dropped_unconfigured:
+                print("[notifier] MAILGUN_KEY not set; new-device alerts are not mailed")
+            self.dropped_unconfigured += 1
+            return
+        message = build_message(devices)
+        message.update(
+            id=uuid.uuid4().hex,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            attempts=0,
+            next_attempt_at=0.0,
+        )
+        self._write(self.outbox_dir / f"{time.time():.6f}-{message['id']}.json", message)
+
+    def _drain_outbox(self, force: bool = False) -> float | None:
+        """Try every due message; returns when the next retry is due (epoch) or None."""
+        next_due = None
+        for path in sorted(self.outbox_dir.glob("*.json")):
+            try:
+                message = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"[notifier] Dropping unreadable outbox file {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+
+            now = time.time()
+            if not force and message.get("next_attempt_at", 0) > now:
+                next_due = min(next_due or message["next_attempt_at"], message["next_attempt_at"])
+                continue
+
+            try:
+                self.transport(message)
+            except Exception as e:
+                message["attempts"] = message.get("attempts", 0) + 1
+                message["last_error"] = str(e)
+                self.failed_attempts += 1
+                metrics.alert_failures.inc()
+                if getattr(e, "permanent", False):
+                    self._dead_letter(path, message, f"permanent failure: {e}")
+                    continue
+                if message["attempts"] >= self.max_attempts:
+                    self._dead_letter(path, message, f"{message['attempts']} attempts, last: {e}")
+                    continue
+                delay = min(self.retry_max, self.retry_base * (2 ** (message["attempts"] - 1)))
+                message["next_attempt_at"] = now + delay
+                self._write(path, message)
+                next_due = min(next_due or message["next_attempt_at"], message["next_attempt_at"])
+                print(f"[notifier] Send failed (attempt {message['attempts']}), retrying in {delay:.1f}s: {e}")
+                continue
+
+            path.unlink(missing_ok=True)
+            self.sent += 1
+            metrics.alerts_sent.inc()
+            print(f"[notifier] Sent alert for {len(message.get('devices', []))} new device(s)")
+        return next_due
+
+    # --- dispatcher thread ---------------------------------------------
+
+    def _close_window(self) -> None:
+        if self._pending:
+            self._enqueue_outbox(list(self._pending.values()))
+        self._pending = {}
+        self._window_ends = None
+
+    def _loop(self) -> None:
+        # anything left over from before a restart goes first
+        next_retry = self._drain_outbox()
+
+        while not self._stop.is_set():
+            deadlines = [t for t in (self._window_ends, next_retry) if t is not None]
+            timeout = max(0.0, min(deadlines) - time.time()) if deadlines else None
+
+            try:
+                kind, payload = self._events.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = "wake", None
+
+            if kind == "devices":
+                for d in payload:
+                    key = (d.get("mac_address", ""), d.get("ip_address", ""))
+                    self._pending.setdefault(key, d)
+                if self._window_ends is None:
+                    self._window_ends = time.time() + self.window
+
+            force = kind == "flush"
+            if force or (self._window_ends is not None and time.time() >= self._window_ends):
+                self._close_window()
+                next_retry = self._drain_outbox(force=force)
+            elif next_retry is not None and time.time() >= next_retry:
+                next_retry = self._drain_outbox()
+
+            if kind == "flush":
+                payload.set()
+
+
+_dispatcher = NotificationDispatcher()
+metrics.registry.gauge(
+    "notifier_outbox_messages",
+    "Alert messages waiting in the outbox.",
+    lambda: sum(1 for _ in _dispatcher.outbox_dir.glob("*.json")),
+)
+metrics.registry.gauge(
+    "notifier_dead_letters",
+    "Alert messages given up on (in the outbox's dead directory).",
+    lambda: sum(1 for _ in _dispatcher.dead_dir.glob("*.json")),
+)
+
+
+def notify_new_unapproved(devices: list[dict]) -> None:
+    _dispatcher.notify(devices)
+
+
+def flush(timeout: float = 30.0) -> None:
+    _dispatcher.flush(timeout)
+
+
+def set_transport(transport) -> None:
+    _dispatcher.transport = transport
+
+
+def start() -> None:
+    _dispatcher.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    _dispatcher.stop(timeout)
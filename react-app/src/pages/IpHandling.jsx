@@ -130,6 +130,26 @@ export const IpHandling = () => {
     })();
   }, []);
 
+  // ✅ live opdatering: serveren pusher events i stedet for at vi poller listerne
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE}/scans/stream`, { withCredentials: true });
+    const refetch = () => refreshLists().catch((e) => console.error(e));
+
+    source.addEventListener("devices-changed", refetch);
+    source.addEventListener("resync", refetch);
+    source.addEventListener("scan-finished", (e) => {
+      const data = JSON.parse(e.data || "{}");
+      if (data.status === "failed") setError(data.error || `Scan af ${data.target} fejlede`);
+    });
+    source.addEventListener("new-unapproved", (e) => {
+      const data = JSON.parse(e.data || "{}");
+      const count = Array.isArray(data.devices) ? data.devices.length : 0;
+      if (count) showToast(`${count} ny(e) ukendt(e) enhed(er)`);
+    });
+
+    return () => source.close();
+  }, []);
+
   const showToast = (message) => {
     setToast(message);
 
@@ -191,25 +211,12 @@ export const IpHandling = () => {
     ]);
 
     try {
-      // først slet fra Approved
+      // enheden flyttes fra Approved til Unapproved i ét kald
       await fetchJson(`${API_BASE}/removeApproved`, {
         method: "DELETE",
         body: { mac_address: mac, ip_address: ip },
       });
 
-      // derefter add til Unapproved
-      await fetchJson(`${API_BASE}/addUnapproved`, {
-        method: "POST",
-        body: {
-          mac_address: mac,
-          ip_address: ip,
-          description: row.description ?? null,
-          vendor: row.vendor ?? null,
-          first_seen: row.first_seen ?? null,
-          last_seen: row.last_seen ?? null,
-        },
-      });
-
       await refreshLists();
     } catch (e) {
       setUnknown(prevUnknown);
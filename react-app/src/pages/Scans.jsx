@@ -200,19 +200,16 @@ export const Scans = () => {
   };
 
   const handleDelete = async (row) => {
-    const interval = row?.interval;
-    if (interval == null) return;
+    const id = row?.id;
+    if (id == null) return;
 
-    const key = `del:${interval}`;
+    const key = `del:${id}`;
 
     try {
       setErr("");
       setBusy(key, true);
 
-      await apiJson("/plannedScans/delete", {
-        method: "DELETE",
-        body: { interval },
-      });
+      await apiJson(`/plannedScans/${id}`, { method: "DELETE" });
 
       await refresh();
     } catch (e) {
@@ -352,11 +349,11 @@ export const Scans = () => {
                       const isPaused = !next;
                       const stopKey = `stop:${interval}|${target}`;
                       const runKey = `run:${interval}|${target}`;
-                      const delKey = `del:${interval}`;
+                      const delKey = `del:${row?.id}`;
                       const busy = busyKeys.has(stopKey) || busyKeys.has(runKey) || busyKeys.has(delKey);
 
                       return (
-                        <tr key={`${interval}|${target}`} className="hover:bg-foreground/5">
+                        <tr key={row?.id ?? `${interval}|${target}`} className="hover:bg-foreground/5">
                           <Td>{target || "—"}</Td>
                           <Td>{interval != null ? `${interval} min` : "—"}</Td>
                           <Td muted>
@@ -377,7 +374,7 @@ export const Scans = () => {
                                   busy ? "opacity-60 pointer-events-none" : ""
                                 }`}
                                 onClick={() => handleDelete(row)}
-                                title="Slet (DELETE by interval)"
+                                title="Slet planen"
                               >
                                 <Trash2 className="h-4 w-4" />
                                 Slet
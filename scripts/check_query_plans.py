@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN QUERY PLAN check for the hot queries in Database/DB_Data.py.
+
+Builds a throwaway DB from the migrations with a small fixture, points
+DB_Data at it and calls the hot functions themselves. Every statement they
+run is captured with sqlite3's trace callback (with the parameters bound),
+so the plans are built from the exact SQL DB_Data executes - nothing to keep
+in sync here. Fails (exit 1) if one of them scans a table or sorts with a
+temp B-tree instead of using an index.
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Database import DB_Data
+from Database.DB_Connections import DB_Connections
+from Database.migrate import migrate
+
+_MAC = "00:16:3e:00:00:01"
+
+HOT_CALLS = {
+    "get_approved": lambda: DB_Data.get_approved(),
+    "get_unapproved": lambda: DB_Data.get_unapproved(),
+    "list_devices (first page)": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100),
+    "list_devices (keyset page)": lambda: DB_Data.list_devices(
+        "UnApprovedAddresses", limit=100, after=("2026-01-01 00:00:00", 10)
+    ),
+    "list_devices (vendor filter)": lambda: DB_Data.list_devices("UnApprovedAddresses", limit=100, vendor="Dell"),
+    "list_devices (subnet filter)": lambda: DB_Data.list_devices(
+        "ApprovedAddresses", limit=100, subnet="10.0.0.0/24"
+    ),
+    "list_devices (seen_since filter)": lambda: DB_Data.list_devices(
+        "UnApprovedAddresses", limit=100, seen_since="2026-01-01 00:00:00"
+    ),
+    "list_devices (all filters, keyset page)": lambda: DB_Data.list_devices(
+        "UnApprovedAddresses",
+        limit=100,
+        after=("2026-01-01 00:00:00", 10),
+        vendor="Dell",
+        subnet="10.0.0.0/16",
+        seen_since="2025-01-01 00:00:00",
+    ),
+    "add_approved": lambda: DB_Data.add_approved(_MAC, "10.0.0.1", "fixture"),
+    "remove_approved": lambda: DB_Data.remove_approved(_MAC),
+    "get_due_planned_scans": lambda: DB_Data.get_due_planned_scans(),
+    "touch_planned_scan": lambda: DB_Data.touch_planned_scan(1),
+    "set_last_and_next_from_interval": lambda: DB_Data.set_last_and_next_from_interval("10.0.0.0/24"),
+    "get_device_history": lambda: DB_Data.get_device_history(_MAC, since=0, until=2_000_000_000),
+    "get_table_version": lambda: DB_Data.get_table_version("ApprovedAddresses"),
+}
+
+_EXPLAINED = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+_BAD = ("USE TEMP B-TREE",)
+
+
+class _TracingConnections(DB_Connections):
+    """Pool whose connections report every statement they run to `statements`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements: list[str] = []
+
+    def _connect(self):
+        conn = super()._connect()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def _seed() -> None:
+    results = [
+        {"IP": f"10.0.0.{i}", "MAC": f"00:16:3e:00:00:{i:02x}", "VENDOR": "Dell" if i % 2 else None}
+        for i in range(1, 21)
+    ]
+    DB_Data.ingest_scan(results, scan_target="10.0.0.0/24")
+    DB_Data.add_approved(_MAC, "10.0.0.1", "fixture")
+    DB_Data.planScan(5, "10.0.0.0/24")
+
+
+def _statements(captured: list[str]) -> list[str]:
+    # temp tables live on the connection that made them, so those can't be explained here
+    seen = dict.fromkeys(
+        " ".join(sql.split())
+        for sql in captured
+        if sql.lstrip().upper().startswith(_EXPLAINED) and "temp." not in sql
+    )
+    return list(seen)
+
+
+def _plan_ok(plan: list[str]) -> bool:
+    for line in plan:
+        if any(b in line for b in _BAD):
+            return False
+        # a bare "SCAN <table>" means a full table scan without an index
+        if line.startswith("SCAN ") and "USING" not in line:
+            return False
+    return True
+
+
+def main():
+    failures = 0
+    old_db = DB_Data._db
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "plans.sqlite"
+        migrate(db_path, backup=False)
+        db = _TracingConnections(str(db_path))
+        DB_Data._db = db
+        try:
+            _seed()
+            for name, call in HOT_CALLS.items():
+                db.statements.clear()
+                call()
+                statements = _statements(db.statements)
+                if not statements:
+                    failures += 1
+                    print(f"FAIL {name} (no statements captured)")
+                    continue
+                for sql in statements:
+                    with db.transaction() as conn:
+                        conn.set_trace_callback(None)
+                        try:
+                            plan = [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                        finally:
+                            conn.set_trace_callback(db.statements.append)
+                    ok = _plan_ok(plan)
+                    failures += not ok
+                    print(f"{'OK  ' if ok else 'FAIL'} {name}: {sql[:110]}")
+                    for line in plan:
+                        print(f"       {line}")
+        finally:
+            db.close_all()
+            DB_Data._db = old_db
+
+    if failures:
+        raise SystemExit(f"{failures} hot query/queries without a usable index")
+
+
+if __name__ == "__main__":
+    main()
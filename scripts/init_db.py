@@ -1,30 +1,38 @@
 #!/usr/bin/env python3
+"""
+Create or upgrade the SQLite DB.
+
+    python scripts/init_db.py            # upgrade in place (keeps data)
+    python scripts/init_db.py --reset    # delete and recreate from scratch
+"""
+import sys
+from optparse import OptionParser
 from pathlib import Path
-import sqlite3
 
-SCHEMA_PATH = Path("Database/schema.sql")
-DB_PATH = Path("Database/SqliteDB")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Database.migrate import migrate
 
-def main():
-    if not SCHEMA_PATH.exists():
-        raise SystemExit(f"Missing schema file: {SCHEMA_PATH}")
+DB_PATH = Path("Database/SqliteDB")
 
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+def main(argv=None):
+    parser = OptionParser()
+    parser.add_option("--reset", dest="reset", action="store_true", default=False,
+                      help="delete the existing DB first (all data is lost)")
+    parser.add_option("--db", dest="db_path", default=str(DB_PATH))
+    (options, _) = parser.parse_args(args=argv)
 
-    schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    db_path = Path(options.db_path)
 
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+    if options.reset and db_path.exists():
+        db_path.unlink()
 
-    conn = sqlite3.connect(str(DB_PATH))
-    try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.executescript(schema_sql)
-        conn.commit()
-    finally:
-        conn.close()
+    applied = migrate(db_path)
 
-    print(f"Created SQLite DB: {DB_PATH}")
+    if applied:
+        print(f"SQLite DB {db_path} is now at {applied[-1]}")
+    else:
+        print(f"SQLite DB {db_path} is already up to date")
 
 if __name__ == "__main__":
     main()
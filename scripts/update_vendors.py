@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Download the IEEE vendor list to the local cache file used by Scanner/oui.py.
+
+This is the only place the vendor list is fetched from the network. A
+running app picks up the new file on its next OUI refresh.
+"""
+from mac_vendor_lookup import MacLookup
+
+
+def main():
+    lookup = MacLookup()
+    lookup.update_vendors()
+    print(f"Vendor list written to: {MacLookup.cache_path}")
+
+
+if __name__ == "__main__":
+    main()